@@ -0,0 +1,6 @@
+# Evaluator is imported when it is first used, so that the commands that do not evaluate points do not import numpy
+def __getattr__(name):
+    if name == 'Evaluator':
+        from amon.src.evaluator import Evaluator
+        return Evaluator
+    raise AttributeError(f"module 'amon' has no attribute '{name}'")
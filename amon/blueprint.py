@@ -100,6 +100,14 @@ All2AllIterative object  (see https://gitlab.windenergy.dtu.dk/TOPFARM/PyWake/-/
         solved iteratively by PyWake (hence the class name All2AllIterative). The solver stops when 
         the relative change < convergence tolerance.
 
+    Incremental evaluation
+    ----------------------
+            It is not possible to only recompute the wake deficits of the turbines that moved between two evaluations.
+        Every model combination of __setModels uses the Rathmann blockage model, the CrespoHernandez turbulence
+        model and the Jimenez deflection model, and the thrust of each turbine depends on its effective wind speed.
+        Moving a single turbine therefore changes the power of every turbine, even the ones upstream of it
+        (see testing/delta/coupling_test.py), and the whole farm has to be solved again.
+
 Constraints
 -----------
 
@@ -122,6 +130,10 @@ How are the parameters chosen ?
 Optionaly, one can specify a scale factor for the size of the zone, an elevation function to add a vertical aspect, and a turbulence intensity.
 If not specified, default values are used.
 As for models, convergence tolerance, and other precision parameters, they are determined by a fidelity number that is passed as an argument to the blackbox
+The AEP is computed on the (perturbed) hourly time series of the wind data. For fidelities below WINDROSE_FIDELITY, it is instead computed
+on the binned wind rose: every non-empty (wd, ws) bin is simulated once, at the mean wind speed of its samples, and weighted by its probability, which is much cheaper for long time series.
+The constraints are computed before the AEP. With an extreme barrier (BARRIER in the param file, or --barrier), a layout whose spacing, placing and
+height constraints sum above the threshold gets an objective of inf without running the simulation.
 
 
 How to run the program ?
@@ -129,15 +141,19 @@ How to run the program ?
     The program uses the "amon" main command to launch it from the terminal, then some subcommands can be used.
 At any point, adding -h to the command will pull up a help menu for more detail. Here are the subcommands :
     "run"            : run blackbox with a certain instance or param file and a point to evaluate
+    "run-batch"      : run blackbox on many points of the same instance, in parallel over a pool of worker processes
     "show-windrose"  : plot the windrose of a certain wind data folder
     "show-zone"      : plot a certain zone, optionaly with a point to plot. Good to determine a starting point
     "show-elevation" : plot the elevation function used
     "show-turbine"   : plot the power/ct curve and display information of turbine n
     "instance-info"  : show the information about a specific instance
+    "gen-start"      : generate feasible starting points (spacing, placing and height constraints) of an instance
     "serve"          : start a local server that handles requests. This prevents reimporting all the libraries at every iteration.
                        Use -s when running the blackbox to send requests to the server for it to make the calculations instead of doing them from the current session
     "shutdown"       : shuts down the server
     "check"          : Verifies if the output is as expected
+    "cache"          : show statistics about the on-disk cache of evaluations, or clear it
+    "bench"          : time the blackbox on a matrix of instances, fidelities and seeds, and compare to a saved baseline
 
 There are multiple arguments and flags, use the -h menu or look at the argarsing.py file for details
 
@@ -155,12 +171,26 @@ Main files :
 Command-specific files :
     client.py      : Sends the right request to the server, according to command-line arguments
     server.py      : Runs the appropriate code according to the request received and responds with the result
+    unix_socket.py    : Framed protocol (length + json) of the Unix socket of the server (serve --socket), and its client, standard library only
+    worker_pool.py    : Pool of forked worker processes that evaluate the requests of the server in parallel, each with its own InstanceCache (serve --workers)
+    instance_cache.py : LRU cache of built blackboxes, used by the server to avoid rebuilding an instance for every request
+    snapshot.py       : Pickled snapshots of built blackboxes in the cache folder, restored by "run" instead of building the instance
+    eval_cache.py     : On-disk (SQLite) cache of blackbox outputs, keyed by a hash of the instance files, point, seed and fidelity
+    surrogate.py      : Gaussian process surrogate of the blackbox outputs of an instance, trained on the evaluation cache (run --surrogate)
+    evaluator.py      : Evaluator class, to call the blackbox from Python without files or the server (exported as amon.Evaluator)
     blackbox.py    : Runs the blackbox with given parameter file, point, seed, and fidelity
+    batch.py       : Evaluates many points of the same instance over a pool of forked worker processes
+    profiling.py   : Times the stages of an evaluation (run --profile), does nothing when profiling is not enabled
+    bench.py       : Runs the benchmark matrix (amon bench) in fresh processes, and compares the results to a baseline
+    starting_points.py : Samples feasible layouts in the buildable zone (amon gen-start) and writes them as point files
+    warm_start.py  : All2AllIterative whose wake solver can start from the solution of a previous evaluation (serve --warm-start)
     plot_functions : Plots the windrose, the zone, the turbine's power/ct curve, or the elevstion function
 
 Other files :
     windfarm_data.py : Builds the objects necessary to run the blackbox from the parameter file
     cost.py          : Defines how the cost over lifetime of the windfarm is calculated
+    compiled_data.py : Compiles the wind data, power/ct curves and zones to binary files (npy, WKB) in the cache folder, rebuilt when the sources change
+    elevation.py     : Elevation of the ground, from an elevation function or a .npy raster (bilinear interpolation), evaluated on arrays of points
 '''
 
 #------------------#
@@ -203,13 +233,16 @@ Other files :
     BUDGET                  <Budget in USD>
     WIND_DATA               <id (index) of wind data folder>    (*)
     TI                      <float value>
-    ELEVATION_FUNCTION      <id (index) of shear function>
+    ELEVATION_FUNCTION      <id (index) of elevation function, or raster.npy origin_x origin_y resolution> (raster : elevations[j, i] at (origin_x + i*resolution, origin_y + j*resolution), path relative to the param file)
+    ELEVATION_RESOLUTION    <float value, more than 0>          (samples the elevation function on a raster of this resolution (m) over the zone, cached in the cache folder)
     WIND_TURBINES           <ids (indices) of wind turbines>    (*) (separated by commas)
     SCALE_FACTOR            <float value>
     BLACKBOX_OUTPUT         <order of bbo>                      (*) (separated by commas) (choices: OBJ, SPACING, PLACING, HEIGHT, BUDGET)
     OPT_VARIABLES           <variables to oprimize>             (*) (separated by commas) (choices: COORDS, HEIGHTS, YAW, TYPES) (same order as point file)
     NB_WIND_TURBINES        <integer value or VAR>              (*)
     CONSTRAINT_FREE         <TRUE or FALSE (default FALSE)
+    WINDROSE_FIDELITY       <float value between 0 and 1 (default 0)> (below this fidelity, the AEP is computed on the wind rose instead of the time series)
+    BARRIER                 <float value, 0 or more>            (if the sum of the spacing, placing and height constraints is above this value, the simulation is skipped and the objective is inf)
     --------------------------------------------------------------------
     Note : the ones with (*) are mandatory, others are optional
 '''
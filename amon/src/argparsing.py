@@ -1,9 +1,10 @@
 #argparsing.py
 import argparse
 
-from amon.src.utils import AMON_HOME
+from amon.src.utils import AMON_HOME, DEFAULT_CACHE_SIZE, DEFAULT_BENCH_INSTANCES, DEFAULT_BENCH_FIDELITIES, DEFAULT_BENCH_SEEDS, \
+                           DEFAULT_BENCH_TIME_THRESHOLD, DEFAULT_BENCH_MEMORY_THRESHOLD, DEFAULT_BENCH_AEP_THRESHOLD
 
-def create_parser(run_f, windrose_f, show_zone_f, show_turbine_f, show_elevation_f, instance_info_f, check_f, start_server_f, shutdown_server_f):
+def create_parser(run_f, run_batch_f, windrose_f, show_zone_f, show_turbine_f, show_elevation_f, instance_info_f, gen_start_f, check_f, cache_f, bench_f, start_server_f, shutdown_server_f):
     parser = argparse.ArgumentParser(description=f"AMON, a Wind Farm Blackbox. Use \033[94mAMON_HOME\033[0m in filepaths to refer to: \033[94m{AMON_HOME}\033[0m. The provided starting points are in \033[94mAMON_HOME/starting_pts/xn.txt\033[0m")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
@@ -13,11 +14,37 @@ def create_parser(run_f, windrose_f, show_zone_f, show_turbine_f, show_elevation
     parser_run.add_argument("point", metavar="POINT", help=f"\033[94mPath from current directory to file containing point to evaluate.\033[0m")
     parser_run.add_argument("-r", action='store_true', help="Send requests to the server instead of directly running")
     parser_run.add_argument("-s", type=int, metavar='SEED', help='Set the seed')
-    parser_run.add_argument("-f", type=int, metavar='FIDELITY', default=1, help='Set fidelity (between 0 and 1)')
+    parser_run.add_argument("-f", type=float, metavar='FIDELITY', default=1, help='Set fidelity (between 0 and 1)')
     parser_run.add_argument("--port", metavar="PORT", help="Port number")
+    parser_run.add_argument("--socket", metavar="SOCKET_PATH", help="With -r, send the request to the Unix socket of the server (serve --socket) instead of its port")
+    parser_run.add_argument("--max-memory", type=float, metavar="MEMORY_MB", help="Split the simulation of the time series in chunks that fit in this memory (MB), and report the peak memory")
+    parser_run.add_argument("--no-cache", action='store_true', help="Do not use the evaluation cache")
+    parser_run.add_argument("--no-snapshot", action='store_true', help="Build the instance from the data files instead of restoring its snapshot from a previous run")
+    parser_run.add_argument("--barrier", type=float, nargs='?', const=0., metavar="THRESHOLD", help="Compute the constraints first, and skip the simulation (objective set to inf) if the sum of the spacing, placing and height constraints is above THRESHOLD (default: 0)")
+    parser_run.add_argument("--replications", type=int, metavar="K", help="Evaluate the point with the seeds SEED, SEED+1, ..., SEED+K-1 in one simulation, and show the mean, standard deviation, and output of each seed")
+    parser_run.add_argument("--gradient", action='store_true', help="Also show the gradient of each output with respect to the coordinates of the turbines (x_1 y_1 x_2 y_2 ...), one output per line")
+    parser_run.add_argument("--profile", nargs='?', const='-', metavar="FILE", help="Run without the evaluation cache, and write the wall time, CPU time and peak memory of each stage of the evaluation as json to FILE (default: stderr)")
+    parser_run.add_argument("--cprofile", metavar="FILE", help="Run without the evaluation cache, and dump the cProfile statistics of the run to FILE (pstats format)")
+    parser_run.add_argument("--surrogate", action='store_true', help="Predict the output (and its standard deviation) with a surrogate trained on the cached evaluations, instead of running the blackbox")
     parser_run.add_argument("--debug", action='store_true', help='Show full error messages')
     parser_run.set_defaults(func=run_f)
 
+    # Command: run-batch (to evaluate many points of the same instance in parallel)
+    parser_batch = subparsers.add_parser("run-batch", help="\033[94mRun Blackbox on many points in parallel\033[0m")
+    parser_batch.add_argument("instance_or_param_file", metavar="INSTANCE/PARAM_FILE", help=f"\033[94mId of instance or path from current directory to parameter file.\033[0m")
+    parser_batch.add_argument("points", metavar="POINTS", help=f"\033[94mPath from current directory to file containing the points to evaluate, one per line.\033[0m")
+    parser_batch.add_argument("-r", action='store_true', help="Send requests to the server instead of directly running")
+    parser_batch.add_argument("-s", type=int, metavar='SEED', help='Set the seed (used for every point)')
+    parser_batch.add_argument("-f", type=float, metavar='FIDELITY', default=1, help='Set fidelity (between 0 and 1)')
+    parser_batch.add_argument("--workers", type=int, metavar="NB_WORKERS", help="Number of worker processes (default: number of CPUs)")
+    parser_batch.add_argument("--port", metavar="PORT", help="Port number")
+    parser_batch.add_argument("--socket", metavar="SOCKET_PATH", help="With -r, send the points to the Unix socket of the server (serve --socket) instead of its port")
+    parser_batch.add_argument("--max-memory", type=float, metavar="MEMORY_MB", help="Split the simulation of the time series in chunks that fit in this memory (MB)")
+    parser_batch.add_argument("--no-cache", action='store_true', help="Do not use the evaluation cache")
+    parser_batch.add_argument("--barrier", type=float, nargs='?', const=0., metavar="THRESHOLD", help="Compute the constraints first, and skip the simulation (objective set to inf) if the sum of the spacing, placing and height constraints is above THRESHOLD (default: 0)")
+    parser_batch.add_argument("--debug", action='store_true', help='Show full error messages')
+    parser_batch.set_defaults(func=run_batch_f)
+
     # Command: windrose (to show the windrose of wind_data_n folder)
     parser_windrose = subparsers.add_parser("show-windrose", help="\033[94mDisplay windrose plot\033[0m")
     parser_windrose.add_argument("wind_data_id", type=int, metavar="WIND_DATA_ID", help="\033[94mId of wind data\033[0m")
@@ -56,20 +83,58 @@ def create_parser(run_f, windrose_f, show_zone_f, show_turbine_f, show_elevation
     parser_instance.add_argument("--debug", action='store_true', help='Show full error messages')
     parser_instance.set_defaults(func=instance_info_f)
 
+    # Command: gen-start (feasible starting points of an instance)
+    parser_gen_start = subparsers.add_parser("gen-start", help="\033[94mGenerate feasible starting points\033[0m")
+    parser_gen_start.add_argument("instance_or_param_file", metavar="INSTANCE/PARAM_FILE", help=f"\033[94mId of instance or path from current directory to parameter file.\033[0m")
+    parser_gen_start.add_argument("--n", type=int, metavar="NB_TURBINES", help="Number of turbines of each layout (default: NB_WIND_TURBINES of the instance, required if it is VAR)")
+    parser_gen_start.add_argument("--count", type=int, metavar="K", default=1, help="Number of starting points to generate (default: 1)")
+    parser_gen_start.add_argument("-s", type=int, metavar='SEED', help='Set the seed')
+    parser_gen_start.add_argument("--types", type=int, nargs='+', metavar="TYPE", help="Turbine types (indices from 0, like in point files) drawn at random for each turbine, if TYPES is an optimization variable (default: 0)")
+    parser_gen_start.add_argument("--output", metavar="FOLDER", default="starting_points", help="Folder where the point files x1.txt, x2.txt, ... and points.txt (every point, one per line) are written (default: starting_points)")
+    parser_gen_start.add_argument("--debug", action='store_true', help='Show full error messages')
+    parser_gen_start.set_defaults(func=gen_start_f)
+
     # Command : check
     parser_check = subparsers.add_parser("check", help='\033[94mValidate output\033[0m')
     parser_check.add_argument("--debug", action='store_true', help='Show full error messages')
     parser_check.set_defaults(func=check_f)
 
+    # Command : cache (on-disk cache of evaluations)
+    parser_cache = subparsers.add_parser("cache", help='\033[94mShow or clear the evaluation cache\033[0m')
+    parser_cache.add_argument("action", choices=['stats', 'clear'], help="\033[94mShow statistics about the cache, or remove every cached evaluation\033[0m")
+    parser_cache.add_argument("--debug", action='store_true', help='Show full error messages')
+    parser_cache.set_defaults(func=cache_f)
+
+    # Command : bench (performance of the blackbox over a matrix of instances, fidelities and seeds)
+    parser_bench = subparsers.add_parser("bench", help='\033[94mBenchmark the time, memory and accuracy of the blackbox\033[0m')
+    parser_bench.add_argument("--instances", type=int, nargs='+', metavar="INSTANCE", default=DEFAULT_BENCH_INSTANCES, help=f"Instances to evaluate, on their starting point (default: {' '.join(map(str, DEFAULT_BENCH_INSTANCES))})")
+    parser_bench.add_argument("--fidelities", type=float, nargs='+', metavar="FIDELITY", default=DEFAULT_BENCH_FIDELITIES, help=f"Fidelities to evaluate each instance with (default: {' '.join(map(str, DEFAULT_BENCH_FIDELITIES))})")
+    parser_bench.add_argument("--seeds", type=int, nargs='+', metavar="SEED", default=DEFAULT_BENCH_SEEDS, help=f"Seeds to evaluate each instance and fidelity with (default: {' '.join(map(str, DEFAULT_BENCH_SEEDS))})")
+    parser_bench.add_argument("--startup", action='store_true', help="Instead of the matrix, measure the import time of the run, run -r and instance-info commands, and exit with an error if one is over its budget")
+    parser_bench.add_argument("--output", metavar="FILE", default="bench.json", help="Save the results as json to FILE (default: bench.json)")
+    parser_bench.add_argument("--baseline", metavar="FILE", help="Compare the results to the ones saved in FILE, and exit with an error if there is a regression")
+    parser_bench.add_argument("--time-threshold", type=float, metavar="RATIO", default=DEFAULT_BENCH_TIME_THRESHOLD, help=f"Regression if the build or evaluation time increases by more than RATIO (default: {DEFAULT_BENCH_TIME_THRESHOLD})")
+    parser_bench.add_argument("--memory-threshold", type=float, metavar="RATIO", default=DEFAULT_BENCH_MEMORY_THRESHOLD, help=f"Regression if the peak memory increases by more than RATIO (default: {DEFAULT_BENCH_MEMORY_THRESHOLD})")
+    parser_bench.add_argument("--aep-threshold", type=float, metavar="RATIO", default=DEFAULT_BENCH_AEP_THRESHOLD, help=f"Regression if the AEP changes by more than RATIO (default: {DEFAULT_BENCH_AEP_THRESHOLD})")
+    parser_bench.add_argument("--debug", action='store_true', help='Show full error messages')
+    parser_bench.set_defaults(func=bench_f)
+
     # Command: start server
     parser_server = subparsers.add_parser("serve", help="\033[94mStart server\033[0m")
     parser_server.add_argument("--port", type=int, metavar="PORT", help="Port number")
+    parser_server.add_argument("--socket", metavar="SOCKET_PATH", help="Also listen on a Unix socket at SOCKET_PATH, which has a lower latency than the port")
+    parser_server.add_argument("--cache-size", type=int, metavar="NB_INSTANCES", default=DEFAULT_CACHE_SIZE, help=f"Maximum number of built instances kept in memory (default: {DEFAULT_CACHE_SIZE})")
+    parser_server.add_argument("--cache-max-rss", type=float, metavar="MEMORY_MB", help="Evict built instances while the server uses more than this memory (MB)")
+    parser_server.add_argument("--no-cache", action='store_true', help="Do not use the evaluation cache")
+    parser_server.add_argument("--workers", type=int, metavar="NB_WORKERS", help="Evaluate the requests on a pool of NB_WORKERS worker processes, so up to NB_WORKERS requests are evaluated at the same time (default: one request at a time in the server process)")
+    parser_server.add_argument("--warm-start", action='store_true', help="Start the wake solver from the solution of the previous evaluation of the instance when the layout is close, and print the number of iterations of the solver")
     parser_server.add_argument("--debug", action='store_true', help='Show full error messages')
     parser_server.set_defaults(func=start_server_f)
 
     # Command : stop server
     parser_server = subparsers.add_parser("shutdown", help="\033[94mStop server\033[0m")
     parser_server.add_argument("--port", type=int, metavar="PORT", help="Port number")
+    parser_server.add_argument("--socket", metavar="SOCKET_PATH", help="Shut down the server listening on this Unix socket instead of the one on the port")
     parser_server.add_argument("--debug", action='store_true', help='Show full error messages')
     parser_server.set_defaults(func=shutdown_server_f)
 
@@ -0,0 +1,124 @@
+# batch.py
+import multiprocessing
+import os
+import threading
+import time
+
+import amon.src.utils as utils
+
+
+# Built blackbox of the batch being evaluated. It is set before the workers are forked, so that they inherit it and never
+# have to import PyWake or build the instance again. Workers started by a forkserver receive it pickled, see _evalTasks
+_windfarm_data = None
+_blackbox      = None
+
+# @brief   : Evaluates several points of the same instance, in parallel over a pool of worker processes
+# @params  : - param_filepath : path to the param file
+#            - fidelity       : float between 0 and 1
+#            - points         : list of strings, each one the space-separated values of a point (a line of a point file)
+#            - seed           : seed set before every evaluation, so each point gets the same output as with "amon run"
+#            - workers        : number of worker processes, None for the number of CPUs
+#            - max_memory     : memory budget (MB) of each simulation, see Blackbox.AEP
+#            - instance_cache : InstanceCache to take the built blackbox from, if None the blackbox is built from scratch
+#            - eval_cache     : EvalCache to take the outputs of already evaluated points from, None to evaluate every point
+#            - barrier        : threshold of the extreme barrier, overrides the BARRIER of the param file, see blackbox.evalPoint
+#            - worker_pool    : WorkerPool of the server (serve --workers) to evaluate the points on, with the blackboxes built by
+#                               its workers. None to fork new workers from the blackbox built here
+# @returns : list of (success, result) tuples in the same order as the points. result is the blackbox output (string) if
+#            success is True, and the error message otherwise. An error on one point does not affect the others
+def runBatch(param_filepath, fidelity, points, seed, workers=None, max_memory=None, instance_cache=None, eval_cache=None, barrier=None, worker_pool=None):
+    # Take the points that were already evaluated from the cache, only the others are sent to the workers
+    results = [None] * len(points)
+    tasks   = [] # (index of the point, values of the point)
+    for index, point in enumerate(points):
+        try:
+            values = [float(value) for value in point.split()]
+        except ValueError as e:
+            results[index] = (False, f"\033[91mError\033[0m: Problem with point: {e}")
+            continue
+        bbo = eval_cache.get(param_filepath, fidelity, values, seed, max_memory, barrier) if eval_cache is not None else None
+        if bbo is not None:
+            results[index] = (True, bbo)
+        else:
+            tasks.append((index, values))
+    if not tasks:
+        return results
+
+    evaluation_tasks = [(values, seed, max_memory, barrier) for _, values in tasks]
+    if worker_pool is not None:
+        evaluated = worker_pool.evalPoints(param_filepath, fidelity, evaluation_tasks)
+    else:
+        evaluated = _evalTasks(param_filepath, fidelity, evaluation_tasks, workers, instance_cache)
+
+    # Only this process writes to the cache
+    for (index, values), (success, result, eval_time, warm_started) in zip(tasks, evaluated):
+        results[index] = (success, result)
+        if success and eval_cache is not None and not warm_started: # See runBB
+            eval_cache.put(param_filepath, fidelity, values, seed, max_memory, result, eval_time, barrier)
+    return results
+
+# Builds the blackbox and evaluates the tasks over a pool of workers forked from this process
+def _evalTasks(param_filepath, fidelity, evaluation_tasks, workers, instance_cache):
+    global _windfarm_data, _blackbox
+
+    if instance_cache is None:
+        from amon.src.blackbox import buildBlackbox
+        _windfarm_data, _blackbox = buildBlackbox(param_filepath, fidelity)
+    else:
+        _windfarm_data, _blackbox = instance_cache.get(param_filepath, fidelity)
+    workers = min(workers or os.cpu_count() or 1, len(evaluation_tasks))
+
+    # Fork is needed for the workers to inherit the built blackbox. A process with other threads (the server) cannot be forked
+    # safely, a thread may hold a lock the workers would wait for forever. Its workers are started by a forkserver instead
+    # (a new process that imports PyWake once), and receive the built blackbox pickled like a snapshot. Without either,
+    # the points are evaluated one by one
+    start_methods = multiprocessing.get_all_start_methods()
+    if threading.active_count() == 1 and 'fork' in start_methods:
+        context, initargs = multiprocessing.get_context('fork'), None
+    elif 'forkserver' in start_methods:
+        context, initargs = multiprocessing.get_context('forkserver'), (_windfarm_data, _blackbox)
+        context.set_forkserver_preload(['amon.src.blackbox'])
+    else:
+        workers = 1
+    if workers <= 1:
+        return [_evalTask(task) for task in evaluation_tasks]
+    with context.Pool(workers, initializer=_setBlackbox if initargs else None, initargs=initargs or ()) as pool:
+        return pool.map(_evalTask, evaluation_tasks, chunksize=1)
+
+def _setBlackbox(windfarm_data, blackbox):
+    global _windfarm_data, _blackbox
+    _windfarm_data, _blackbox = windfarm_data, blackbox
+
+# Runs in the worker processes, with the blackbox inherited from runBatch (or set by _setBlackbox)
+def _evalTask(task):
+    return evalTask(_windfarm_data, _blackbox, *task)
+
+# @brief   : Evaluates a point of a batch, errors are returned instead of raised so they do not stop the other points
+# @params  : - windfarm_data, blackbox   : built blackbox of the instance
+#            - values                    : list of floats, values of the point
+#            - seed, max_memory, barrier : see runBatch
+# @returns : tuple (success, result, evaluation time, whether the solver was warm started)
+def evalTask(windfarm_data, blackbox, values, seed, max_memory, barrier):
+    from amon.src.blackbox import evalPoint
+
+    try:
+        try:
+            point = utils.parsePoint(values, windfarm_data.nb_turbines, windfarm_data.opt_variables)
+        except Exception as e:
+            raise ValueError(f"\033[91mError\033[0m: Problem with point: {e}")
+        start_time = time.perf_counter()
+        utils.setSeed(seed)
+        bbo = ''
+        for output in evalPoint(windfarm_data, blackbox, point, max_memory=max_memory, barrier=barrier):
+            bbo += f'{output} '
+        return True, bbo, time.perf_counter() - start_time, blackbox.warm_started
+    except Exception as e:
+        return False, str(e), None, False
+
+# Reads a file with one point per line, empty lines are ignored
+def getPoints(points_filepath):
+    try:
+        with open(points_filepath, 'r') as file:
+            return [line for line in file.read().splitlines() if line.split()]
+    except FileNotFoundError:
+        raise FileNotFoundError(f"\033[91mError\033[0m: No points file at {points_filepath}")
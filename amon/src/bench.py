@@ -0,0 +1,204 @@
+# bench.py
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import amon.src.utils as utils
+from amon.src.utils import AMON_HOME, STARTUP_BUDGETS, DEFAULT_BENCH_TIME_THRESHOLD, DEFAULT_BENCH_MEMORY_THRESHOLD, DEFAULT_BENCH_AEP_THRESHOLD
+
+
+# Time differences below this (s) are timer noise, they are never regressions
+BENCH_MIN_TIME_DIFFERENCE = 0.05
+
+# Commands timed by the startup benchmark, the import time of each is the smallest over a few runs
+STARTUP_COMMANDS = { 'instance-info'   : ['instance-info', '1'],
+                     'run -r'          : ['run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-r', '--port', '9'], # Nothing listens on port 9
+                     'run -r --socket' : ['run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-r', '--socket', str(AMON_HOME / 'no_server.sock')], # No server listens on it
+                     'run'             : ['run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-s', '1', '--no-cache', '--no-snapshot'] }
+STARTUP_REPEATS  = 3
+
+
+# @brief   : Runs the benchmark matrix (instances x fidelities x seeds), saves the results as json, and compares them to a
+#            baseline if one is given
+# @params  : args : argparse namespace of the bench command
+# @returns : int, the number of regressions found against the baseline
+def runBench(args):
+    instances, fidelities, seeds = args.instances, args.fidelities, args.seeds
+    for fidelity in fidelities:
+        if not 0 <= fidelity <= 1:
+            raise ValueError(f"\033[91mError\033[0m: Fidelities must be between 0 and 1, got {fidelity}")
+    baseline = _loadResults(args.baseline) if args.baseline is not None else None
+
+    # Each (instance, fidelity) runs in a new process, so its time and memory do not depend on what ran before
+    print(f"{'INSTANCE':>8} {'FIDELITY':>8} {'SEED':>4} {'BUILD (s)':>10} {'EVAL (s)':>10} {'ITERATIONS':>10} {'PEAK (MB)':>10}")
+    cases = []
+    context = multiprocessing.get_context('spawn')
+    for instance in instances:
+        for fidelity in fidelities:
+            with context.Pool(1) as pool:
+                instance_cases = pool.apply(_benchInstance, (instance, fidelity, seeds))
+            for case in instance_cases:
+                print(f"{case['instance']:>8} {case['fidelity']:>8} {case['seed']:>4} {case['build_time']:>10.3f} {case['eval_time']:>10.3f} {str(case['solver_iterations']):>10} {case['peak_rss_mb']:>10.1f}")
+            cases += instance_cases
+    _setAEPErrors(cases)
+
+    results = { 'environment' : _getEnvironment(),
+                'matrix'      : { 'instances' : instances, 'fidelities' : fidelities, 'seeds' : seeds },
+                'cases'       : cases }
+    output_filepath = utils.getPath(args.output)
+    with open(output_filepath, 'w') as file:
+        json.dump(results, file, indent=4)
+    print(f"Results saved to {output_filepath}")
+
+    if baseline is None:
+        return 0
+    regressions = compareResults(results, baseline, args.time_threshold, args.memory_threshold, args.aep_threshold)
+    for regression in regressions:
+        print(f"\033[91mREGRESSION\033[0m: {regression}")
+    if not regressions:
+        print(f"\033[92mNO REGRESSION\033[0m against {args.baseline}")
+    return len(regressions)
+
+# @brief   : Measures the import time of the run -r (HTTP and Unix socket), run and instance-info commands (python -X importtime), and compares it
+#            to the budgets of utils.STARTUP_BUDGETS
+# @params  : args : argparse namespace of the bench command
+# @returns : int, the number of commands over their budget
+def runStartupBench(args):
+    print(f"{'COMMAND':>16} {'IMPORTS (s)':>12} {'BUDGET (s)':>11} {'WALL (s)':>9} {'MODULES':>8}  FORBIDDEN MODULES")
+    commands  = []
+    nb_over   = 0
+    for name, command in STARTUP_COMMANDS.items():
+        budget  = STARTUP_BUDGETS[name]
+        results = [_timeStartup(command) for _ in range(STARTUP_REPEATS)]
+        result  = min(results, key=lambda result: result['import_time'])
+        modules = result.pop('modules')
+        result['forbidden_modules'] = [module for module in budget['forbidden_modules'] if module in modules]
+        over = result['import_time'] > budget['import_time'] or result['forbidden_modules']
+        nb_over += bool(over)
+        status = "\033[91mOVER BUDGET\033[0m" if over else "\033[92mOK\033[0m"
+        print(f"{name:>16} {result['import_time']:>12.3f} {budget['import_time']:>11.3f} {result['wall']:>9.3f} {result['nb_modules']:>8}  {' '.join(result['forbidden_modules']) or '-'}  {status}")
+        commands.append({ 'command' : name, 'budget' : budget, **result })
+
+    output_filepath = utils.getPath(args.output)
+    with open(output_filepath, 'w') as file:
+        json.dump({ 'environment' : _getEnvironment(), 'startup' : commands }, file, indent=4)
+    print(f"Results saved to {output_filepath}")
+    return nb_over
+
+# Runs a command in a new interpreter, and sums the cumulative import time of the top-level imports
+def _timeStartup(command):
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([str(AMON_HOME.parent)] + os.environ.get('PYTHONPATH', '').split(os.pathsep)))
+    with tempfile.TemporaryDirectory() as cache_dir: # Empty caches, so run builds and evaluates
+        environment['AMON_CACHE_DIR'] = cache_dir
+        start_time = time.perf_counter()
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-m', 'amon.src.main'] + command,
+                                 env=environment, capture_output=True, text=True)
+        wall = time.perf_counter() - start_time
+    import_time, modules = 0, set()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, module = line.split('|')
+        modules.add(module.strip())
+        if not module.startswith('  '): # Nested imports are indented, their time is in the cumulative time of their parent
+            import_time += int(cumulative) * 1e-6
+    return { 'import_time' : round(import_time, 6),
+             'wall'        : round(wall, 6),
+             'nb_modules'  : len(modules),
+             'modules'     : { module.split('.')[0] for module in modules } }
+
+# @brief   : Compares benchmark results to a baseline, case by case (same instance, fidelity and seed). Cases that are not
+#            in both are ignored
+# @params  : - results, baseline : dicts, as saved by runBench
+#            - time_threshold    : maximum relative increase of the evaluation and build times
+#            - memory_threshold  : maximum relative increase of the peak memory
+#            - aep_threshold     : maximum relative change of the AEP
+# @returns : list of strings, one per regression
+def compareResults(results, baseline, time_threshold=DEFAULT_BENCH_TIME_THRESHOLD, memory_threshold=DEFAULT_BENCH_MEMORY_THRESHOLD, aep_threshold=DEFAULT_BENCH_AEP_THRESHOLD):
+    baseline_cases = { (case['instance'], case['fidelity'], case['seed']) : case for case in baseline['cases'] }
+    regressions = []
+    for case in results['cases']:
+        key = (case['instance'], case['fidelity'], case['seed'])
+        if key not in baseline_cases:
+            continue
+        base = baseline_cases[key]
+        name = f"instance {key[0]}, fidelity {key[1]}, seed {key[2]}"
+        for field in ['build_time', 'eval_time']:
+            if case[field] > base[field] * (1 + time_threshold) and case[field] - base[field] > BENCH_MIN_TIME_DIFFERENCE:
+                regressions.append(f"{name}: {field} {case[field]:.3f} s, baseline {base[field]:.3f} s (+{case[field] / base[field] - 1:.0%})")
+        if case['peak_rss_mb'] > base['peak_rss_mb'] * (1 + memory_threshold):
+            regressions.append(f"{name}: peak memory {case['peak_rss_mb']:.1f} MB, baseline {base['peak_rss_mb']:.1f} MB (+{case['peak_rss_mb'] / base['peak_rss_mb'] - 1:.0%})")
+        if case['aep'] is not None and base['aep'] is not None and abs(case['aep'] - base['aep']) > aep_threshold * abs(base['aep']):
+            regressions.append(f"{name}: AEP {case['aep']} GWh, baseline {base['aep']} GWh")
+    return regressions
+
+# Runs in a new process: builds the instance at this fidelity and evaluates its starting point with every seed
+def _benchInstance(instance, fidelity, seeds):
+    import amon.src.profiling as profiling
+
+    start_time = time.perf_counter()
+    from amon.src.blackbox import buildBlackbox, evalPoint
+    import_time = time.perf_counter() - start_time
+
+    param_filepath = utils.getParamFilepath(instance)
+    start_time = time.perf_counter()
+    windfarm_data, blackbox = buildBlackbox(param_filepath, fidelity)
+    build_time = time.perf_counter() - start_time
+    point = utils.getPoint(AMON_HOME / 'starting_pts' / f'x{instance}.txt', windfarm_data.nb_turbines, windfarm_data.opt_variables)
+
+    cases = []
+    for seed in seeds:
+        utils.setSeed(seed)
+        profiling.start()
+        outputs = evalPoint(windfarm_data, blackbox, point)
+        profile = profiling.stop()
+        cases.append({ 'instance'          : instance,
+                       'fidelity'          : fidelity,
+                       'seed'              : seed,
+                       'aep_mode'          : windfarm_data.aep_mode,
+                       'import_time'       : import_time,
+                       'build_time'        : build_time,
+                       'eval_time'         : profile['wall'],
+                       'cpu_time'          : profile['cpu'],
+                       'simulation_time'   : profile['stages'].get('simulation', {}).get('wall'),
+                       'solver_iterations' : max(profile.get('solver_iterations', [0])),
+                       'peak_rss_mb'       : utils.getPeakRSS(),
+                       'aep'               : getattr(blackbox, 'aep', None), # GWh
+                       'outputs'           : [output if output == '-' else float(output) for output in outputs] })
+    return cases
+
+# Relative error of the AEP of each case against the AEP of the highest fidelity of the same instance and seed
+def _setAEPErrors(cases):
+    reference = {}
+    for case in cases:
+        key = (case['instance'], case['seed'])
+        if case['aep'] is not None and (key not in reference or case['fidelity'] > reference[key]['fidelity']):
+            reference[key] = case
+    for case in cases:
+        reference_case = reference.get((case['instance'], case['seed']))
+        if case['aep'] is None or reference_case is None:
+            case['aep_error'] = None
+        else:
+            case['aep_error'] = abs(case['aep'] - reference_case['aep']) / abs(reference_case['aep'])
+
+def _getEnvironment():
+    import numpy
+    import py_wake
+    return { 'date'      : time.strftime('%Y-%m-%d %H:%M:%S'),
+             'python'    : sys.version.split()[0],
+             'platform'  : platform.platform(),
+             'cpu_count' : os.cpu_count(),
+             'py_wake'   : py_wake.__version__,
+             'numpy'     : numpy.__version__ }
+
+def _loadResults(filepath):
+    try:
+        with open(utils.getPath(filepath), 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"\033[91mError\033[0m: No benchmark results at {filepath}")
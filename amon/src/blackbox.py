@@ -1,10 +1,13 @@
 # blackbox.py
 import shapely
+import sys
+import time
 from pathlib import Path
 import numpy as np
 
 from py_wake.wind_farm_models.engineering_models import All2AllIterative
 
+import amon.src.profiling as profiling
 import amon.src.utils as utils
 from amon.src.cost import lifetimeCost
 from amon.src.windfarm_data import WindFarmData
@@ -13,33 +16,279 @@ from amon.src.windfarm_data import WindFarmData
 # NOTE : The distinction between types and models is as follows : type is the index of the chosen model in the param file specified models, and model is the index of the model in the available models
 #        Example : there are models 1, 3, 4 in the param file, the type 3 is the model 4.
 
-# @brief : 
-def runBB(args):
+# @brief   : Runs the blackbox on the point file given in args
+# @params  : - args           : object with the same attributes as the argparse namespace of the run command
+#            - instance_cache : InstanceCache to take the built blackbox from, if None the blackbox is built from scratch
+#            - eval_cache     : EvalCache to take the output from if this point was already evaluated, None to always evaluate
+# @returns : string, the blackbox output
+def runBB(args, instance_cache=None, eval_cache=None):
     utils.setSeed(args.s)
     param_filepath = Path(args.instance_or_param_file)
+    max_memory     = getattr(args, 'max_memory', None)
+    barrier        = getattr(args, 'barrier', None)
 
-    # Construct the blackbox
-    windfarm_data = WindFarmData(param_filepath, args.f)
-
-    windfarm = All2AllIterative( site                  = windfarm_data.site,
-                                 windTurbines          = windfarm_data.wind_turbines,
-                                 wake_deficitModel     = windfarm_data.wake_deficit_model,
-                                 superpositionModel    = windfarm_data.superposition_model,
-                                 blockage_deficitModel = windfarm_data.blockage_deficit_model,
-                                 deflectionModel       = windfarm_data.deflection_model,
-                                 turbulenceModel       = windfarm_data.turbulence_model,
-                                 rotorAvgModel         = windfarm_data.rotor_avg_model,
-                                 convergence_tolerance = windfarm_data.convergence_tolerance ) 
-    buildable_zone = windfarm_data.buildable_zone
-
-    budget     = windfarm_data.budget
-    bbo_fields = windfarm_data.bbo
+    # Get the values of the point to evaluate
+    point_filepath = utils.getPath(args.point, includes_file=True)
+    values = utils.getPointValues(point_filepath)
 
-    blackbox = Blackbox(windfarm, buildable_zone, lifetime=240, sale_price=75.900, budget=budget)
+    # The gradients are never cached, they take 2n + 1 simulations and are only asked for a few points
+    if getattr(args, 'gradient', False):
+        windfarm_data, blackbox, point = _getInstanceAndPoint(param_filepath, args.f, values, instance_cache)
+        outputs, gradients = evalGradient(windfarm_data, blackbox, point, max_memory=max_memory)
+        return formatGradient(outputs, gradients)
 
-    # Get the point to evaluate
-    point_filepath = utils.getPath(args.point, includes_file=True)
-    point = utils.getPoint(point_filepath, windfarm_data.nb_turbines, windfarm_data.opt_variables)
+    replications = getattr(args, 'replications', None)
+    if replications is not None:
+        return _runReplications(args, param_filepath, values, replications, max_memory, barrier, instance_cache, eval_cache)
+
+    # Get the output if the point was already evaluated
+    if eval_cache is not None:
+        bbo = eval_cache.get(param_filepath, args.f, values, args.s, max_memory, barrier)
+        if bbo is not None:
+            return bbo
+
+    windfarm_data, blackbox, point = _getInstanceAndPoint(param_filepath, args.f, values, instance_cache)
+
+    # Set the blackbox output
+    start_time = time.perf_counter()
+    bbo = ''
+    for output in evalPoint(windfarm_data, blackbox, point, max_memory=max_memory, barrier=barrier):
+        bbo += f'{output} '
+    # With warm start (server), the iterations of the wake solver are shown to measure what it saves. A warm-started output
+    # depends on the previous evaluations (within the tolerance of the solver), so it is not cached
+    if blackbox.warm_start is not None and blackbox.iterations is not None:
+        print(f"Solver iterations: {blackbox.iterations}{' (warm start)' if blackbox.warm_started else ''}", file=sys.stderr)
+    if eval_cache is not None and not blackbox.warm_started:
+        eval_cache.put(param_filepath, args.f, values, args.s, max_memory, bbo, time.perf_counter() - start_time, barrier)
+    return bbo
+
+# Evaluates the point once per seed (args.s, args.s + 1, ...), only the seeds that are not in the evaluation cache are simulated.
+# The outputs of the stacked simulation only match the ones of "amon run" up to rounding errors, so they are not added to the
+# cache, where "amon run -s" would then return them instead of its own
+def _runReplications(args, param_filepath, values, replications, max_memory, barrier, instance_cache, eval_cache):
+    if replications < 1:
+        raise ValueError("\033[91mError\033[0m: The number of replications must be at least 1")
+    seeds   = [None] * replications if args.s is None else [args.s + i for i in range(replications)]
+    outputs = [None] * replications
+    if eval_cache is not None:
+        for i, seed in enumerate(seeds):
+            bbo = eval_cache.get(param_filepath, args.f, values, seed, max_memory, barrier)
+            if bbo is not None:
+                outputs[i] = [output if output == '-' else float(output) for output in bbo.split()]
+
+    missing = [i for i in range(replications) if outputs[i] is None]
+    if missing:
+        windfarm_data, blackbox, point = _getInstanceAndPoint(param_filepath, args.f, values, instance_cache)
+        evaluated = evalReplications(windfarm_data, blackbox, point, [seeds[i] for i in missing], max_memory=max_memory, barrier=barrier)
+        for i, output in zip(missing, evaluated):
+            outputs[i] = output
+    return formatReplications(outputs)
+
+# Constructs the blackbox, or gets the one that was already built for this instance, and splits the values of the point
+def _getInstanceAndPoint(param_filepath, fidelity, values, instance_cache):
+    if instance_cache is None:
+        windfarm_data, blackbox = buildBlackbox(param_filepath, fidelity)
+    else:
+        windfarm_data, blackbox = instance_cache.get(param_filepath, fidelity)
+    try:
+        point = utils.parsePoint(values, windfarm_data.nb_turbines, windfarm_data.opt_variables)
+    except Exception as e:
+        raise ValueError(f"\033[91mError\033[0m: Problem with point file: {e}")
+    return windfarm_data, blackbox, point
+
+# @brief   : Builds everything needed to evaluate points, this is the expensive part that does not depend on the point
+# @params  : - param_filepath : path to the param file
+#            - fidelity       : float between 0 and 1
+#            - warm_start     : if True, the wake solver starts from the solution of the previous evaluation when the layout is
+#                               close (server only), see warm_start.py. Otherwise it is the plain All2AllIterative of PyWake
+# @returns : tuple (WindFarmData, Blackbox)
+def buildBlackbox(param_filepath, fidelity, warm_start=False):
+    with profiling.stage('build'):
+        windfarm_data = WindFarmData(param_filepath, fidelity)
+
+        with profiling.stage('build.wind_farm_model'):
+            wind_farm_model = All2AllIterative
+            if warm_start:
+                from amon.src.warm_start import WarmStartAll2AllIterative
+                wind_farm_model = WarmStartAll2AllIterative
+            windfarm = wind_farm_model( site                  = windfarm_data.site,
+                                        windTurbines          = windfarm_data.wind_turbines,
+                                        wake_deficitModel     = windfarm_data.wake_deficit_model,
+                                        superpositionModel    = windfarm_data.superposition_model,
+                                        blockage_deficitModel = windfarm_data.blockage_deficit_model,
+                                        deflectionModel       = windfarm_data.deflection_model,
+                                        turbulenceModel       = windfarm_data.turbulence_model,
+                                        rotorAvgModel         = windfarm_data.rotor_avg_model,
+                                        convergence_tolerance = windfarm_data.convergence_tolerance ) 
+        buildable_zone = windfarm_data.buildable_zone
+        budget         = windfarm_data.budget
+
+        blackbox = Blackbox(windfarm, buildable_zone, lifetime=240, sale_price=75.900, budget=budget)
+        if warm_start:
+            from amon.src.warm_start import WarmStart
+            blackbox.warm_start = WarmStart()
+    return windfarm_data, blackbox
+
+# @brief   : Evaluates a point with an already built blackbox. The seed must already be set
+# @params  : - windfarm_data : WindFarmData of the instance
+#            - blackbox      : Blackbox of the instance
+#            - point         : dict, as returned by utils.getPoint
+#            - max_memory    : memory budget (MB) of the simulation, see Blackbox.AEP. None for no budget
+#            - barrier       : threshold of the extreme barrier, overrides the BARRIER of the param file. See _isBarrierHit
+# @returns : list, the value of each field of the blackbox output ('-' for the budget of an instance without budget)
+def evalPoint(windfarm_data, blackbox, point, max_memory=None, barrier=None):
+    layout = _getLayout(windfarm_data, point)
+    blackbox.iterations, blackbox.warm_started = None, False
+
+    # Calculate constraints first, they are cheap and the simulation is not needed if they are too violated
+    with profiling.stage('constraints'):
+        constraints = _getConstraints(blackbox, layout)
+    if _isBarrierHit(windfarm_data, constraints, barrier):
+        return _getOutputs(windfarm_data, blackbox, layout, constraints, barrier_hit=True)
+
+    # Calculate annual energy production
+    with profiling.stage('wind_perturbation'):
+        wind = _perturbWindData(windfarm_data)
+    _computeAEP(windfarm_data, blackbox, layout, wind, max_memory)
+    return _getOutputs(windfarm_data, blackbox, layout, constraints)
+
+# @brief   : Evaluates a point and the gradient of each output with respect to the coordinates of the turbines. The seed must
+#            already be set. The gradient of the AEP is computed by forward finite differences, with the same perturbed wind data
+#            for every shifted layout (the automatic differentiation of PyWake is not accurate with the blockage model), and the
+#            gradients of the spacing and placing constraints are analytic
+# @params  : - windfarm_data : WindFarmData of the instance
+#            - blackbox      : Blackbox of the instance
+#            - point         : dict, as returned by utils.getPoint
+#            - max_memory    : memory budget (MB) of each simulation, see Blackbox.AEP. None for no budget
+# @returns : tuple (outputs, gradients). outputs is as returned by evalPoint, gradients is a list with, for each output, a 1D
+#            numpy array of its derivative with respect to x_1, y_1, x_2, y_2, ... (the order of COORDS in a point file),
+#            or '-' for the budget of an instance without budget
+def evalGradient(windfarm_data, blackbox, point, max_memory=None):
+    layout = _getLayout(windfarm_data, point)
+    wind   = _perturbWindData(windfarm_data)
+
+    # With warm start, every shifted layout starts the wake solver from the solution of the previous one, which is at most
+    # 2 cm away. The warm start is new for each gradient, so the gradient does not depend on the previous evaluations
+    warm_start = blackbox.warm_start
+    if warm_start is not None:
+        from amon.src.warm_start import WarmStart
+        blackbox.warm_start = WarmStart()
+    try:
+        aep = _computeAEP(windfarm_data, blackbox, layout, wind, max_memory)
+        aep_gradient = _getAEPGradient(windfarm_data, blackbox, layout, wind, aep, max_memory)
+    finally:
+        blackbox.warm_start = warm_start
+    blackbox.aep = aep
+
+    constraints = _getConstraints(blackbox, layout)
+    outputs     = _getOutputs(windfarm_data, blackbox, layout, constraints)
+    constraints_gradients = blackbox.constraintsGradients(layout['x'], layout['y'], layout['diameters'])
+    constraints_gradients['height'] = np.zeros_like(aep_gradient)
+    constraints_gradients['budget'] = '-' if constraints['budget'] == '-' else np.zeros_like(aep_gradient)
+
+    # Gradient of the objective, from the gradient of the AEP (the cost does not depend on the coordinates)
+    obj_function = windfarm_data.obj_function.lower()
+    if obj_function == 'aep':
+        OBJ, obj_gradient = -aep, -aep_gradient
+    elif obj_function == 'roi':
+        OBJ, obj_gradient = -blackbox.ROI(layout['models'], layout['heights'], layout['default_heights']), -blackbox.sale_price * aep_gradient
+    else:
+        OBJ = blackbox.LCOE(layout['models'], layout['heights'], layout['default_heights']) # cost / (aep * lifetime)
+        obj_gradient = -OBJ / aep * aep_gradient
+
+    # Same steps as utils.penalizeObj
+    if windfarm_data.constraint_free:
+        penalized_OBJ = OBJ + abs(OBJ) * 0.05 * constraints['placing']
+        obj_gradient  = obj_gradient * (1 + np.sign(OBJ) * 0.05 * constraints['placing']) + abs(OBJ) * 0.05 * constraints_gradients['placing']
+        obj_gradient  = obj_gradient * (1 + np.sign(penalized_OBJ) * 0.1 * constraints['spacing']) + abs(penalized_OBJ) * 0.1 * constraints_gradients['spacing']
+
+    gradients = []
+    for field in windfarm_data.bbo:
+        gradient = obj_gradient if field == 'OBJ' else constraints_gradients[field.lower()]
+        gradients.append(gradient if isinstance(gradient, str) else gradient.ravel())
+    return outputs, gradients
+
+# @brief   : Formats the outputs of a point and their gradients
+# @params  : outputs, gradients : as returned by evalGradient
+# @returns : string, the blackbox output on the first line, then the gradient of each output on its own line ('-' for the
+#            budget of an instance without budget)
+def formatGradient(outputs, gradients):
+    lines = [' '.join(f'{value}' for value in outputs)]
+    for gradient in gradients:
+        lines.append(gradient if isinstance(gradient, str) else ' '.join(f'{value}' for value in gradient))
+    return '\n'.join(lines)
+
+# @brief   : Evaluates a point once per seed, with the perturbed wind data of every seed simulated in a single PyWake call
+# @params  : - windfarm_data : WindFarmData of the instance
+#            - blackbox      : Blackbox of the instance
+#            - point         : dict, as returned by utils.getPoint
+#            - seeds         : list of seeds, one per replication (None for a random seed)
+#            - max_memory    : memory budget (MB) of the simulation, see Blackbox.replicatedAEPs. None for no budget
+#            - barrier       : threshold of the extreme barrier, overrides the BARRIER of the param file. See _isBarrierHit
+# @returns : list with the output of each replication, each one as returned by evalPoint
+def evalReplications(windfarm_data, blackbox, point, seeds, max_memory=None, barrier=None):
+    layout = _getLayout(windfarm_data, point)
+
+    # The constraints checked by the barrier do not depend on the seed, only the budget does
+    if _isBarrierHit(windfarm_data, _getConstraints(blackbox, layout), barrier):
+        outputs = []
+        for seed in seeds:
+            utils.setSeed(seed)
+            outputs.append(_getOutputs(windfarm_data, blackbox, layout, barrier_hit=True))
+        return outputs
+
+    # Draw the perturbation of every replication, and keep the state of the generator after it, which is where the
+    # evaluation of this seed would continue drawing from
+    wind_speeds, wind_directions, states = [], [], []
+    for seed in seeds:
+        utils.setSeed(seed)
+        if windfarm_data.aep_mode != 'windrose':
+            ws, wd = _perturbWindData(windfarm_data)
+            wind_speeds.append(ws)
+            wind_directions.append(wd)
+        states.append(np.random.get_state())
+
+    # The wind rose is not perturbed, so every replication has the same AEP
+    if windfarm_data.aep_mode == 'windrose':
+        aeps = [blackbox.windroseAEP(layout['x'], layout['y'], wd=windfarm_data.wind_rose_wd, ws=windfarm_data.wind_rose_ws, probabilities=windfarm_data.wind_rose_P, types=layout['types'], heights=layout['absolute_heights'], yaw_angles=layout['yaw_angles'])] * len(seeds)
+    else:
+        aeps = blackbox.replicatedAEPs(layout['x'], layout['y'], ws=wind_speeds, wd=wind_directions, types=layout['types'], heights=layout['absolute_heights'], yaw_angles=layout['yaw_angles'], max_memory=max_memory)
+
+    outputs = []
+    for seed, aep, state in zip(seeds, aeps, states):
+        utils.setSeed(seed) # The cost of the farm draws from a generator seeded with utils.SEED
+        np.random.set_state(state)
+        blackbox.aep = aep
+        outputs.append(_getOutputs(windfarm_data, blackbox, layout))
+    return outputs
+
+# @brief   : Formats the outputs of the replications of a point
+# @params  : outputs : list with the output of each replication, as returned by evalReplications
+# @returns : string, the mean of each output on the first line, their standard deviation on the second, then the output of
+#            each replication on its own line ('-' for the budget of an instance without budget)
+def formatReplications(outputs):
+    columns = list(zip(*outputs))
+    means = ['-' if '-' in column else np.mean(column) for column in columns]
+    stds  = ['-' if '-' in column else np.std(column) for column in columns]
+    lines = [means, stds] + outputs
+    return '\n'.join(' '.join(f'{value}' for value in line) for line in lines)
+
+# Gradient of the AEP with respect to the coordinates of the turbines (one row per turbine), by forward finite differences
+def _getAEPGradient(windfarm_data, blackbox, layout, wind, aep, max_memory):
+    aep_gradient = np.zeros((len(layout['x']), 2))
+    for i in range(len(layout['x'])):
+        for axis, coordinate in enumerate(['x', 'y']):
+            shifted = dict(layout)
+            shifted[coordinate] = list(layout[coordinate])
+            shifted[coordinate][i] += GRADIENT_STEP
+            # The turbine moves on the ground, so its absolute height follows the elevation
+            shifted['absolute_heights'] = list(layout['absolute_heights'])
+            shifted['absolute_heights'][i] += windfarm_data.elevation_function(shifted['x'][i], shifted['y'][i]) - windfarm_data.elevation_function(layout['x'][i], layout['y'][i])
+            aep_gradient[i, axis] = (_computeAEP(windfarm_data, blackbox, shifted, wind, max_memory) - aep) / GRADIENT_STEP
+    return aep_gradient
+
+# Turbines of the point, with everything that is needed to simulate them and compute the constraints
+def _getLayout(windfarm_data, point):
     x, y = [float(x) for x in point['coords'][0::2]], [float(y) for y in point['coords'][1::2]]
     types = point['types']
     models = []
@@ -50,109 +299,213 @@ def runBB(args):
             raise ValueError(f"\033[91mError\033[0m: Only {len(windfarm_data.wind_turbines_models)} turbines available, specified {i + 1} or more")
     
     diameters = [windfarm_data.wind_turbines.diameter(i) for i in types]
-    elevation_function = windfarm_data.elevation_function
     default_heights = [windfarm_data.wind_turbines.hub_height(type_) for type_ in types]
-    heights = point['heights'] if point['heights'] is not None else default_heights # Actual height of the turbine
-    absolute_heights = [] # Height with respect to the zone's origin
-    if heights is None:
-        for x_i, y_i, default_height in zip(x, y, default_heights): # If height not specified, the model's default height is used
-            absolute_heights.append(default_height + elevation_function(x_i, y_i))
-    else:
-        for height, x_i, y_i in zip(heights, x, y):
-            absolute_heights.append(height + elevation_function(x_i, y_i))
+    heights = point['heights'] if point['heights'] is not None else default_heights # Actual height of the turbine, the model's default height if not specified
     yaw_angles = point['yaw']
 
-    if not (len(x) == len(y) == len(types) == len(absolute_heights) == len(yaw_angles)):
+    if not (len(x) == len(y) == len(types) == len(heights) == len(yaw_angles)):
         raise ValueError("\033[91mError\033[0m: All fields of evaluated point (x, y, types, heights, yaw) must have the same dimensions")
-    # Perturbation of wind data
-    wind_speeds     = []
-    wind_directions = []
-    for ws in windfarm_data.WS_BB:
-        wind_speeds.append(np.random.normal(loc=ws, scale=1))
-    for wd in windfarm_data.WD_BB:
-        wind_directions.append(np.random.normal(loc=wd, scale=14))
-    # print(f"(x, y)   : ({x}, {y})")
-    # print(f"Types    : {types}")
-    # print(f"Models   : {models}")
-    # print(f"Heights  : {heights}")
-    # print(f"Diameters: {diameters}")
-    # print(f"Yaw      : {yaw_angles}")
-    # Calculate constraints and annual energy production
-    aep = blackbox.AEP(x, y, ws=wind_speeds, wd=wind_directions, types=types, heights=absolute_heights, yaw_angles=yaw_angles)
-    constraints = blackbox.constraints(x, y, models, diameters, heights, default_heights)
+
+    # Height with respect to the zone's origin, the elevation of every turbine in one call
+    absolute_heights = (np.asarray(heights, dtype=float) + windfarm_data.elevation_function(np.array(x), np.array(y))).tolist()
+
+    return { 'x'                : x,
+             'y'                : y,
+             'types'            : types,
+             'models'           : models,
+             'diameters'        : diameters,
+             'heights'          : heights,
+             'default_heights'  : default_heights,
+             'absolute_heights' : absolute_heights,
+             'yaw_angles'       : yaw_angles }
+
+# AEP of the layout, on the perturbed wind data (ws, wd) or on the wind rose, depending on the AEP mode of the instance
+def _computeAEP(windfarm_data, blackbox, layout, wind, max_memory):
+    if wind is None:
+        # The wind rose is not perturbed, the probability of each bin already averages the time series
+        return blackbox.windroseAEP(layout['x'], layout['y'], wd=windfarm_data.wind_rose_wd, ws=windfarm_data.wind_rose_ws, probabilities=windfarm_data.wind_rose_P, types=layout['types'], heights=layout['absolute_heights'], yaw_angles=layout['yaw_angles'])
+    wind_speeds, wind_directions = wind
+    return blackbox.AEP(layout['x'], layout['y'], ws=wind_speeds, wd=wind_directions, types=layout['types'], heights=layout['absolute_heights'], yaw_angles=layout['yaw_angles'], max_memory=max_memory)
+
+# Perturbation of wind data. The whole series is drawn at once, which gives the same values as drawing each element in turn.
+# None if the AEP is computed on the wind rose, which is not perturbed
+def _perturbWindData(windfarm_data):
+    if windfarm_data.aep_mode == 'windrose':
+        return None
+    wind_speeds     = np.random.normal(loc=windfarm_data.WS_BB.values, scale=1)
+    wind_directions = np.random.normal(loc=windfarm_data.WD_BB.values, scale=14)
+    return wind_speeds, wind_directions
+
+def _getConstraints(blackbox, layout):
+    return blackbox.constraints(layout['x'], layout['y'], layout['models'], layout['diameters'], layout['heights'], layout['default_heights'])
+
+# The extreme barrier is hit when the sum of the spacing, placing and height constraints (in meters) is above the threshold.
+# The threshold is the one given, or the BARRIER of the param file. If there is none, the barrier is never hit
+def _isBarrierHit(windfarm_data, constraints, barrier):
+    threshold = barrier if barrier is not None else windfarm_data.barrier
+    if threshold is None:
+        return False
+    return constraints['spacing'] + constraints['placing'] + constraints['height'] > threshold
+
+# Constraints and objective of the layout, with the AEP that was last computed by the blackbox. If the barrier was hit, the
+# objective is inf and the AEP is not used
+def _getOutputs(windfarm_data, blackbox, layout, constraints=None, barrier_hit=False):
+    bbo_fields = windfarm_data.bbo
+    models, heights, default_heights = layout['models'], layout['heights'], layout['default_heights']
+
+    # Calculate constraints
+    if constraints is None:
+        constraints = _getConstraints(blackbox, layout)
 
     # Get the right objective function
-    if windfarm_data.obj_function.lower() == 'aep':
-        OBJ = -aep
+    if barrier_hit:
+        OBJ = float('inf')
+    elif windfarm_data.obj_function.lower() == 'aep':
+        OBJ = -blackbox.aep
     elif windfarm_data.obj_function.lower() == 'roi':
         OBJ = -blackbox.ROI(models, heights, default_heights)
     else:
         OBJ = blackbox.LCOE(models, heights, default_heights)
 
     # If this is a constraint-free instance, penalize the objective function according to the constraints
-    if windfarm_data.constraint_free:
+    if windfarm_data.constraint_free and not barrier_hit:
         OBJ = utils.penalizeObj(OBJ, constraints)
 
-    # Set the blackbox output
-    bbo = ''
+    # Get the blackbox output, in the order of the param file
+    outputs = []
     for field in bbo_fields:
         if field == 'OBJ':
-            bbo += f'{OBJ} '
+            outputs.append(OBJ)
         else:
-            bbo += f'{constraints[field.lower()]} '
-    return bbo
+            outputs.append(constraints[field.lower()])
+    return outputs
+
 
+# Step (m) of the finite differences used for the gradient of the AEP
+GRADIENT_STEP = 1e-2
+
+# Approximate memory PyWake needs for one flow case, per pair of turbines, measured with tracemalloc on the instances
+# (between 730 and 930 bytes, whatever the rotor average model). Used to size the chunks of the time series
+BYTES_PER_FLOW_CASE_PER_TURBINE_PAIR = 1000
 
 
 class Blackbox:
     def __init__(self, wind_farm, buildable_zone, lifetime, sale_price, budget):
         self.wind_farm      = wind_farm
         self.buildable_zone = buildable_zone
+        shapely.prepare(self.buildable_zone)
         self.lifetime       = lifetime
         self.sale_price     = sale_price # per GWh
         self.budget         = budget
+        self.warm_start     = None  # WarmStart to start the solver from the previous solution, None to always start from scratch
+        self.iterations     = None  # Iterations of the wake solver in the last AEP computation (the most over its chunks)
+        self.warm_started   = False # True if the last AEP computation started from a previous solution
+
+    # Pickled geometries are not prepared anymore (instance snapshots, see snapshot.py)
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        shapely.prepare(self.buildable_zone)
     
-    def AEP(self, x, y, ws, wd, types, heights, yaw_angles): # returns in GW
-        self.aep = float(self.wind_farm(x, y, ws=ws, wd=wd, type=types, time=True, n_cpu=None, h=heights, yaw=yaw_angles, tilt=0).aep().sum())
+    # If max_memory (MB) is given, the time series is split in chunks that each fit in that memory, and the energy of every
+    # chunk is summed. This caps the memory used by PyWake, which otherwise grows with turbines^2 x time samples
+    def AEP(self, x, y, ws, wd, types, heights, yaw_angles, max_memory=None): # returns in GW
+        if max_memory is None:
+            self.__resetSolverStats()
+            self.aep = float(self.__simulate(0, x, y, ws, wd, types, heights, yaw_angles).aep().sum())
+            return self.aep
+
+        chunk_size = max(1, int(max_memory * 1024**2 / (BYTES_PER_FLOW_CASE_PER_TURBINE_PAIR * len(x)**2)))
+        energy = 0 # Wh
+        self.__resetSolverStats()
+        for start in range(0, len(ws), chunk_size):
+            power = self.__simulate(start, x, y, ws[start:start+chunk_size], wd[start:start+chunk_size], types, heights, yaw_angles).Power.values
+            energy += power.sum()
+        self.aep = float(energy / len(ws) * 24 * 365 * 1e-9)
         return self.aep
 
+    # AEP of several replications of the wind time series, all simulated in one PyWake call (split in chunks that fit in
+    # max_memory if it is given, like AEP). ws and wd are lists with the time series of each replication
+    def replicatedAEPs(self, x, y, ws, wd, types, heights, yaw_angles, max_memory=None): # returns in GW
+        lengths = [len(ws_replication) for ws_replication in ws]
+        ws, wd  = np.concatenate(ws), np.concatenate(wd)
+        if max_memory is None:
+            chunk_size = len(ws)
+        else:
+            chunk_size = max(1, int(max_memory * 1024**2 / (BYTES_PER_FLOW_CASE_PER_TURBINE_PAIR * len(x)**2)))
+        farm_power = np.empty(len(ws)) # W, power of the whole farm for each flow case
+        self.__resetSolverStats()
+        for start in range(0, len(ws), chunk_size):
+            power = self.__simulate(start, x, y, ws[start:start+chunk_size], wd[start:start+chunk_size], types, heights, yaw_angles).Power.values
+            farm_power[start:start+chunk_size] = power.sum(axis=0)
+        aeps = []
+        for replication_power in np.split(farm_power, np.cumsum(lengths)[:-1]):
+            aeps.append(float(replication_power.sum() / len(replication_power) * 24 * 365 * 1e-9))
+        return aeps
+
+    # AEP weighted by the probability of each (wd, ws) bin of the wind rose. Only the non-empty bins are simulated, as a
+    # series of flow cases, which is the same as the full wd x ws grid but with far fewer cases than the time series
+    def windroseAEP(self, x, y, wd, ws, probabilities, types, heights, yaw_angles): # returns in GW
+        self.__resetSolverStats()
+        power = self.__simulate('windrose', x, y, ws, wd, types, heights, yaw_angles).Power.values # W, turbines x flow cases
+        self.aep = float((power.sum(axis=0) * probabilities).sum() * 24 * 365 * 1e-9)
+        return self.aep
+
+    # Simulation of the flow cases, started from the previous solution of the same flow cases (key) if warm start is enabled
+    def __simulate(self, key, x, y, ws, wd, types, heights, yaw_angles):
+        start = {}
+        if self.warm_start is not None:
+            start = self.warm_start.get(key, x, y, heights, types, ws, wd, self.wind_farm.windTurbines.diameter(types))
+        with profiling.stage('simulation'):
+            simulation_result = self.wind_farm(x, y, ws=ws, wd=wd, type=types, time=True, n_cpu=None, h=heights, yaw=yaw_angles, tilt=0, **start)
+        if self.warm_start is not None:
+            self.warm_start.put(key, x, y, heights, types, ws, wd, simulation_result)
+        self.warm_started |= bool(start)
+        if 'iterations' in simulation_result: # Counted over every chunk by the warm start solver
+            iterations = int(simulation_result.iterations.values.max())
+        else: # The plain All2AllIterative keeps the iterations of its last chunk
+            iterations = getattr(self.wind_farm, 'iterations', None)
+        if iterations is not None:
+            self.iterations = max(self.iterations or 0, int(iterations))
+            profiling.record('solver_iterations', int(iterations))
+        return simulation_result
+
+    def __resetSolverStats(self):
+        self.iterations   = None
+        self.warm_started = False
+
     def ROI(self, chosen_models, heights, default_heights):
-        cost_over_lifetime = lifetimeCost(chosen_models, heights, default_heights, self.lifetime)
+        with profiling.stage('cost'):
+            cost_over_lifetime = lifetimeCost(chosen_models, heights, default_heights, self.lifetime)
         return self.aep * self.sale_price - cost_over_lifetime
 
     def LCOE(self, chosen_models, heights, default_heights):
-        cost_over_lifetime = lifetimeCost(chosen_models, heights, default_heights, self.lifetime)
+        with profiling.stage('cost'):
+            cost_over_lifetime = lifetimeCost(chosen_models, heights, default_heights, self.lifetime)
         return cost_over_lifetime / (self.aep * self.lifetime)
     
     def constraints(self, x, y, chosen_models, diameters, heights, default_heights):
         # Spacing constraint
-        points = [shapely.Point(x_i, y_i) for x_i, y_i in zip(x, y)]
-        distance_matrix = [shapely.distance(point_i, points) for point_i in points]
-        for i in range(len(points)):
-            for j in range(0, i):
-                distance_matrix[i][j] = 0
-        
-        sum_dist_between_wt = 0
-        for i, list_distances in enumerate(distance_matrix):
-            for j, d in enumerate(list_distances):
-                if d == 0:
-                    continue
-                sum_dist_between_wt += min(d - diameters[i] - diameters[j], 0)
+        points    = shapely.points(x, y)
+        diameters = np.asarray(diameters)
+        _, _, _, excess_distances = self.__getTooClosePairs(points, diameters)
+        sum_dist_between_wt = sum(excess_distances)
         sum_dist_between_wt *= -1
 
         # Placing constraint
-        distances = shapely.distance(points, self.buildable_zone)
+        # The distance is 0 for the turbines inside the zone, which the prepared zone finds quickly
+        inside    = shapely.intersects_xy(self.buildable_zone, x, y)
+        distances = np.zeros(len(points))
+        distances[~inside] = shapely.distance(points[~inside], self.buildable_zone)
         sum_dist_buildable_zone = sum(distances)
 
         # Height constraints
-        max_heights = [utils.MAX_TURBINE_HEIGHTS[i] for i in chosen_models]
-        min_heights = [diameter / 2 for diameter in diameters]
-        sum_excess_height = 0
-        for height, max_height, min_height in zip(heights, max_heights, min_heights):
-            if height > max_height:
-                sum_excess_height += height - max_height
-            elif height < min_height:
-                sum_excess_height += min_height - height
+        heights     = np.asarray(heights)
+        max_heights = np.asarray(utils.MAX_TURBINE_HEIGHTS)[chosen_models]
+        min_heights = diameters / 2
+        too_high    = heights > max_heights
+        too_low     = ~too_high & (heights < min_heights)
+        excess_heights    = np.where(too_high, heights - max_heights, min_heights - heights)
+        sum_excess_height = sum(excess_heights[too_high | too_low])
 
         # Budget constraint
         if self.budget is None:
@@ -167,4 +520,42 @@ class Blackbox:
         return { 'placing' : sum_dist_buildable_zone, 
                  'spacing' : sum_dist_between_wt,
                  'budget'  : exceeded_budget,
-                 'height'  : sum_excess_height }
\ No newline at end of file
+                 'height'  : sum_excess_height }
+
+    # Gradients of the spacing and placing constraints with respect to the coordinates, as arrays of shape (turbines, 2).
+    # The height and budget constraints do not depend on the coordinates
+    def constraintsGradients(self, x, y, diameters):
+        points = shapely.points(x, y)
+
+        # Spacing constraint : each pair that is too close adds D_i + D_j - d_ij
+        spacing = np.zeros((len(points), 2))
+        i, j, distances, _ = self.__getTooClosePairs(points, np.asarray(diameters))
+        directions = (np.c_[np.asarray(x)[i] - np.asarray(x)[j], np.asarray(y)[i] - np.asarray(y)[j]]) / distances[:, None]
+        np.add.at(spacing, i, -directions)
+        np.add.at(spacing, j, directions)
+
+        # Placing constraint : each turbine outside of the zone adds its distance to the closest point of the zone
+        placing = np.zeros((len(points), 2))
+        outside = ~shapely.intersects_xy(self.buildable_zone, x, y)
+        if outside.any():
+            closest_lines = shapely.get_coordinates(shapely.shortest_line(points[outside], self.buildable_zone)).reshape(-1, 2, 2)
+            vectors = closest_lines[:, 0] - closest_lines[:, 1]
+            placing[outside] = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+
+        return { 'spacing' : spacing,
+                 'placing' : placing }
+
+    # Pairs of turbines closer than the sum of their diameters, in the order of a double loop over i < j (so sums over the pairs
+    # are exactly the same as with the loop). Coincident turbines are skipped. Only the pairs closer than the largest
+    # possible sum of diameters can break the constraint, so they are found with a spatial index
+    # Returns the indices i and j of each pair, their distance, and the distance minus the sum of diameters
+    def __getTooClosePairs(self, points, diameters):
+        max_distance = 2 * diameters.max() + 1 if len(points) else 0
+        i, j = shapely.STRtree(points).query(points, predicate='dwithin', distance=max_distance)
+        upper = i < j
+        order = np.lexsort((j[upper], i[upper])) # Row by row, like the double loop
+        i, j  = i[upper][order], j[upper][order]
+        distances = shapely.distance(points[i], points[j])
+        excess_distances = distances - diameters[i] - diameters[j]
+        too_close = (distances != 0) & (excess_distances <= 0)
+        return i[too_close], j[too_close], distances[too_close], excess_distances[too_close]
\ No newline at end of file
@@ -1,27 +1,69 @@
 # client.py
-import requests
+# requests is only imported for the HTTP requests, the requests to a Unix socket (--socket) only use the standard library
+
 
 def runBBRequest(args):
+    data = {
+        "instance_or_param_file" : args.instance_or_param_file,
+        "point"                  : args.point,
+        "s"                      : args.s,
+        "f"                      : args.f,
+        "max_memory"             : args.max_memory,
+        "surrogate"              : args.surrogate,
+        "replications"           : args.replications,
+        "gradient"               : args.gradient,
+        "barrier"                : args.barrier
+    }
+    if args.socket is not None:
+        from amon.src.unix_socket import request
+        return request(args.socket, "run", data)
+
+    import requests
     try:
-        response = requests.post(
-            f"http://localhost:{args.port}/run",
-            json={
-                "instance_or_param_file" : args.instance_or_param_file,
-                "point"                  : args.point,
-                "s"                      : args.s,
-                "f"                      : args.f
-            }
-        )
+        response = requests.post(f"http://localhost:{args.port}/run", json=data)
     except requests.exceptions.ConnectionError:
         raise requests.exceptions.ConnectionError(f"\033[91mError\033[0m: Could not connect to server at https://localhost:{args.port}")
 
     return response.text
 
+def runBatchRequest(args, points):
+    data = {
+        "instance_or_param_file" : args.instance_or_param_file,
+        "points"                 : points,
+        "s"                      : args.s,
+        "f"                      : args.f,
+        "workers"                : args.workers,
+        "max_memory"             : args.max_memory,
+        "barrier"                : args.barrier
+    }
+    if args.socket is not None:
+        from amon.src.unix_socket import request
+        return request(args.socket, "run-batch", data)
+
+    import requests
+    try:
+        response = requests.post(f"http://localhost:{args.port}/run-batch", json=data)
+    except requests.exceptions.ConnectionError:
+        raise requests.exceptions.ConnectionError(f"\033[91mError\033[0m: Could not connect to server at https://localhost:{args.port}")
+    if response.status_code != 200:
+        raise RuntimeError(response.text)
+    return response.json()
+
 def shutdownServer(args):
+    if args.socket is not None:
+        from amon.src.unix_socket import request
+        try:
+            request(args.socket, "shutdown")
+        except ConnectionError:
+            raise ConnectionError(f"\033[91mError\033[0m: No server at {args.socket}")
+        print("\033[92mServer shut down successfully\033[0m")
+        return
+
+    import requests
     try:
         response = requests.post(f"http://localhost:{args.port}/shutdown")
     except requests.exceptions.ConnectionError:
-        raise ConnectionError(f"\033[91mError\033[0m: No server at port {args.port}")        
+        raise ConnectionError(f"\033[91mError\033[0m: No server at port {args.port}")
     if response.status_code == 200:
         print("\033[92mServer shut down successfully\033[0m")
     else:
@@ -0,0 +1,61 @@
+# compiled_data.py
+import hashlib
+import os
+
+import numpy as np
+
+import amon.src.utils as utils
+
+
+# Bumped when the content of a compiled file changes, so old files are never reused
+COMPILED_DATA_VERSION = 1
+
+
+# Data files (wind data, power/ct curves, zones) compiled to binary files in the cache folder the first time they are
+# used. A compiled file is named after its source files and their size and modification time, so editing a source
+# compiles it again. The arrays are memory-mapped instead of parsed, and the buildable zone is read from WKB instead of
+# being rebuilt from the shapefiles.
+# If the cache folder cannot be written, the sources are parsed at every run, like without compiled data
+
+
+# @brief   : Returns an array compiled from data files, compiling it if needed
+# @params  : - name    : name of the compiled file, without dots
+#            - sources : paths of the data files the array is built from
+#            - build   : function without arguments that builds the array from the sources
+# @returns : numpy array, memory-mapped (read-only) when it was read from a compiled file
+def loadArray(name, sources, build):
+    filepath = _getCompiledFilepath(name, sources, '.npy')
+    if filepath.is_file():
+        try:
+            return np.load(filepath, mmap_mode='r', allow_pickle=False)
+        except (OSError, ValueError):
+            pass # Truncated or corrupted, compiled again
+    array = np.asarray(build())
+    utils.writeCacheFile(filepath, f"{name}.*", lambda file: np.save(file, array, allow_pickle=False))
+    return array
+
+# @brief   : Returns a geometry compiled from data files, compiling it if needed
+# @params  : - name    : name of the compiled file, without dots
+#            - sources : paths of the data files the geometry is built from
+#            - build   : function without arguments that builds the shapely geometry
+# @returns : shapely geometry
+def loadGeometry(name, sources, build):
+    import shapely
+
+    filepath = _getCompiledFilepath(name, sources, '.wkb')
+    if filepath.is_file():
+        try:
+            return shapely.from_wkb(filepath.read_bytes())
+        except (OSError, shapely.errors.GEOSException):
+            pass
+    geometry = build()
+    wkb = shapely.to_wkb(geometry) # WKB keeps the coordinates exactly
+    utils.writeCacheFile(filepath, f"{name}.*", lambda file: file.write(wkb))
+    return geometry
+
+def _getCompiledFilepath(name, sources, suffix):
+    stamp = hashlib.sha256(str(COMPILED_DATA_VERSION).encode())
+    for source in sources:
+        stat = os.stat(source)
+        stamp.update(f"{source}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return utils.getCacheDir() / 'data' / f"{name}.{stamp.hexdigest()[:16]}{suffix}"
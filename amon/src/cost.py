@@ -1,7 +1,6 @@
 # cost.py
+from collections import OrderedDict
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import weibull_min
 
 import amon.src.utils as utils
 
@@ -65,6 +64,18 @@ IEA_3_4_MW       = { 'price'      : 100,
 
 WIND_TURBINES_COSTS = [ V80_COST, OPEN_WIND_COST, IEA_22MW_COST, V82_COST, BESPOKE_6MW_COST, IEA_3_4_MW ] # Indices consistent with data/wind_turbines folder
 
+# Costs of WIND_TURBINES_COSTS as arrays indexed by model, the parts in the order of beta
+PARTS_COSTS     = np.array([[costs['parts'][part] for part in beta] for costs in WIND_TURBINES_COSTS])
+PURCHASE_COSTS  = np.array([costs['price'] + costs['install'] for costs in WIND_TURBINES_COSTS])
+H_AUGMENT_COSTS = np.array([costs['h_augment'] for costs in WIND_TURBINES_COSTS])
+
+# Number of replacements of each part, per (seed, lifetime). With a seed, every turbine and every call (constraints and
+# objective of the same evaluation) draws the same lifespans, so they are only drawn once. The least recently used entries
+# are removed above REPLACEMENTS_CACHE_SIZE (a server evaluating many seeds)
+REPLACEMENTS_CACHE_SIZE = 1024
+_REPLACEMENTS_CACHE     = OrderedDict()
+
+
 # @brief   : Calculates the cost of the windfarm over its lifetime
 # @params  : - chosen_models   : list of integers, each corresponding to the id of the model chosen, one integer for each turbine placed
 #            - heights         : list of floats corresponding to the height of each turbine
@@ -72,50 +83,77 @@ WIND_TURBINES_COSTS = [ V80_COST, OPEN_WIND_COST, IEA_22MW_COST, V82_COST, BESPO
 #            - lifetime        : lifetime, in months, used for the calculation
 # @returns : float, lifetime cost of the wind farm
 def lifetimeCost(chosen_models, heights, default_heights, lifetime):
-    cost = 0
-    for chosen_model, height, default_height in zip(chosen_models, heights, default_heights):
-        price          = WIND_TURBINES_COSTS[chosen_model]['price']
-        parts_cost     = WIND_TURBINES_COSTS[chosen_model]['parts']
-        install_cost   = WIND_TURBINES_COSTS[chosen_model]['install']
-        h_augment_cost = WIND_TURBINES_COSTS[chosen_model]['h_augment']
-        parts_replacements = getNbReplacements(lifetime)
-        for part_cost, nb_replacements in zip(parts_cost.values(), parts_replacements.values()):
-            cost += part_cost * nb_replacements
-        height_added = height - default_height
-        if height_added > 0:
-            cost += h_augment_cost * height_added
-        cost += price + install_cost
-
-    return cost
-
+    chosen_models = np.asarray(chosen_models, dtype=int)
+    if len(chosen_models) == 0:
+        return 0
+    if utils.SEED is not None:
+        parts_replacements = np.tile(list(getNbReplacements(lifetime).values()), (len(chosen_models), 1))
+    else: # Random lifespans for each turbine
+        parts_replacements = np.array([list(getNbReplacements(lifetime).values()) for _ in chosen_models])
+    height_added = np.asarray(heights, dtype=float) - np.asarray(default_heights, dtype=float)
+
+    # One row of costs per turbine : its parts replacements, the augmented height, then its purchase and installation.
+    # They are summed in this order, turbine after turbine (cumsum adds them one by one), so the cost is exactly the same
+    # as when adding them in a loop
+    costs = np.column_stack([ PARTS_COSTS[chosen_models] * parts_replacements,
+                              np.where(height_added > 0, H_AUGMENT_COSTS[chosen_models] * height_added, 0),
+                              PURCHASE_COSTS[chosen_models] ])
+    return float(np.cumsum(costs.ravel())[-1])
+
+# @brief   : Draws the lifespans of each part (Weibull distributions of beta and theta) until the lifetime of the wind farm is
+#            reached, and counts the replacements. With a seed, the counts are computed once per lifetime and memoized
+# @params  : - lifetime : lifetime, in months
+#            - details  : print the lifespans drawn (not memoized)
+# @returns : dict, number of replacements of each part
 def getNbReplacements(lifetime, details=None):
+    key = (utils.SEED, lifetime)
+    if utils.SEED is None or details or key not in _REPLACEMENTS_CACHE:
+        nb_replacements = _drawNbReplacements(lifetime, details)
+        if utils.SEED is None or details:
+            return nb_replacements
+        _REPLACEMENTS_CACHE[key] = nb_replacements
+        if len(_REPLACEMENTS_CACHE) > REPLACEMENTS_CACHE_SIZE:
+            _REPLACEMENTS_CACHE.popitem(last=False)
+    _REPLACEMENTS_CACHE.move_to_end(key)
+    return dict(_REPLACEMENTS_CACHE[key])
+
+# Same draws as one weibull_min.rvs(k, scale=lambda, random_state=rng) per lifespan, the parts one after the other : rvs
+# takes one uniform from rng per lifespan and returns its inverse cdf (ppf), so the uniforms are drawn by blocks and
+# transformed at once, and the lifespans of a part are the next uniforms of the block
+def _drawNbReplacements(lifetime, details=None):
+    from scipy.stats import weibull_min
     rng = np.random.default_rng(utils.SEED)
+    uniforms = np.empty(0)
     nb_replacements = {}
     for part_name in beta:
         k = beta[part_name]
         lambd = theta[part_name]**(-1/k)
-        nb = 0
-        total_lifetime = 0
         if details:
             print(f"Part : {part_name}")
             print("---------------------------")
             print(f"k = {k}, lambda = {lambd:.4f}")
         while True:
-            part_lifespan = weibull_min.rvs(k, scale=lambd, random_state=rng)
-            if details:
-                print(f"For replacement {nb} : lifespan = {part_lifespan:.2f} months")
-            total_lifetime += part_lifespan
-            if total_lifetime >= lifetime:
+            part_lifespans = weibull_min.ppf(uniforms, k, scale=lambd)
+            total_lifetimes = np.cumsum(part_lifespans)
+            reached = np.flatnonzero(total_lifetimes >= lifetime)
+            if len(reached):
                 break
-            nb += 1
+            uniforms = np.concatenate([uniforms, rng.uniform(size=16)])
+        nb = int(reached[0])
+        if details:
+            for replacement, part_lifespan in enumerate(part_lifespans[:nb + 1]):
+                print(f"For replacement {replacement} : lifespan = {part_lifespan:.2f} months")
+        uniforms = uniforms[nb + 1:]
         nb_replacements[part_name] = nb
         if details:
             print(f"Total replacements needed  : {nb}")
             print(f"Cost of replacements : ${nb * v80_parts_costs[part_name]} 000")
-            print(f"Total part lifetime : {total_lifetime:.2f} months\n")
+            print(f"Total part lifetime : {total_lifetimes[nb]:.2f} months\n")
     return nb_replacements
 
 def plotWeibullPdfs(lifetime):
+    import matplotlib.pyplot as plt
+    from scipy.stats import weibull_min
     x = np.linspace(0, lifetime, lifetime*10)
     for part in beta:
         k = beta[part]
@@ -0,0 +1,118 @@
+# elevation.py
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+import amon.src.utils as utils
+from amon.src.compiled_data import loadArray
+
+
+# Elevation of the ground, called with arrays of x and y coordinates (or scalars) and returning an array of elevations of
+# the same shape. Three kinds :
+#     - AnalyticElevation : Python function of an elevation function file (ELEVATION_FUNCTION <id>)
+#     - RasterElevation   : grid of elevations in a .npy file (ELEVATION_FUNCTION <file.npy> <origin x> <origin y> <resolution>),
+#                           memory-mapped and interpolated bilinearly
+#     - the raster of an analytic function sampled over the zone (ELEVATION_RESOLUTION <resolution>), see sampleElevation
+# They can be pickled (instance snapshots), the data files are loaded again when unpickled
+
+
+# Elevation of the instances without ELEVATION_FUNCTION
+class NoElevation:
+    def __call__(self, x, y):
+        return np.zeros(np.broadcast_shapes(np.shape(x), np.shape(y)))
+
+class AnalyticElevation:
+    def __init__(self, filepath):
+        '''
+            @brief   : loads the function of an elevation function file
+            @params  : filepath : path to the .py file, which defines a single function f(x, y)
+            @returns : nothing
+        '''
+        self.filepath = Path(filepath)
+        self.function = utils.getFunctionFromFile(self.filepath)
+
+    def __call__(self, x, y):
+        x, y  = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        shape = np.broadcast_shapes(x.shape, y.shape)
+        # Functions written with numpy take the arrays at once, the others (math, if on the coordinates) are called per point
+        try:
+            elevations = np.asarray(self.function(x, y), dtype=float)
+            return np.broadcast_to(elevations, shape).copy()
+        except Exception:
+            return np.vectorize(self.function, otypes=[float])(x, y)
+
+    def __getstate__(self):
+        return { 'filepath' : self.filepath }
+
+    def __setstate__(self, state):
+        self.__init__(state['filepath'])
+
+class RasterElevation:
+    def __init__(self, elevations, origin_x, origin_y, resolution, filepath=None):
+        '''
+            @brief   : sets a grid of elevations, interpolated bilinearly between its nodes. Points outside the grid take the
+                       elevation of the closest edge
+            @params  : - elevations         : 2D array, elevations[j, i] is the elevation at (origin_x + i*resolution, origin_y + j*resolution)
+                       - origin_x, origin_y : coordinates of elevations[0, 0]
+                       - resolution         : distance between two nodes (m)
+                       - filepath           : .npy file the elevations were loaded from, None if they were computed
+            @returns : nothing
+        '''
+        elevations = elevations if isinstance(elevations, np.memmap) else np.asarray(elevations, dtype=float)
+        if elevations.ndim != 2 or min(elevations.shape) < 2:
+            raise ValueError(f"The elevation raster must be a 2D array with at least 2 rows and 2 columns, got shape {elevations.shape}")
+        if resolution <= 0:
+            raise ValueError(f"The resolution of the elevation raster must be positive, got {resolution}")
+        self.elevations = elevations
+        self.origin_x   = float(origin_x)
+        self.origin_y   = float(origin_y)
+        self.resolution = float(resolution)
+        self.filepath   = filepath
+
+    @classmethod
+    def load(cls, filepath, origin_x, origin_y, resolution):
+        try:
+            elevations = np.load(filepath, mmap_mode='r', allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read the elevation raster {filepath}: {e}")
+        return cls(elevations, origin_x, origin_y, resolution, filepath=Path(filepath))
+
+    def __call__(self, x, y):
+        nb_rows, nb_columns = self.elevations.shape
+        i = np.clip((np.asarray(x, dtype=float) - self.origin_x) / self.resolution, 0, nb_columns - 1)
+        j = np.clip((np.asarray(y, dtype=float) - self.origin_y) / self.resolution, 0, nb_rows - 1)
+        i0 = np.minimum(np.floor(i).astype(int), nb_columns - 2)
+        j0 = np.minimum(np.floor(j).astype(int), nb_rows - 2)
+        ti, tj = i - i0, j - j0
+        z = self.elevations
+        return ((1 - ti) * (1 - tj) * z[j0, i0] + ti * (1 - tj) * z[j0, i0 + 1] +
+                (1 - ti) * tj       * z[j0 + 1, i0] + ti * tj   * z[j0 + 1, i0 + 1])
+
+    # A raster of a file is memory-mapped again instead of being copied in the pickle
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['elevations'] = None if self.filepath is not None else np.asarray(self.elevations)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.filepath is not None:
+            self.elevations = np.load(self.filepath, mmap_mode='r', allow_pickle=False)
+
+
+# @brief   : Samples an analytic elevation on a raster over a rectangle, so evaluating it costs the same whatever the function.
+#            The raster is cached with the compiled data (see compiled_data.py), and sampled again if the function file changes
+# @params  : - elevation  : AnalyticElevation
+#            - bounds     : (x_min, y_min, x_max, y_max), rectangle covered by the raster
+#            - resolution : distance between two nodes of the raster (m)
+# @returns : RasterElevation
+def sampleElevation(elevation, bounds, resolution):
+    x_min, y_min, x_max, y_max = [float(bound) for bound in bounds]
+    x = x_min + resolution * np.arange(int(np.ceil((x_max - x_min) / resolution)) + 1)
+    y = y_min + resolution * np.arange(int(np.ceil((y_max - y_min) / resolution)) + 1)
+    key  = hashlib.sha256(json.dumps([x_min, y_min, x_max, y_max, float(resolution)]).encode()).hexdigest()[:16]
+    name = f"{elevation.filepath.stem}_raster_{key}"
+    elevations = loadArray(name, [elevation.filepath], lambda: elevation(*np.meshgrid(x, y)))
+    return RasterElevation(elevations, x_min, y_min, resolution)
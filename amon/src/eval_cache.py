@@ -0,0 +1,201 @@
+# eval_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import amon.src.utils as utils
+from amon.src.utils import AMON_HOME, DEFAULT_EVAL_CACHE_MAX_ENTRIES
+
+
+# Bumped when the content of the key or of the table changes, so old entries are never reused
+CACHE_VERSION = 2
+
+# Hashes of the source code and of the instances, and versions of the libraries, computed once per process
+_code_hash       = None
+_instance_hashes = {} # (param file, mtimes) -> hash
+_versions        = None
+
+
+# On-disk cache of blackbox outputs, shared by every process of the user (run, run-batch, server, check).
+# An evaluation is identified by a hash of the contents of the param file and of every data file it references, the
+# fidelity, the values of the point, the seed, the memory budget, the source code of amon and the versions of Python,
+# PyWake, numpy and shapely. Evaluations without a seed are random and are never cached.
+# The cache is a SQLite database in WAL mode, so several processes can read and write it at the same time.
+class EvalCache:
+    def __init__(self, cache_dir=None, max_entries=None):
+        '''
+            @brief   : opens the cache, creating it if needed
+            @params  : - cache_dir   : folder of the database. None for $AMON_CACHE_DIR, or $XDG_CACHE_HOME/amon,
+                                       or ~/.cache/amon
+                       - max_entries : maximum number of evaluations kept, the least recently used ones are removed.
+                                       None for $AMON_CACHE_MAX_ENTRIES, or DEFAULT_EVAL_CACHE_MAX_ENTRIES
+            @returns : nothing
+        '''
+        if cache_dir is None:
+            cache_dir = utils.getCacheDir()
+        if max_entries is None:
+            max_entries = int(os.environ.get('AMON_CACHE_MAX_ENTRIES', DEFAULT_EVAL_CACHE_MAX_ENTRIES))
+        if max_entries < 1:
+            raise ValueError("\033[91mError\033[0m: The evaluation cache must keep at least 1 entry")
+
+        self.cache_dir   = Path(cache_dir).expanduser()
+        self.filepath    = self.cache_dir / 'evaluations.sqlite'
+        self.max_entries = max_entries
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('''CREATE TABLE IF NOT EXISTS evaluations (
+                                      key        TEXT PRIMARY KEY,
+                                      instance   TEXT NOT NULL,
+                                      param_file TEXT NOT NULL,
+                                      fidelity   REAL NOT NULL,
+                                      seed       INTEGER NOT NULL,
+                                      point      TEXT NOT NULL,
+                                      bbo        TEXT NOT NULL,
+                                      eval_time  REAL NOT NULL,
+                                      created    REAL NOT NULL,
+                                      last_used  REAL NOT NULL,
+                                      hits       INTEGER NOT NULL DEFAULT 0 )''')
+            connection.execute('CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)')
+            connection.execute('CREATE INDEX IF NOT EXISTS evaluations_instance ON evaluations (instance, fidelity)')
+
+    def get(self, param_filepath, fidelity, values, seed, max_memory=None, barrier=None):
+        '''
+            @brief   : returns the cached output of an evaluation
+            @params  : - param_filepath : path to the param file
+                       - fidelity       : float between 0 and 1
+                       - values         : list of floats, the values of the point
+                       - seed           : seed of the evaluation
+                       - max_memory     : memory budget (MB) of the simulation
+                       - barrier        : threshold of the extreme barrier given instead of the one of the param file
+            @returns : string, the blackbox output, or None if it is not cached
+        '''
+        if seed is None:
+            return None
+        key = self.__getKey(param_filepath, fidelity, values, seed, max_memory, barrier)
+        with self.__connect() as connection:
+            row = connection.execute('SELECT bbo FROM evaluations WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE evaluations SET last_used = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+        return row[0]
+
+    def put(self, param_filepath, fidelity, values, seed, max_memory, bbo, eval_time, barrier=None):
+        '''
+            @brief   : stores the output of an evaluation, does nothing if the seed is None
+            @params  : same as get, and
+                       - bbo       : string, the blackbox output
+                       - eval_time : time taken by the evaluation, in seconds
+            @returns : nothing
+        '''
+        if seed is None:
+            return
+        key      = self.__getKey(param_filepath, fidelity, values, seed, max_memory, barrier)
+        instance = getInstanceHash(param_filepath)
+        now      = time.time()
+        with self.__connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                               (key, instance, str(param_filepath), float(fidelity), int(seed), json.dumps([float(value) for value in values]), bbo, eval_time, now, now))
+            nb_entries = connection.execute('SELECT COUNT(*) FROM evaluations').fetchone()[0]
+            if nb_entries > self.max_entries:
+                connection.execute('DELETE FROM evaluations WHERE key IN (SELECT key FROM evaluations ORDER BY last_used LIMIT ?)', (nb_entries - self.max_entries,))
+
+    def getEvaluations(self, param_filepath, fidelity, after=0):
+        '''
+            @brief   : returns the cached evaluations of an instance, whatever their seed, in the order they were added
+            @params  : - param_filepath : path to the param file
+                       - fidelity       : float between 0 and 1
+                       - after          : only the evaluations added after this row are returned
+            @returns : list of (row, point, bbo) tuples, point being the json list of the values of the point
+        '''
+        with self.__connect() as connection:
+            return connection.execute('SELECT rowid, point, bbo FROM evaluations WHERE instance = ? AND fidelity = ? AND rowid > ? ORDER BY rowid',
+                                      (getInstanceHash(param_filepath), float(fidelity), after)).fetchall()
+
+    def stats(self):
+        '''
+            @brief   : summary of the content of the cache
+            @returns : dict with the path and size of the database, the number of entries, hits and the time they saved,
+                       and the number of entries of each param file
+        '''
+        with self.__connect() as connection:
+            nb_entries, hits, saved_time = connection.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * eval_time), 0) FROM evaluations').fetchone()
+            per_param_file = connection.execute('SELECT param_file, COUNT(*) FROM evaluations GROUP BY param_file ORDER BY param_file').fetchall()
+        size = sum(filepath.stat().st_size for filepath in self.cache_dir.glob(self.filepath.name + '*'))
+        return { 'path'           : str(self.filepath),
+                 'size'           : size / 1024**2,
+                 'entries'        : nb_entries,
+                 'max_entries'    : self.max_entries,
+                 'hits'           : hits,
+                 'saved_time'     : saved_time,
+                 'per_param_file' : dict(per_param_file) }
+
+    def clear(self):
+        with self.__connect() as connection:
+            connection.execute('DELETE FROM evaluations')
+        with self.__connect() as connection:
+            connection.execute('VACUUM')
+
+    # A new connection is opened for every operation, so the cache can be used by threads and forked processes
+    def __connect(self):
+        return _Connection(self.filepath)
+
+    def __getKey(self, param_filepath, fidelity, values, seed, max_memory, barrier):
+        content = json.dumps([CACHE_VERSION, getCodeHash(), getVersions(), getInstanceHash(param_filepath), float(fidelity),
+                              [float(value) for value in values], int(seed), max_memory, barrier])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
+# Opens a connection for a single transaction, which is committed (or rolled back) and closed when leaving the with block
+class _Connection:
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+    def __enter__(self):
+        self.connection = sqlite3.connect(self.filepath, timeout=30)
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+        return False
+
+# Hash of the contents of the param file and of every data file it references. It is memoized on the modification times
+# of the files, so the files are only read again when they change
+def getInstanceHash(param_filepath):
+    filepaths, mtimes = utils.getInstanceFiles(param_filepath)
+    if mtimes not in _instance_hashes:
+        instance_hash = hashlib.sha256()
+        for filepath in filepaths:
+            instance_hash.update(filepath.name.encode())
+            instance_hash.update(filepath.read_bytes())
+        _instance_hashes[mtimes] = instance_hash.hexdigest()
+    return _instance_hashes[mtimes]
+
+# Hash of the source code, so that a change in the code never returns outputs computed by a previous version
+def getCodeHash():
+    global _code_hash
+    if _code_hash is None:
+        code_hash = hashlib.sha256()
+        for filepath in sorted((AMON_HOME / 'src').glob('*.py')):
+            code_hash.update(filepath.read_bytes())
+        _code_hash = code_hash.hexdigest()
+    return _code_hash
+
+# Versions of Python and of the libraries the outputs depend on, so that an upgrade never returns outputs computed by
+# the previous versions. They are read from the installed packages, importing PyWake would slow down the cache hits
+def getVersions():
+    global _versions
+    if _versions is None:
+        from importlib.metadata import version
+        _versions = [sys.version] + [version(package) for package in ['py_wake', 'numpy', 'shapely']]
+    return _versions
@@ -0,0 +1,127 @@
+# evaluator.py
+import numpy as np
+
+import amon.src.utils as utils
+
+
+# In-process access to the blackbox, for optimizers written in Python (PyNomad, scipy, etc.)
+# The blackbox is built once, then every evaluation only runs the simulation, without reading or writing files
+#
+# Example :
+#     from amon import Evaluator
+#     evaluator = Evaluator(1, fidelity=1, seed=1)
+#     outputs = evaluator.evaluate(x) # x is the point, in the same order as in a point file
+class Evaluator:
+    def __init__(self, instance_or_param_file, fidelity=1, seed=None, max_memory=None, barrier=None, warm_start=False):
+        '''
+            @brief   : builds the blackbox of an instance
+            @params  : - instance_or_param_file : id of the instance, or path to a param file
+                       - fidelity               : float between 0 and 1
+                       - seed                   : seed set before every evaluation, so that evaluating a point gives the
+                                                  same output as "amon run" with the same seed. None for a random seed
+                       - max_memory             : memory budget (MB) of each simulation, see Blackbox.AEP. None for no budget
+                       - barrier                : threshold of the extreme barrier, overrides the BARRIER of the param file.
+                                                  See blackbox.evalPoint
+                       - warm_start             : if True, the wake solver starts from the solution of the previous
+                                                  evaluation when the layout is close (outputs equal within the tolerance
+                                                  of the solver), see warm_start.py
+            @returns : nothing
+        '''
+        from amon.src.blackbox import buildBlackbox
+
+        self.param_filepath = utils.getParamFilepath(instance_or_param_file)
+        self.fidelity       = fidelity
+        self.seed           = seed
+        self.max_memory     = max_memory
+        self.barrier        = barrier
+        self.windfarm_data, self.blackbox = buildBlackbox(self.param_filepath, fidelity, warm_start)
+
+    @property
+    def bbo(self): # Names of the blackbox outputs, in order
+        return list(self.windfarm_data.bbo)
+
+    @property
+    def opt_variables(self): # Order of the variables in a point
+        return list(self.windfarm_data.opt_variables)
+
+    @property
+    def nb_turbines(self): # None if the instance has a variable number of turbines
+        return self.windfarm_data.nb_turbines
+
+    @property
+    def solver_iterations(self): # Iterations of the wake solver in the last evaluation, None if nothing was simulated
+        return self.blackbox.iterations
+
+    @property
+    def warm_started(self): # True if the wake solver of the last evaluation started from a previous solution
+        return self.blackbox.warm_started
+
+    def evaluate(self, x):
+        '''
+            @brief   : evaluates a point
+            @params  : x : 1D array_like, the point, with values in the same order as in a point file
+            @returns : 1D numpy array, the value of each blackbox output (nan for the budget of an instance without budget)
+        '''
+        from amon.src.blackbox import evalPoint
+
+        point = self.__parsePoint(x)
+        utils.setSeed(self.seed)
+        outputs = evalPoint(self.windfarm_data, self.blackbox, point, max_memory=self.max_memory, barrier=self.barrier)
+        return np.array([np.nan if output == '-' else float(output) for output in outputs])
+
+    def evaluate_replications(self, x, replications):
+        '''
+            @brief   : evaluates a point with several seeds (seed, seed + 1, ...), simulated together in one PyWake call
+            @params  : - x            : 1D array_like, the point, with values in the same order as in a point file
+                       - replications : number of seeds
+            @returns : tuple (mean, std, outputs), mean and std are 1D numpy arrays over the replications, outputs is a 2D
+                       numpy array with the blackbox outputs of one seed per row
+        '''
+        from amon.src.blackbox import evalReplications
+
+        if replications < 1:
+            raise ValueError("\033[91mError\033[0m: The number of replications must be at least 1")
+        point = self.__parsePoint(x)
+        seeds = [None] * replications if self.seed is None else [self.seed + i for i in range(replications)]
+        outputs = evalReplications(self.windfarm_data, self.blackbox, point, seeds, max_memory=self.max_memory, barrier=self.barrier)
+        outputs = np.array([[np.nan if output == '-' else float(output) for output in replication] for replication in outputs])
+        return outputs.mean(axis=0), outputs.std(axis=0), outputs
+
+    def gradient(self, x):
+        '''
+            @brief   : evaluates a point and the gradient of each output with respect to the coordinates of the turbines,
+                       see blackbox.evalGradient
+            @params  : x : 1D array_like, the point, with values in the same order as in a point file
+            @returns : tuple (outputs, gradients), outputs is a 1D numpy array as returned by evaluate, gradients is a 2D
+                       numpy array with the derivatives of one output per row, with respect to x_1, y_1, x_2, y_2, ... (nan for
+                       the budget of an instance without budget)
+        '''
+        from amon.src.blackbox import evalGradient
+
+        point = self.__parsePoint(x)
+        utils.setSeed(self.seed)
+        outputs, gradients = evalGradient(self.windfarm_data, self.blackbox, point, max_memory=self.max_memory)
+        nb_coords = len(point['coords'])
+        outputs   = np.array([np.nan if output == '-' else float(output) for output in outputs])
+        gradients = np.array([np.full(nb_coords, np.nan) if isinstance(gradient, str) else gradient for gradient in gradients])
+        return outputs, gradients
+
+    def evaluate_many(self, X):
+        '''
+            @brief   : evaluates several points, one after the other
+            @params  : X : 2D array_like, one point per row
+            @returns : 2D numpy array, one row of blackbox outputs per point
+        '''
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2:
+            raise ValueError(f"\033[91mError\033[0m: Points must be a 2D array, got shape {X.shape}")
+        return np.array([self.evaluate(x) for x in X]).reshape(len(X), len(self.windfarm_data.bbo))
+
+    def __parsePoint(self, x):
+        x = np.asarray(x, dtype=float)
+        if x.ndim != 1:
+            raise ValueError(f"\033[91mError\033[0m: Point must be a 1D array, got shape {x.shape}")
+        try:
+            return utils.parsePoint(x.tolist(), self.windfarm_data.nb_turbines, self.windfarm_data.opt_variables)
+        except Exception as e:
+            raise ValueError(f"\033[91mError\033[0m: Problem with point: {e}")
@@ -0,0 +1,80 @@
+# instance_cache.py
+import threading
+from collections import OrderedDict
+
+import amon.src.utils as utils
+from amon.src.utils import DEFAULT_CACHE_SIZE
+
+
+# LRU cache of built blackboxes (WindFarmData, All2AllIterative and Blackbox objects), used by the server so that
+# consecutive evaluations of the same instance do not rebuild everything from the data files.
+# An entry is identified by the resolved param file path and the fidelity, and is only reused if the modification times
+# of the param file and of every data file it references have not changed since it was built.
+class InstanceCache:
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, max_rss=None, warm_start=False):
+        '''
+            @brief   : creates an empty cache
+            @params  : - max_size : maximum number of built instances kept in memory
+                       - max_rss  : maximum resident memory of the process in MB, least recently used instances are
+                                    evicted (always keeping the last one) while it is exceeded. None for no limit
+                       - warm_start : if True, the wake solver of each built instance starts from the solution of the
+                                      previous evaluation of the instance when the layout is close, see warm_start.py
+            @returns : nothing
+        '''
+        if max_size < 1:
+            raise ValueError("\033[91mError\033[0m: The cache size must be at least 1")
+        self.max_size   = max_size
+        self.max_rss    = max_rss
+        self.warm_start = warm_start
+        self.entries    = OrderedDict() # key -> (mtimes, windfarm_data, blackbox), ordered from least to most recently used
+        self.hits       = 0
+        self.misses     = 0
+        self.lock       = threading.Lock()
+
+    def get(self, param_filepath, fidelity):
+        '''
+            @brief   : returns the built blackbox of an instance, building it if it is not cached or if it is outdated
+            @params  : - param_filepath : path to the param file
+                       - fidelity       : float between 0 and 1
+            @returns : tuple (WindFarmData, Blackbox)
+        '''
+        filepaths, mtimes = utils.getInstanceFiles(param_filepath)
+        param_filepath    = filepaths[0]
+        key               = (str(param_filepath), float(fidelity))
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == mtimes:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+            self.misses += 1
+
+        # Build outside of the lock, this is the slow part
+        from amon.src.blackbox import buildBlackbox
+        windfarm_data, blackbox = buildBlackbox(param_filepath, fidelity, self.warm_start)
+
+        with self.lock:
+            self.entries[key] = (mtimes, windfarm_data, blackbox)
+            self.entries.move_to_end(key)
+            self.__evict()
+        return windfarm_data, blackbox
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Evicts the least recently used instances until the cache respects its bounds, the most recent one is always kept
+    def __evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        if self.max_rss is None:
+            return
+        while len(self.entries) > 1:
+            rss = utils.getCurrentRSS()
+            if rss is None or rss <= self.max_rss:
+                break
+            self.entries.popitem(last=False)
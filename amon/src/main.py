@@ -3,12 +3,12 @@ import sys
 import warnings
 
 from amon.src.argparsing import create_parser
-from amon.src.utils import DEFAULT_PORT, INSTANCES_PARAM_FILEPATHS, getInstanceInfo, getPath, simple_excepthook, check
+from amon.src.utils import DEFAULT_PORT, getInstanceInfo, getParamFilepath, getPath, simple_excepthook, check
 
 
 def main():
     warnings.filterwarnings("ignore")
-    parser = create_parser(_runBB, _showWindrose, _showZone, _showTurbine, _showElevation, _instanceInfo, _check, _runServer, _shutdownServer)
+    parser = create_parser(_runBB, _runBatch, _showWindrose, _showZone, _showTurbine, _showElevation, _instanceInfo, _genStart, _check, _cache, _bench, _runServer, _shutdownServer)
     args = parser.parse_args()
     if not args.debug:
         sys.excepthook = simple_excepthook
@@ -18,28 +18,95 @@ def main():
 # Delay the imports to reduce unecessary import overhead
 def _runBB(args):
     args.port = args.port if args.port is not None else DEFAULT_PORT
-    try:
-        args.instance_or_param_file = int(args.instance_or_param_file)
-    except (ValueError, TypeError):
-        args.instance_or_param_file = str(getPath(args.instance_or_param_file)) # we have to convert to string to send request
-    else:
-        if args.instance_or_param_file > len(INSTANCES_PARAM_FILEPATHS):
-            raise ValueError(f"\033[91mError\033[0m: Instance {args.instance_or_param_file} does not exist, choose from 1 to {len(INSTANCES_PARAM_FILEPATHS)}")
-        args.instance_or_param_file = str(INSTANCES_PARAM_FILEPATHS[args.instance_or_param_file - 1])
+    args.instance_or_param_file = str(getParamFilepath(args.instance_or_param_file)) # we have to convert to string to send request
 
     args.point = str(getPath(args.point))
-    if args.r:
+    if args.profile is not None or args.cprofile is not None:
+        _runBBProfiled(args)
+    elif args.r:
         from amon.src.client import runBBRequest
-        result = [float(res) for res in runBBRequest(args).split()]
-        for res in result:
-            print(f'{res:.10f}', end=' ') 
-        print()
+        for bbo in runBBRequest(args).splitlines():
+            _printBBO(bbo)
+    elif args.surrogate:
+        from amon.src.surrogate import runSurrogate
+        for bbo in runSurrogate(args, _getEvalCache(args)).splitlines():
+            _printBBO(bbo)
     else:
+        # Look in the evaluation cache before importing the blackbox, PyWake takes most of the time of a cached run
+        eval_cache = _getEvalCache(args)
+        bbo = None
+        if eval_cache is not None and args.replications is None and not args.gradient:
+            from amon.src.utils import getPointValues
+            bbo = eval_cache.get(args.instance_or_param_file, args.f, getPointValues(args.point), args.s, args.max_memory, args.barrier)
+        ran_blackbox = bbo is None
+        if ran_blackbox:
+            from amon.src.blackbox import runBB
+            bbo = runBB(args, instance_cache=_getSnapshots(args), eval_cache=eval_cache)
+        for line in bbo.splitlines():
+            _printBBO(line)
+        # Nothing was simulated for an output of the cache, its peak memory would only be the one of this process
+        if args.max_memory is not None and ran_blackbox:
+            from amon.src.utils import getPeakRSS
+            print(f"Peak memory: {getPeakRSS():.1f} MB", file=sys.stderr)
+
+# Runs the blackbox without the evaluation cache, and writes the time spent in each stage as json (see profiling.py)
+def _runBBProfiled(args):
+    if args.r:
+        raise ValueError("\033[91mError\033[0m: The server cannot be profiled, run without -r")
+    if args.surrogate:
+        raise ValueError("\033[91mError\033[0m: The surrogate cannot be profiled")
+    import amon.src.profiling as profiling
+    if args.cprofile is not None:
+        args.cprofile = str(getPath(args.cprofile))
+    profiling.start(args.cprofile)
+    with profiling.stage('imports'):
         from amon.src.blackbox import runBB
-        result = [float(res) for res in runBB(args).split()]
-        for res in result:
-            print(f'{res:.10f}', end=' ') 
-        print()
+    bbo = runBB(args)
+    profile = profiling.toJSON(profiling.stop())
+    for line in bbo.splitlines():
+        _printBBO(line)
+    if args.profile == '-':
+        print(profile, file=sys.stderr)
+    elif args.profile is not None:
+        with open(getPath(args.profile), 'w') as file:
+            file.write(profile + '\n')
+
+def _runBatch(args):
+    args.port = args.port if args.port is not None else DEFAULT_PORT
+    args.instance_or_param_file = str(getParamFilepath(args.instance_or_param_file))
+    from amon.src.batch import getPoints
+    points = getPoints(getPath(args.points))
+    if args.r:
+        from amon.src.client import runBatchRequest
+        results = runBatchRequest(args, points)
+    else:
+        from amon.src.batch import runBatch
+        results = runBatch(args.instance_or_param_file, args.f, points, args.s, args.workers, args.max_memory, eval_cache=_getEvalCache(args), barrier=args.barrier)
+    # One line per point, in the same order as the points file
+    for success, result in results:
+        if success:
+            _printBBO(result)
+        else:
+            print(result.replace('\n', ' '))
+
+def _getEvalCache(args):
+    if args.no_cache:
+        return None
+    from amon.src.eval_cache import EvalCache
+    return EvalCache()
+
+# Snapshots of the built instances, restored instead of building the instance at every run
+def _getSnapshots(args):
+    if args.no_snapshot:
+        return None
+    from amon.src.snapshot import InstanceSnapshots
+    return InstanceSnapshots()
+
+def _printBBO(bbo):
+    result = [res if res == '-' else float(res) for res in bbo.split()]
+    for res in result:
+        print(res if res == '-' else f'{res:.10f}', end=' ') 
+    print()
 
 def _showWindrose(args):
     if args.save:
@@ -70,9 +137,34 @@ def _showElevation(args):
 def _instanceInfo(args):
     print(getInstanceInfo(args.instance_id))
 
+def _genStart(args):
+    from amon.src.starting_points import runGenStart
+    runGenStart(args)
+
 def _check(args):
     print(check())
 
+def _cache(args):
+    from amon.src.eval_cache import EvalCache
+    eval_cache = EvalCache()
+    if args.action == 'clear':
+        eval_cache.clear()
+        print(f"Evaluation cache cleared ({eval_cache.filepath})")
+        return
+    stats = eval_cache.stats()
+    print(f"\033[94mCache file\033[0m : {stats['path']}")
+    print(f"\033[94mSize\033[0m       : {stats['size']:.2f} MB")
+    print(f"\033[94mEntries\033[0m    : {stats['entries']} (max {stats['max_entries']})")
+    print(f"\033[94mHits\033[0m       : {stats['hits']} ({stats['saved_time']:.1f} s of evaluation saved)")
+    for param_file, nb_entries in stats['per_param_file'].items():
+        print(f"    {param_file} : {nb_entries}")
+
+def _bench(args):
+    from amon.src.bench import runBench, runStartupBench
+    nb_failures = runStartupBench(args) if args.startup else runBench(args)
+    if nb_failures > 0:
+        sys.exit(1)
+
 def _runServer(args):
     args.port = args.port if args.port is not None else DEFAULT_PORT
     from amon.src.server import runServer
@@ -3,7 +3,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import csv
 
-from amon.src.utils import AMON_HOME, getPoint, getPath, getFunctionFromFile
+from amon.src.elevation import AnalyticElevation
+from amon.src.utils import AMON_HOME, getPoint, getPath
 
 
 def showWindrose(args):
@@ -187,7 +188,7 @@ def showElevation(args):
     data_filepath = AMON_HOME / 'data' / 'elevation_functions' / f'elevation_function_{args.function_id}.py'
     if not data_filepath.exists():
         raise ValueError(f"\033[91mError\033[0m: Elevation function {args.function_id} does not exist, only 1 available")
-    elevation_function = getFunctionFromFile(data_filepath)
+    elevation_function = AnalyticElevation(data_filepath)
 
     if args.limits is not None:
         [lx, ly, ux, uy] = args.limits
@@ -196,7 +197,7 @@ def showElevation(args):
     x = np.arange(lx, ux, step=(ux-lx)/500)
     y = np.arange(ly, uy, step=(uy-ly)/500)
     X, Y = np.meshgrid(x, y)
-    Z = np.array([[elevation_function(x, y) for x, y in zip(row_x, row_y)] for row_x, row_y in zip(X, Y)])
+    Z = elevation_function(X, Y)
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
     ax.set_xlabel("X [m]")
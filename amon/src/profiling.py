@@ -0,0 +1,109 @@
+# profiling.py
+import json
+import time
+from contextlib import nullcontext
+
+import amon.src.utils as utils
+
+
+# Profile of the running command, None when profiling is disabled. The stages then only cost a function call that returns
+# the shared context below, so they can stay in the code
+_profile    = None
+_NO_PROFILE = nullcontext()
+
+
+# Wall and CPU time of each stage of an evaluation. A stage that runs several times (chunks of the time series, shifted
+# layouts of a gradient) is summed over its calls. Stages can be nested, the time of a stage includes the time of the
+# stages it contains.
+# The CPU time is the one of this process, the processes PyWake may start are not counted
+class Profile:
+    def __init__(self, cprofile_filepath=None):
+        '''
+            @brief   : starts profiling
+            @params  : cprofile_filepath : file where the cProfile statistics of the whole run are dumped (pstats format),
+                                           None for no cProfile
+            @returns : nothing
+        '''
+        self.stages     = {} # name -> {wall, cpu, calls, peak_rss_mb}, in the order the stages first started
+        self.records    = {} # name -> list of values
+        self.start_wall = time.perf_counter()
+        self.start_cpu  = time.process_time()
+        self.cprofile_filepath = cprofile_filepath
+        self.cprofiler  = None
+        if cprofile_filepath is not None:
+            import cProfile
+            self.cprofiler = cProfile.Profile()
+            self.cprofiler.enable()
+
+    def stop(self):
+        '''
+            @brief   : stops profiling, and dumps the cProfile statistics if asked
+            @returns : dict, the profile (see report)
+        '''
+        if self.cprofiler is not None:
+            self.cprofiler.disable()
+            self.cprofiler.dump_stats(self.cprofile_filepath)
+        return self.report()
+
+    def report(self):
+        stages = { name : { 'wall'        : round(stage['wall'], 6),
+                            'cpu'         : round(stage['cpu'], 6),
+                            'calls'       : stage['calls'],
+                            'peak_rss_mb' : stage['peak_rss_mb'] } for name, stage in self.stages.items() }
+        return { 'wall'        : round(time.perf_counter() - self.start_wall, 6),
+                 'cpu'         : round(time.process_time() - self.start_cpu, 6),
+                 'peak_rss_mb' : utils.getPeakRSS(),
+                 'stages'      : stages,
+                 **self.records }
+
+class _Stage:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name    = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu  = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stage = self.profile.stages.setdefault(self.name, {'wall' : 0., 'cpu' : 0., 'calls' : 0, 'peak_rss_mb' : None})
+        stage['wall']        += time.perf_counter() - self.wall
+        stage['cpu']         += time.process_time() - self.cpu
+        stage['calls']       += 1
+        stage['peak_rss_mb']  = utils.getPeakRSS() # Peak of the process so far
+        return False
+
+
+# @brief   : Starts profiling the stages of the running command
+# @params  : cprofile_filepath : file where the cProfile statistics are dumped, None for no cProfile
+# @returns : nothing
+def start(cprofile_filepath=None):
+    global _profile
+    _profile = Profile(cprofile_filepath)
+
+# @brief   : Stops profiling
+# @returns : dict, the profile, None if profiling was not started
+def stop():
+    global _profile
+    if _profile is None:
+        return None
+    profile, _profile = _profile.stop(), None
+    return profile
+
+# @brief   : Context manager that times a stage, does nothing if profiling is disabled
+# @params  : name : name of the stage
+def stage(name):
+    if _profile is None:
+        return _NO_PROFILE
+    return _Stage(_profile, name)
+
+# @brief   : Adds a value to a list of the profile (like the iterations of the wake solver), does nothing if profiling is disabled
+# @params  : - name  : name of the list
+#            - value : value to add, must be serializable to json
+def record(name, value):
+    if _profile is not None:
+        _profile.records.setdefault(name, []).append(value)
+
+def toJSON(profile):
+    return json.dumps(profile, indent=4)
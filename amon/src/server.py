@@ -1,33 +1,105 @@
 # server.py
-from flask import Flask, request
+from flask import Flask, request, jsonify
 import threading
 import time
 import os
 
 from amon.src.blackbox import runBB
+from amon.src.batch import runBatch
+from amon.src.instance_cache import InstanceCache
+from amon.src.eval_cache import EvalCache
+from amon.src.surrogate import runSurrogate
+from amon.src.worker_pool import WorkerPool
+from amon.src.unix_socket import UnixSocketServer, removeSocket
 
 
 app = Flask(__name__)
 
+# Built blackboxes are kept between requests, see runServer for the bounds
+instance_cache = InstanceCache()
+
+# Outputs of already evaluated points, shared with the other amon processes. None if disabled
+eval_cache = None
+
+# Surrogate of each instance, updated with the new evaluations of the cache at every surrogate request
+surrogates = {}
+
+# The seed is global to the process, so evaluations must not overlap
+evaluation_lock = threading.Lock()
+
+# Worker processes that evaluate the requests in parallel (serve --workers), None to evaluate them in the server process
+worker_pool = None
+
+# Server of the Unix socket (serve --socket), None if the server only listens on its port
+socket_server = None
+
 @app.route("/run", methods=["POST"])
 def run_blackbox():
     try:
-        data = request.json
-        args = type("Args", (), data)() # Make object to use same syntax as argparse in runBB
-        result = runBB(args)
-        return result
+        return runRequest(request.json)
     except FileNotFoundError as e:
         return str(e)
 
+@app.route("/run-batch", methods=["POST"])
+def run_batch():
+    try:
+        return jsonify(runBatchRequest(request.json))
+    except (FileNotFoundError, ValueError) as e:
+        return str(e), 400
+
 @app.route("/shutdown", methods=["POST"])
 def shutdown():
+    shutdownRequest()
+    return '', 200
+
+# Requests of both transports, data is the json of the request (see client.py)
+def runRequest(data):
+    if worker_pool is not None:
+        return worker_pool.run(data)
+    args = type("Args", (), data)() # Make object to use same syntax as argparse in runBB
+    with evaluation_lock:
+        if getattr(args, 'surrogate', False):
+            return runSurrogate(args, eval_cache, surrogates)
+        return runBB(args, instance_cache, eval_cache)
+
+def runBatchRequest(data):
+    if worker_pool is not None: # The points are spread over the workers of the server
+        return runBatch(data["instance_or_param_file"], data["f"], data["points"], data["s"], max_memory=data.get("max_memory"), eval_cache=eval_cache, barrier=data.get("barrier"), worker_pool=worker_pool)
+    with evaluation_lock:
+        return runBatch(data["instance_or_param_file"], data["f"], data["points"], data["s"], data.get("workers"), data.get("max_memory"), instance_cache, eval_cache, data.get("barrier"))
+
+def shutdownRequest(data=None):
     def delay_kill():
         time.sleep(0.2)
+        if socket_server is not None: # os._exit does not remove the socket file
+            removeSocket(socket_server.socket_path)
         os._exit(0)
 
     threading.Thread(target=delay_kill).start()
-    return '', 200
+
+# The run requests of the socket answer file errors with their message, like /run
+def _runSocketRequest(data):
+    try:
+        return runRequest(data)
+    except FileNotFoundError as e:
+        return str(e)
 
 def runServer(args):
-    app.run(port=args.port, debug=False)
+    global instance_cache, eval_cache, worker_pool, socket_server
+    instance_cache = InstanceCache(max_size=args.cache_size, max_rss=args.cache_max_rss, warm_start=args.warm_start)
+    eval_cache     = None if args.no_cache else EvalCache()
+    # The workers are forked before the server starts its threads
+    if args.workers is not None:
+        worker_pool = WorkerPool(args.workers, args.cache_size, args.cache_max_rss, args.warm_start, use_eval_cache=not args.no_cache)
+    if args.socket is not None:
+        socket_server = UnixSocketServer(args.socket, { 'run'       : _runSocketRequest,
+                                                        'run-batch' : runBatchRequest,
+                                                        'shutdown'  : shutdownRequest })
+        threading.Thread(target=socket_server.serve_forever, daemon=True).start()
+        print(f"Listening on {args.socket}")
+    try:
+        app.run(port=args.port, debug=False, threaded=True)
+    finally:
+        if socket_server is not None:
+            socket_server.server_close()
 
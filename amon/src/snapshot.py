@@ -0,0 +1,61 @@
+# snapshot.py
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+import amon.src.utils as utils
+from amon.src.utils import AMON_HOME
+
+
+# Bumped when what is saved in a snapshot changes, so old snapshots are never reused
+SNAPSHOT_VERSION = 1
+
+
+# Snapshots of built blackboxes (WindFarmData and Blackbox objects) pickled in the cache folder, used by "amon run" so that
+# each run of the command (NOMAD starts one per point) does not rebuild the instance from the data files.
+# A snapshot is identified by the param file path and the fidelity, and is only restored if the hash of the contents of
+# the param file and of its data files, the source code of amon and the versions of Python, PyWake, numpy and shapely are
+# the ones it was saved with. Otherwise the instance is built and its snapshot replaced.
+# Same interface as InstanceCache, so it can be given to blackbox.runBB as instance_cache
+class InstanceSnapshots:
+    def __init__(self, snapshots_dir=None):
+        '''
+            @brief   : sets the folder of the snapshots, nothing is read until get is called
+            @params  : snapshots_dir : folder of the snapshots. None for the snapshots folder of the cache folder
+                                       ($AMON_CACHE_DIR, or $XDG_CACHE_HOME/amon, or ~/.cache/amon)
+            @returns : nothing
+        '''
+        self.snapshots_dir = Path(snapshots_dir).expanduser() if snapshots_dir is not None else utils.getCacheDir() / 'snapshots'
+        self.hits          = 0
+        self.misses        = 0
+
+    def get(self, param_filepath, fidelity):
+        '''
+            @brief   : returns the built blackbox of an instance, restored from its snapshot, or built (and saved) if there
+                       is no valid snapshot
+            @params  : - param_filepath : path to the param file
+                       - fidelity       : float between 0 and 1
+            @returns : tuple (WindFarmData, Blackbox)
+        '''
+        from amon.src.eval_cache import getCodeHash, getInstanceHash, getVersions
+
+        param_filepath = (AMON_HOME / Path(param_filepath)).resolve()
+        name     = hashlib.sha256(json.dumps([str(param_filepath), float(fidelity)]).encode()).hexdigest()[:16]
+        key      = hashlib.sha256(json.dumps([SNAPSHOT_VERSION, getCodeHash(), getInstanceHash(param_filepath), getVersions()]).encode()).hexdigest()[:16]
+        filepath = self.snapshots_dir / f"{name}.{key}.pickle"
+
+        if filepath.is_file():
+            try:
+                with open(filepath, 'rb') as file:
+                    windfarm_data, blackbox = pickle.load(file)
+                self.hits += 1
+                return windfarm_data, blackbox
+            except Exception:
+                pass # Truncated or unreadable snapshot, rebuilt below
+        self.misses += 1
+
+        from amon.src.blackbox import buildBlackbox
+        windfarm_data, blackbox = buildBlackbox(param_filepath, fidelity)
+        utils.writeCacheFile(filepath, f"{name}.*.pickle", lambda file: pickle.dump((windfarm_data, blackbox), file, protocol=pickle.HIGHEST_PROTOCOL))
+        return windfarm_data, blackbox
@@ -0,0 +1,118 @@
+# starting_points.py
+import numpy as np
+import shapely
+
+import amon.src.utils as utils
+from amon.src.windfarm_data import WindFarmData
+
+
+# Candidates drawn for a turbine before giving up, the zone is then too small for the number of turbines
+MAX_CANDIDATES_PER_TURBINE = 10000
+
+# Candidates drawn at once in the bounding box of the zone
+CANDIDATES_BATCH_SIZE = 256
+
+
+# @brief   : Generates feasible starting points of an instance (amon gen-start) and writes them in a folder, one point file per
+#            layout (x1.txt, x2.txt, ...) and every layout in points.txt, one per line, for run-batch
+# @params  : args : argparse namespace of the gen-start command
+# @returns : list of the paths of the point files
+def runGenStart(args):
+    param_filepath = utils.getParamFilepath(args.instance_or_param_file)
+    windfarm_data  = WindFarmData(param_filepath, 1)
+    nb_turbines    = args.n if args.n is not None else windfarm_data.nb_turbines
+    if nb_turbines is None:
+        raise ValueError("\033[91mError\033[0m: The number of turbines of the instance is VAR, give it with --n")
+    if windfarm_data.nb_turbines is not None and nb_turbines != windfarm_data.nb_turbines:
+        raise ValueError(f"\033[91mError\033[0m: The instance has {windfarm_data.nb_turbines} turbines, got --n {nb_turbines}")
+    if nb_turbines < 1 or args.count < 1:
+        raise ValueError("\033[91mError\033[0m: --n and --count must be at least 1")
+
+    points = generateStartingPoints(windfarm_data, nb_turbines, args.count, args.s, args.types)
+
+    output_dir = utils.getPath(args.output, includes_file=False)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    lines = [' '.join(str(value) for value in point) for point in points]
+    point_filepaths = []
+    for index, line in enumerate(lines):
+        point_filepaths.append(output_dir / f'x{index + 1}.txt')
+        point_filepaths[-1].write_text(line + '\n')
+    (output_dir / 'points.txt').write_text('\n'.join(lines) + '\n')
+    print(f"{len(points)} starting points of {nb_turbines} turbines saved to {output_dir}")
+    return point_filepaths
+
+# @brief   : Samples layouts that satisfy the placing, spacing and height constraints (see Blackbox.constraints). The turbines
+#            are placed one at a time at random points of the buildable zone, and a point is kept if it is more than D_i + D_j
+#            away from every turbine already placed (Poisson disk sampling). The candidates are drawn by batches in the bounding
+#            box of the zone and filtered with the prepared zone, and the neighbours are found with a grid of cells as wide as
+#            the largest spacing, so only the 3x3 cells around a candidate are checked
+# @params  : - windfarm_data : WindFarmData of the instance
+#            - nb_turbines   : number of turbines of each layout
+#            - count         : number of layouts
+#            - seed          : seed of the random layouts, None for random ones
+#            - types         : indices of the turbine types to draw from (uniformly), None for the first type only. Only used if
+#                              TYPES is an optimization variable, otherwise every turbine is of the first type like in the blackbox
+# @returns : list of points, each one a list of values in the order of the OPT_VARIABLES of the instance (coordinates as
+#            x_1 y_1 x_2 y_2 ..., then types, heights (default hub height of the type), yaw (0))
+def generateStartingPoints(windfarm_data, nb_turbines, count, seed=None, types=None):
+    rng = np.random.default_rng(seed)
+    nb_types = len(windfarm_data.wind_turbines_models)
+    if types is None or 'TYPES' not in windfarm_data.opt_variables:
+        types = [0]
+    for type_ in types:
+        if not 0 <= type_ < nb_types:
+            raise ValueError(f"\033[91mError\033[0m: Only {nb_types} turbines available, got type {type_}")
+    diameters   = np.array([windfarm_data.wind_turbines.diameter(type_) for type_ in range(nb_types)])
+    hub_heights = np.array([windfarm_data.wind_turbines.hub_height(type_) for type_ in range(nb_types)], dtype=float)
+    # The default hub height of a type can be out of the height constraint, it is then moved to the closest allowed height
+    max_heights = np.asarray(utils.MAX_TURBINE_HEIGHTS)[windfarm_data.wind_turbines_models]
+    heights     = np.clip(hub_heights, diameters / 2, max_heights)
+
+    zone = windfarm_data.buildable_zone[0]
+    shapely.prepare(zone)
+
+    points = []
+    for _ in range(count):
+        layout_types = rng.choice(types, size=nb_turbines)
+        x, y = _sampleLayout(zone, diameters[layout_types], rng)
+        values = []
+        for variable in windfarm_data.opt_variables:
+            if variable == 'COORDS':
+                values += [float(coordinate) for xy in zip(x, y) for coordinate in xy]
+            elif variable == 'TYPES':
+                values += [int(type_) for type_ in layout_types]
+            elif variable == 'HEIGHTS':
+                values += [float(height) for height in heights[layout_types]]
+            elif variable == 'YAW':
+                values += [0.] * nb_turbines
+        points.append(values)
+    return points
+
+# Places the turbines one at a time, the largest first so the smaller ones fill the gaps, and returns their coordinates in
+# the order of diameters
+def _sampleLayout(zone, diameters, rng):
+    x_min, y_min, x_max, y_max = zone.bounds
+    cell_size  = 2 * diameters.max() # Largest spacing between two turbines
+    grid       = {} # (column, row) -> indices of the turbines placed in the cell
+    x, y       = np.zeros(len(diameters)), np.zeros(len(diameters))
+    candidates = []
+    for turbine in np.argsort(-diameters, kind='stable'):
+        nb_drawn = 0
+        while True:
+            if not candidates:
+                if nb_drawn >= MAX_CANDIDATES_PER_TURBINE:
+                    raise ValueError(f"\033[91mError\033[0m: Could not place {len(diameters)} turbines in the zone while respecting the spacing constraint, try fewer turbines")
+                candidate_x = rng.uniform(x_min, x_max, CANDIDATES_BATCH_SIZE)
+                candidate_y = rng.uniform(y_min, y_max, CANDIDATES_BATCH_SIZE)
+                inside      = shapely.contains_xy(zone, candidate_x, candidate_y)
+                candidates  = list(zip(candidate_x[inside], candidate_y[inside]))[::-1]
+                nb_drawn   += CANDIDATES_BATCH_SIZE
+                continue
+            candidate_x, candidate_y = candidates.pop()
+            column, row = int((candidate_x - x_min) // cell_size), int((candidate_y - y_min) // cell_size)
+            neighbours  = [other for i in (-1, 0, 1) for j in (-1, 0, 1) for other in grid.get((column + i, row + j), [])]
+            if all(np.hypot(candidate_x - x[other], candidate_y - y[other]) > diameters[turbine] + diameters[other] for other in neighbours):
+                x[turbine], y[turbine] = candidate_x, candidate_y
+                grid.setdefault((column, row), []).append(turbine)
+                break
+    return x, y
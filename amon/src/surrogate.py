@@ -0,0 +1,157 @@
+# surrogate.py
+import json
+
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+
+import amon.src.utils as utils
+from amon.src.eval_cache import getInstanceHash
+
+
+# Minimum number of real evaluations of an instance needed to train its surrogate
+MIN_SURROGATE_POINTS = 2
+
+# Only the most recent real evaluations are used, the training cost grows with the cube of this number
+MAX_SURROGATE_POINTS = 2000
+
+# Variance of the noise of the outputs (in normalized units), the perturbation of the wind data makes the output depend on the seed
+SURROGATE_NOISE = 1e-3
+
+
+# Gaussian process regression of the blackbox outputs of an instance, trained on the real evaluations of the evaluation cache.
+# It gives a cheap prediction of the outputs of a point with an uncertainty estimate, to screen points before sending the
+# promising ones to the blackbox.
+# The kernel is a squared exponential on the normalized point values, with the length scale set by the median heuristic.
+# New evaluations are added to the Cholesky factor of the kernel matrix without refactoring it, the normalization and the
+# length scale are only fitted again when the number of training points has doubled since the last fit.
+class Surrogate:
+    def __init__(self):
+        self.X         = np.empty((0, 0)) # Training points (not normalized)
+        self.Y         = np.empty((0, 0)) # Training outputs (not normalized)
+        self.last_row  = 0                # Last row of the evaluation cache that was read
+        self.fit_size  = 0                # Number of training points at the last full fit
+
+    def __len__(self):
+        return len(self.X)
+
+    def update(self, X, Y):
+        '''
+            @brief   : adds real evaluations to the training set
+            @params  : - X : 2D array_like, one point per row
+                       - Y : 2D array_like, the blackbox outputs of each point (nan for outputs that are not defined)
+            @returns : nothing
+        '''
+        X, Y = np.asarray(X, dtype=float), np.asarray(Y, dtype=float)
+        if len(X) == 0:
+            return
+        nb_old = len(self)
+        self.X = X if nb_old == 0 else np.vstack([self.X, X])
+        self.Y = Y if nb_old == 0 else np.vstack([self.Y, Y])
+        if len(self) > MAX_SURROGATE_POINTS:
+            self.X, self.Y = self.X[-MAX_SURROGATE_POINTS:], self.Y[-MAX_SURROGATE_POINTS:]
+            self.__fit()
+        elif nb_old == 0 or len(self) >= 2 * self.fit_size:
+            self.__fit()
+        else:
+            self.__extend(nb_old)
+
+    def predict(self, x):
+        '''
+            @brief   : predicts the outputs of a point
+            @params  : x : 1D array_like, the values of the point
+            @returns : tuple of 1D numpy arrays (mean, standard deviation), one value per blackbox output
+        '''
+        if len(self) < MIN_SURROGATE_POINTS:
+            raise ValueError(f"\033[91mError\033[0m: The surrogate needs at least {MIN_SURROGATE_POINTS} evaluations of this instance with points of the same size, it has {len(self)}")
+        x = np.asarray(x, dtype=float)
+        if x.shape != (self.X.shape[1],):
+            raise ValueError(f"\033[91mError\033[0m: The point has {x.size} values, the surrogate was trained on points with {self.X.shape[1]} values")
+        k = self.__kernel(self.Xn, ((x - self.X_mean) / self.X_scale)[None, :])[:, 0]
+        mean = k @ self.alpha * self.Y_scale + self.Y_mean
+        v = solve_triangular(self.L, k, lower=True)
+        variance = np.maximum(1 + SURROGATE_NOISE - v @ v, 0)
+        std = np.sqrt(variance) * self.Y_scale
+        std[self.constant]   = 0
+        mean[self.undefined] = np.nan
+        std[self.undefined]  = np.nan
+        return mean, std
+
+    # Fits the normalization and the length scale, then factors the kernel matrix of every training point
+    def __fit(self):
+        self.X_mean  = self.X.mean(axis=0)
+        self.X_scale = self.X.std(axis=0)
+        self.X_scale[self.X_scale == 0] = 1
+        self.Xn = (self.X - self.X_mean) / self.X_scale
+        distances = np.sqrt(_squaredDistances(self.Xn, self.Xn)[np.triu_indices(len(self), k=1)])
+        distances = distances[distances > 0]
+        self.length_scale = np.median(distances) if distances.size else 1.
+        self.undefined = np.isnan(self.Y).any(axis=0)
+        self.Y_mean  = np.where(self.undefined, 0, np.nan_to_num(self.Y).mean(axis=0))
+        self.Y_scale = np.where(self.undefined, 1, np.nan_to_num(self.Y).std(axis=0))
+        self.Y_scale[self.Y_scale == 0] = 1
+        K = self.__kernel(self.Xn, self.Xn) + SURROGATE_NOISE * np.eye(len(self))
+        self.L = np.linalg.cholesky(K)
+        self.fit_size = len(self)
+        self.__solve()
+
+    # Adds the training points from index start to the Cholesky factor, one row at a time
+    def __extend(self, start):
+        Xn = (self.X[start:] - self.X_mean) / self.X_scale
+        for xn in Xn:
+            k = self.__kernel(self.Xn, xn[None, :])[:, 0]
+            l = solve_triangular(self.L, k, lower=True)
+            d = np.sqrt(max(1 + SURROGATE_NOISE - l @ l, SURROGATE_NOISE))
+            n = len(self.L)
+            L = np.zeros((n + 1, n + 1))
+            L[:n, :n] = self.L
+            L[n, :n]  = l
+            L[n, n]   = d
+            self.L  = L
+            self.Xn = np.vstack([self.Xn, xn])
+        self.undefined |= np.isnan(self.Y[start:]).any(axis=0)
+        self.__solve()
+
+    def __solve(self):
+        self.constant = np.nan_to_num(self.Y).std(axis=0) == 0 # Outputs that never changed, like constraints always at 0
+        Yn = np.where(self.undefined, 0, (self.Y - self.Y_mean) / self.Y_scale)
+        self.alpha = cho_solve((self.L, True), Yn)
+
+    def __kernel(self, A, B):
+        return np.exp(-0.5 * _squaredDistances(A, B) / self.length_scale**2)
+
+# Squared euclidean distance between every row of A and every row of B, without building the (len(A), len(B), dim) array
+def _squaredDistances(A, B):
+    squared_distances = (A**2).sum(axis=1)[:, None] + (B**2).sum(axis=1)[None, :] - 2 * A @ B.T
+    return np.maximum(squared_distances, 0)
+
+
+# @brief   : Predicts the blackbox output of the point file given in args with the surrogate of the instance, after
+#            training it on the evaluations of the instance that were added to the cache since its last update
+# @params  : - args       : object with the same attributes as the argparse namespace of the run command
+#            - eval_cache : EvalCache with the real evaluations
+#            - surrogates : dict of surrogates to reuse and update (kept by the server between requests), None to train
+#                           a new surrogate
+# @returns : string, the predicted blackbox output on a first line, and its standard deviation on a second line
+def runSurrogate(args, eval_cache, surrogates=None):
+    if eval_cache is None:
+        raise ValueError("\033[91mError\033[0m: The surrogate is trained on the evaluation cache, which is disabled")
+    point_filepath = utils.getPath(args.point, includes_file=True)
+    values = utils.getPointValues(point_filepath)
+
+    # One surrogate per instance, fidelity, and size of point (instances with a variable number of turbines)
+    key = (getInstanceHash(args.instance_or_param_file), float(args.f), len(values))
+    surrogate = Surrogate() if surrogates is None else surrogates.setdefault(key, Surrogate())
+
+    X, Y = [], []
+    for row, point, bbo in eval_cache.getEvaluations(args.instance_or_param_file, args.f, after=surrogate.last_row):
+        surrogate.last_row = row
+        point   = json.loads(point)
+        outputs = [np.nan if output == '-' else float(output) for output in bbo.split()]
+        # The layouts rejected by the extreme barrier (--barrier) have an objective of inf, which cannot be fitted
+        if len(point) == len(values) and not np.isinf(outputs).any():
+            X.append(point)
+            Y.append(outputs)
+    surrogate.update(X, Y)
+
+    mean, std = surrogate.predict(values)
+    return ' '.join(f'{value}' for value in mean) + '\n' + ' '.join(f'{value}' for value in std)
@@ -0,0 +1,139 @@
+# unix_socket.py
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+
+
+# Framed protocol of "amon serve --socket PATH". Every message, request or response, is a 4-byte big-endian length followed
+# by that many bytes of UTF-8 json. A request is { "command" : "run" | "run-batch" | "shutdown", ... } with the same fields
+# as the json of the HTTP requests (see client.py), and the response is { "ok" : true, "result" : ... } or
+# { "ok" : false, "error" : "..." }. Several requests can be sent on the same connection, each waits for its response.
+# Only the standard library is imported, so "amon run -r --socket" does not import numpy or requests
+
+
+# Header of a message, the length of its json
+HEADER = struct.Struct('!I')
+
+# Messages longer than this are refused (bytes)
+MAX_MESSAGE_SIZE = 1 << 30
+
+
+def sendMessage(sock, message):
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+# Returns None if the connection was closed before a new message
+def receiveMessage(sock):
+    header = _receiveExactly(sock, HEADER.size)
+    if header is None:
+        return None
+    size, = HEADER.unpack(header)
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {size} bytes, the maximum is {MAX_MESSAGE_SIZE}")
+    payload = _receiveExactly(sock, size)
+    if payload is None:
+        raise ConnectionError("Connection closed in the middle of a message")
+    return json.loads(payload)
+
+def _receiveExactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            if chunks:
+                raise ConnectionError("Connection closed in the middle of a message")
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+# @brief   : Sends a request to the server listening on a Unix socket, and waits for its response
+# @params  : - socket_path : path to the socket of the server (serve --socket)
+#            - command     : "run", "run-batch" or "shutdown"
+#            - data        : dict, fields of the request
+# @returns : the result of the request, a string for run and a list for run-batch
+def request(socket_path, command, data=None):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ValueError("\033[91mError\033[0m: Unix sockets are not available on this platform, use --port")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise ConnectionError(f"\033[91mError\033[0m: Could not connect to server at {socket_path}")
+        sendMessage(sock, { 'command' : command, **(data or {}) })
+        response = receiveMessage(sock)
+    if response is None:
+        raise ConnectionError(f"\033[91mError\033[0m: The server at {socket_path} closed the connection")
+    if not response['ok']:
+        raise RuntimeError(response['error'])
+    return response['result']
+
+
+class UnixSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, handlers):
+        '''
+            @brief   : binds the socket, after removing the socket file of a server that is not running anymore
+            @params  : - socket_path : path of the socket file
+                       - handlers    : dict, command -> function taking the request (dict) and returning its result. Its
+                                       exceptions are sent back as errors
+            @returns : nothing
+        '''
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError("\033[91mError\033[0m: Unix sockets are not available on this platform, use --port")
+        self.socket_path = str(socket_path)
+        self.handlers    = handlers
+        _removeStaleSocket(self.socket_path)
+        super().__init__(self.socket_path, _RequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        removeSocket(self.socket_path)
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message = receiveMessage(self.request)
+            except (ConnectionError, ValueError):
+                return
+            if message is None:
+                return
+            handler = self.server.handlers.get(message.get('command'))
+            try:
+                if handler is None:
+                    raise ValueError(f"Unknown command {message.get('command')}")
+                response = { 'ok' : True, 'result' : handler(message) }
+            except Exception as e:
+                response = { 'ok' : False, 'error' : str(e) }
+            try:
+                sendMessage(self.request, response)
+            except OSError:
+                return
+
+# A socket file left by a server that was killed is removed, but not a file that is not a socket or that a server listens on
+def _removeStaleSocket(socket_path):
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"\033[91mError\033[0m: {socket_path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise ValueError(f"\033[91mError\033[0m: A server is already listening on {socket_path}")
+
+def removeSocket(socket_path):
+    try:
+        os.remove(socket_path)
+    except FileNotFoundError:
+        pass
@@ -1,7 +1,7 @@
 # utils.py
 from pathlib import Path
-import numpy as np
 import ast
+import os
 import sys
 import importlib.util
 
@@ -9,12 +9,35 @@ import importlib.util
 # Default port
 DEFAULT_PORT = 8765
 
+# Default number of built instances kept in memory by the server
+DEFAULT_CACHE_SIZE = 8
+
+# Default maximum number of evaluations kept in the on-disk evaluation cache
+DEFAULT_EVAL_CACHE_MAX_ENTRIES = 100000
+
+# Default matrix of "amon bench", every instance is evaluated on its starting point
+DEFAULT_BENCH_INSTANCES  = [1, 2, 3, 4, 5, 6]
+DEFAULT_BENCH_FIDELITIES = [0.1, 0.5, 1.]
+DEFAULT_BENCH_SEEDS      = [1, 2]
+
+# Default regression thresholds of "amon bench", relative to the baseline
+DEFAULT_BENCH_TIME_THRESHOLD   = 0.25 # Slower by more than 25%
+DEFAULT_BENCH_MEMORY_THRESHOLD = 0.25 # More peak memory by more than 25%
+DEFAULT_BENCH_AEP_THRESHOLD    = 1e-6 # AEP changed by more than 1e-6 (relative)
+
+# Startup budgets of "amon bench --startup" : maximum import time (s) of each command, and the modules it must not import
+STARTUP_BUDGETS = { 'instance-info'   : { 'import_time' : 0.15, 'forbidden_modules' : ['numpy', 'requests', 'py_wake'] },
+                    'run -r'          : { 'import_time' : 0.4,  'forbidden_modules' : ['numpy', 'py_wake'] },
+                    'run -r --socket' : { 'import_time' : 0.15, 'forbidden_modules' : ['numpy', 'requests', 'py_wake'] },
+                    'run'             : { 'import_time' : 4.,   'forbidden_modules' : [] } }
+
 # Path to home directory
 AMON_HOME = Path(__file__).parents[1]
 
 # Random seed
 SEED = None
 def setSeed(seed_value):
+    import numpy as np # Not at the top, the commands that do not evaluate (run -r, instance-info, ...) do not need numpy
     global SEED
     SEED = seed_value
     np.random.seed(seed_value)
@@ -37,6 +60,14 @@ MAX_TURBINE_HEIGHTS = [100, 100, 187.5, 100, 187.5, 150]
 def getPoint(point_filepath, nb_turbines, opt_variables):
     if point_filepath is None:
         return None
+    values = getPointValues(point_filepath)
+    try:
+        return parsePoint(values, nb_turbines, opt_variables)
+    except Exception as e:
+        raise ValueError(f"\033[91mError\033[0m: Problem with point file: {e}")
+
+# Reads the values of the point file, without splitting them into fields
+def getPointValues(point_filepath):
     try:
         try:
             with open(point_filepath, 'r') as file:
@@ -44,49 +75,61 @@ def getPoint(point_filepath, nb_turbines, opt_variables):
         except FileNotFoundError:
             raise FileNotFoundError(f"No point file at {point_filepath}")
         
-        point = {}
         line = next((line for line in lines if line.split()), None) # Get the line where the point is specified
 
         if line is None:
             raise ValueError("Empty point file")
         
-        values = [float(value.strip()) for value in line.split()] # Separate point into single elements
+        return [float(value.strip()) for value in line.split()] # Separate point into single elements
+    except Exception as e:
+        raise ValueError(f"\033[91mError\033[0m: Problem with point file: {e}")
+
+# Splits the values of a point into its fields (coords, types, heights, yaw) according to the opt variables
+def parsePoint(values, nb_turbines, opt_variables):
+    point = {}
+    nb_opt_variables = len(opt_variables) + 1 # We assume coords are always present. Since there is (x,y), we have to add 1 
 
-        nb_opt_variables = len(opt_variables) + 1 # We assume coords are always present. Since there is (x,y), we have to add 1 
+    if nb_turbines is not None:
+        if len(values) / nb_opt_variables != nb_turbines:
+            raise ValueError(f"Point must be {nb_opt_variables} times as long as number of turbines, currently has {len(values)} values for {nb_turbines} turbines")
+    else:
+        if len(values) % nb_opt_variables != 0:
+            raise ValueError(f"Point must be {nb_opt_variables} times as long as number of turbines, currently has {len(values)} values")
+        nb_turbines = len(values) // nb_opt_variables
 
-        if nb_turbines is not None:
-            if len(values) / nb_opt_variables != nb_turbines:
-                raise ValueError(f"Point must be {nb_opt_variables} times as long as number of turbines, currently has {len(values)} values for {nb_turbines} turbines")
+    # Set the point according to the opt variables specified in the param file
+    i = 0
+    for variable in opt_variables:
+        variable = variable.lower()
+        if variable == 'coords':
+            point[variable] = [value for value in values[i*nb_turbines:(i+2)*nb_turbines]]
+            i += 2
+            continue
+        elif variable == 'types':
+            point[variable] = [int(value) for value in values[i*nb_turbines:(i+1)*nb_turbines]]
         else:
-            if len(values) % nb_opt_variables != 0:
-                raise ValueError(f"Point must be {nb_opt_variables} times as long as number of turbines, currently has {len(values)} values")
-            nb_turbines = len(values) // nb_opt_variables
-
-        # Set the point according to the opt variables specified in the param file
-        i = 0
-        for variable in opt_variables:
-            variable = variable.lower()
-            if variable == 'coords':
-                point[variable] = [value for value in values[i*nb_turbines:(i+2)*nb_turbines]]
-                i += 2
-                continue
-            elif variable == 'types':
-                point[variable] = [int(value) for value in values[i*nb_turbines:(i+1)*nb_turbines]]
-            else:
-                point[variable] = [value for value in values[i*nb_turbines:(i+1)*nb_turbines]]
-            i += 1
-        # Set the default values for unspecified points
-        if 'coords' not in point:
-            raise ValueError("Must contain coordinates")
-        if 'types' not in point:
-            point['types'] = [0 for _ in range(nb_turbines)]
-        if 'heights' not in point:
-            point['heights'] = None # The default values are set by blackbox.py's runBB function
-        if 'yaw' not in point:
-            point['yaw'] = [0 for _ in range(nb_turbines)]
-        return point
-    except Exception as e:
-        raise ValueError(f"\033[91mError\033[0m: Problem with point file: {e}")
+            point[variable] = [value for value in values[i*nb_turbines:(i+1)*nb_turbines]]
+        i += 1
+    # Set the default values for unspecified points
+    if 'coords' not in point:
+        raise ValueError("Must contain coordinates")
+    if 'types' not in point:
+        point['types'] = [0 for _ in range(nb_turbines)]
+    if 'heights' not in point:
+        point['heights'] = None # The default values are set by blackbox.py's runBB function
+    if 'yaw' not in point:
+        point['yaw'] = [0 for _ in range(nb_turbines)]
+    return point
+
+# Returns the path to the param file from an instance id or a path to a param file
+def getParamFilepath(instance_or_param_file):
+    try:
+        instance = int(instance_or_param_file)
+    except (ValueError, TypeError):
+        return getPath(str(instance_or_param_file))
+    if instance > len(INSTANCES_PARAM_FILEPATHS) or instance < 1:
+        raise ValueError(f"\033[91mError\033[0m: Instance {instance} does not exist, choose from 1 to {len(INSTANCES_PARAM_FILEPATHS)}")
+    return INSTANCES_PARAM_FILEPATHS[instance - 1]
 
 # Reads a string and returns the corresponding path
 def getPath(path, includes_file=True):
@@ -110,6 +153,97 @@ def getPath(path, includes_file=True):
             raise FileNotFoundError(f"\033[91mINPUT ERROR\033[0m: Invalid save path provided {path}")
         return path
 
+# Returns the folder of the on-disk caches (evaluations, compiled data): $AMON_CACHE_DIR, or $XDG_CACHE_HOME/amon, or ~/.cache/amon
+def getCacheDir():
+    cache_dir = os.environ.get('AMON_CACHE_DIR')
+    if cache_dir is None:
+        cache_dir = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'amon'
+    return Path(cache_dir).expanduser()
+
+# @brief   : Writes a file of the cache folder in a temporary file then renames it, so other processes never read a partial
+#            file, and removes the outdated files it replaces. Failures are ignored (read-only cache folder, object that cannot
+#            be saved), the data is computed again next time
+# @params  : - filepath : path of the file
+#            - pattern  : glob pattern of the outdated files in the folder of filepath, the temporary files of other
+#                         processes are kept
+#            - save     : function writing the contents to the binary file it is given
+# @returns : nothing
+def writeCacheFile(filepath, pattern, save):
+    temporary_filepath = filepath.with_name(f"{filepath.name}.{os.getpid()}.tmp")
+    try:
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(temporary_filepath, 'wb') as file:
+            save(file)
+        os.replace(temporary_filepath, filepath)
+        for old_filepath in filepath.parent.glob(pattern):
+            if old_filepath != filepath and not old_filepath.name.endswith('.tmp'):
+                old_filepath.unlink(missing_ok=True)
+    except Exception:
+        try:
+            temporary_filepath.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+# Reads the param file and returns the paths of every data file it references (wind data, zone, elevation function, wind turbines)
+# This does not validate the param file, WindFarmData does that
+def getDataFilepaths(param_filepath):
+    data_filepaths = []
+    with open(AMON_HOME / param_filepath, 'r') as param_file:
+        for line in param_file:
+            line = line.strip()
+            if line.startswith('WIND_DATA'):
+                folder = AMON_HOME / 'data' / 'wind_data' / f'wind_data_{line[len("WIND_DATA"):].strip()}'
+                data_filepaths += [folder / 'wind_speed.csv', folder / 'wind_direction.csv']
+            elif line.startswith('ZONE'):
+                folder = AMON_HOME / 'data' / 'zones' / f'zone_{line[len("ZONE"):].strip()}'
+                data_filepaths += [folder / 'boundary_zone.shp', folder / 'exclusion_zone.shp']
+            elif line.startswith('ELEVATION_FUNCTION'):
+                data_filepaths.append(getElevationFilepath(line[len('ELEVATION_FUNCTION'):].strip(), param_filepath))
+            elif line.startswith('WIND_TURBINES'):
+                for index in line[len('WIND_TURBINES'):].split(','):
+                    folder = AMON_HOME / 'data' / 'wind_turbines' / f'wind_turbine_{index.strip()}'
+                    data_filepaths += [folder / 'properties.csv', folder / 'powerct_curve.csv']
+    return [filepath for filepath in data_filepaths if filepath.is_file()]
+
+# @brief   : Returns the files of an instance and their modification times. The cache of built instances and the cache of
+#            evaluations both use it to find out whether an instance changed
+# @params  : param_filepath : path to the param file, absolute or from AMON_HOME
+# @returns : tuple (filepaths, mtimes), the resolved param file followed by every data file it references, and a tuple of
+#            (path, modification time in ns) of each of them
+def getInstanceFiles(param_filepath):
+    param_filepath = (AMON_HOME / Path(param_filepath)).resolve()
+    try:
+        filepaths = [param_filepath] + getDataFilepaths(param_filepath)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"\033[91mError\033[0m: No param file at {param_filepath}")
+    return filepaths, tuple((str(filepath), filepath.stat().st_mtime_ns) for filepath in filepaths)
+
+# Returns the path of the file given to ELEVATION_FUNCTION : the elevation function file for an id, or the .npy raster for
+# "<raster.npy> <origin x> <origin y> <resolution>" (absolute, or relative to the folder of the param file)
+def getElevationFilepath(value, param_filepath):
+    filename = value.split()[0] if value.split() else value
+    if filename.endswith('.npy'):
+        return (AMON_HOME / param_filepath).parent / Path(filename).expanduser()
+    return AMON_HOME / 'data' / 'elevation_functions' / f'elevation_function_{filename}.py'
+
+# Returns the resident set size of the current process in MB, or None if it cannot be read (only works on Linux)
+def getCurrentRSS():
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024**2
+
+# Returns the peak resident set size of the current process in MB, or None if it is not available (Windows)
+def getPeakRSS():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KB on Linux
+
 # For simpler error messages when not in debug mode
 def simple_excepthook(exctype, value, tb):
     print(value)
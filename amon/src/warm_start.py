@@ -0,0 +1,78 @@
+# warm_start.py
+import numpy as np
+
+from py_wake.wind_farm_models.all2alliterative import All2AllIterative, FixedPointSolver
+
+
+# A previous solution is only used as a starting point if no turbine moved by more than this distance, in rotor diameters
+WARM_START_MAX_DISTANCE = 1
+
+
+# All2AllIterative whose fixed-point solver can start from the converged effective wind speeds and turbulence intensities
+# of a previous simulation, instead of the wake-only solution of PropagateDownwind that All2AllIterative starts from.
+# The start is given with the WS_eff and TI_eff_start arguments of the simulation, which PyWake splits in chunks like the
+# other flow case arguments. The number of iterations of the solver is added to the simulation result (iterations variable).
+# Without a start, the simulation is exactly the one of All2AllIterative
+class WarmStartAll2AllIterative(All2AllIterative):
+    def __init__(self, *args, **kwargs):
+        All2AllIterative.__init__(self, *args, **kwargs)
+        # This version of PyWake ignores the convergence_tolerance argument, the tolerance of the default solver is kept so the
+        # outputs do not change
+        self.solver = _WarmStartSolver(tolerance=self.solver.tolerance, verbose=self.verbose)
+
+    def _calc_wt_interaction(self, TI_eff_start_ilk=None, **kwargs):
+        self.solver.TI_eff_start_ilk = TI_eff_start_ilk
+        try:
+            WS_eff_ilk, TI_eff_ilk, ct_ilk, kwargs = All2AllIterative._calc_wt_interaction(self, **kwargs)
+        finally:
+            self.solver.TI_eff_start_ilk = None
+        kwargs['iterations_ilk'] = np.full(WS_eff_ilk.shape, self.iterations)
+        return WS_eff_ilk, TI_eff_ilk, ct_ilk, kwargs
+
+    def _check_input(self, kwargs):
+        All2AllIterative._check_input(self, {k: v for k, v in kwargs.items() if k != 'TI_eff_start_ilk'})
+
+# All2AllIterative only lets the effective wind speed be given, and starts from the ambient turbulence intensity in that case.
+# With a turbulence model, the wind speeds then have to converge again, so the solver also takes the turbulence intensities
+# of the previous solution
+class _WarmStartSolver(FixedPointSolver):
+    TI_eff_start_ilk = None
+
+    def __call__(self, get_new_WS_eff, WS_eff_ilk, TI_eff_ilk, max_iter):
+        if self.TI_eff_start_ilk is not None:
+            TI_eff_ilk = np.broadcast_to(self.TI_eff_start_ilk, np.shape(WS_eff_ilk)) + 0.
+        return FixedPointSolver.__call__(self, get_new_WS_eff, WS_eff_ilk, TI_eff_ilk, max_iter)
+
+
+# Converged flow of a simulation, reused as the starting point of the next simulation of the same flow cases
+class WarmStart:
+    def __init__(self):
+        self.flows = {} # key of the flow cases (chunk of the time series, wind rose) -> (x, y, h, types, ws, wd, WS_eff, TI_eff)
+
+    def get(self, key, x, y, h, types, ws, wd, diameters):
+        '''
+            @brief   : returns the starting point of a simulation
+            @params  : - key            : identifies the flow cases among the ones of an evaluation
+                       - x, y, h, types : layout of the simulation, with absolute heights
+                       - ws, wd         : wind speeds and directions of the flow cases
+                       - diameters      : rotor diameter of each turbine
+            @returns : dict with the WS_eff and TI_eff_start arguments of WarmStartAll2AllIterative, empty if there is no
+                       previous solution of the same flow cases with the same turbines close enough
+        '''
+        flow = self.flows.get(key)
+        if flow is None:
+            return {}
+        x_last, y_last, h_last, types_last, ws_last, wd_last, WS_eff, TI_eff = flow
+        if len(x) != len(x_last) or not np.array_equal(types, types_last) or not (np.array_equal(ws, ws_last) and np.array_equal(wd, wd_last)):
+            return {}
+        displacements = np.sqrt((np.asarray(x) - x_last)**2 + (np.asarray(y) - y_last)**2 + (np.asarray(h) - h_last)**2)
+        if np.any(displacements > WARM_START_MAX_DISTANCE * np.asarray(diameters)):
+            return {}
+        return { 'WS_eff' : WS_eff, 'TI_eff_start' : TI_eff }
+
+    def put(self, key, x, y, h, types, ws, wd, simulation_result):
+        self.flows[key] = (np.array(x, dtype=float), np.array(y, dtype=float), np.array(h, dtype=float), np.array(types), np.array(ws), np.array(wd),
+                           simulation_result.WS_eff.values, simulation_result.TI_eff.values)
+
+    def clear(self):
+        self.flows.clear()
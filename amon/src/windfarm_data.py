@@ -2,7 +2,6 @@
 import numpy  as np
 import xarray as xr
 import pandas as pd
-import shapefile
 import csv
 from py_wake.site import XRSite
 from py_wake.wind_turbines.power_ct_functions import PowerCtTabular
@@ -15,7 +14,10 @@ from py_wake.turbulence_models import CrespoHernandez
 from py_wake.site.shear import PowerShear
 import shapely
 
-from amon.src.utils import AMON_HOME, getFunctionFromFile
+import amon.src.profiling as profiling
+from amon.src.compiled_data import loadArray, loadGeometry
+from amon.src.elevation import AnalyticElevation, NoElevation, RasterElevation, sampleElevation
+from amon.src.utils import AMON_HOME, getElevationFilepath
 
 # Prevents negative deficits, which don't make sense physically and break PyWake with some models
 class SafeSquaredSum(SquaredSum):
@@ -38,6 +40,63 @@ REQUIRED_POWERCT_CURVE_HEADERS   = {'WindSpeed[m/s]', 'Power[MW]', 'Ct'}
 WAKE_DEFICIT_MODELS  = [NOJDeficit, BastankhahGaussianDeficit, CarbajofuertesGaussianDeficit]
 SUPERPOSITION_MODELS = [MaxSum, LinearSum, SafeSquaredSum]
 
+# Wind roses already binned in this process, the server and the Evaluator build the same wind data at several fidelities
+# (wind data id, nb_wd_bins, nb_ws_bins) -> (wind speeds, wind directions, wind rose), see getWindrose
+_WINDROSE_CACHE = {}
+
+
+# @brief   : Bins the wind data in a wind rose. Direction bin i is centered on i*360/nb_wd_bins (bin 0 also takes the
+#            directions of the end of the last sector, above 360 - width/2), speed bin j goes from the j-th to the (j+1)-th
+#            edge of [0, 0.5, 0.5 + max_ws/nb_ws_bins, ..., 0.5 + (nb_ws_bins-1)*max_ws/nb_ws_bins], speeds above the last
+#            edge are not counted. The result is cached per wind data id and number of bins
+# @params  : - wind_data_id             : id of the wind data, key of the cache
+#            - ws, wd                   : 1D arrays, the time series of wind speeds and directions
+#            - nb_wd_bins, nb_ws_bins   : number of direction and speed bins
+# @returns : tuple (wind_direction_bins, wind_speed_bins, probabilities, mean_speeds), with the centers of the direction
+#            bins, the nb_ws_bins + 1 edges of the speed bins, the probability of each (direction, speed) bin and the mean
+#            wind speed of the samples of each bin (nb_wd_bins x nb_ws_bins, nan for the empty bins)
+def getWindrose(wind_data_id, ws, wd, nb_wd_bins, nb_ws_bins):
+    key = (wind_data_id, nb_wd_bins, nb_ws_bins)
+    cached = _WINDROSE_CACHE.get(key)
+    if cached is not None and np.array_equal(cached[0], ws) and np.array_equal(cached[1], wd):
+        return tuple(array.copy() for array in cached[2])
+
+    degrees_per_bin     = 360 / nb_wd_bins
+    speed_units_per_bin = ws.max() / nb_ws_bins
+    wind_direction_bins = np.array([i*degrees_per_bin for i in range(nb_wd_bins)])
+    wind_speed_bins     = np.array([0] + [0.5+speed_units_per_bin*i for i in range(nb_ws_bins)])
+
+    # Same bounds as the sectors [wd - width/2, wd + width/2), searchsorted gives the last sector starting before each direction
+    width = 360 / nb_wd_bins
+    lower_bounds = wind_direction_bins - 0.5*width
+    upper_bounds = wind_direction_bins + 0.5*width
+    wd_indices = np.searchsorted(lower_bounds, wd, side='right') - 1
+    in_sector  = (wd_indices >= 1) & (wd < upper_bounds[np.maximum(wd_indices, 0)])
+    first_sector = (360 - 0.5*width <= wd) | (wd < 0.5*width)
+    ws_indices = np.searchsorted(wind_speed_bins, ws, side='right') - 1
+    in_speed_bin = (ws_indices >= 0) & (ws_indices < nb_ws_bins)
+
+    # The first sector wraps around 360, it is counted on its own (a direction of the last sector can also be in it)
+    counts  = np.bincount(wd_indices[in_sector & in_speed_bin] * nb_ws_bins + ws_indices[in_sector & in_speed_bin], minlength=nb_wd_bins*nb_ws_bins)
+    counts  = counts.reshape(nb_wd_bins, nb_ws_bins)
+    counts[0] += np.bincount(ws_indices[first_sector & in_speed_bin], minlength=nb_ws_bins)
+    probabilities = counts / len(ws)
+
+    # Same for the sum of the speeds, a bin is simulated at the mean speed of its samples rather than at one of its edges,
+    # the power curve is steep between the cut-in and rated speeds
+    binned    = in_sector & in_speed_bin
+    first     = first_sector & in_speed_bin
+    speed_sum = np.bincount(wd_indices[binned] * nb_ws_bins + ws_indices[binned], weights=ws[binned], minlength=nb_wd_bins*nb_ws_bins)
+    speed_sum = speed_sum.reshape(nb_wd_bins, nb_ws_bins)
+    speed_sum[0] += np.bincount(ws_indices[first], weights=ws[first], minlength=nb_ws_bins)
+    with np.errstate(invalid='ignore'):
+        mean_speeds = speed_sum / counts
+
+    windrose = (wind_direction_bins, wind_speed_bins, probabilities, mean_speeds)
+    _WINDROSE_CACHE[key] = (np.array(ws), np.array(wd), windrose)
+    return tuple(array.copy() for array in windrose)
+
+
 
 class WindFarmData:
     def __init__(self, param_file_path, fidelity):
@@ -72,31 +131,39 @@ class WindFarmData:
 
         # All parameters and their respective handler function
         # Each handler function returns the parameter's corresponding object, or the data for building it
-        parameters = { "WIND_DATA"          : self.__getWindData,             # returns dict of pandas dataFrames
-                       "TI"                 : float,
-                       "ZONE"               : self.__getZone,                 # returns shapefile.Reader
-                       "BUDGET"             : float,
-                       "OBJECTIVE_FUNCTION" : self.__getObjectiveFunction,    # returns string 
-                       "ELEVATION_FUNCTION" : self.__getElevationFunction,    # returns python function object
-                       "WIND_TURBINES"      : self.__getWindTurbines,         # returns dict with data
-                       "SCALE_FACTOR"       : float,
-                       "BLACKBOX_OUTPUT"    : self.__getBlackboxOutput,
-                       "NB_WIND_TURBINES"   : self.__getNbWindTurbines,
-                       "OPT_VARIABLES"      : self.__getOptVariables,
-                       "CONSTRAINT_FREE"    : self.__getConstraintFree,
+        parameters = { "WIND_DATA"            : self.__getWindData,             # returns dict of numpy arrays
+                       "TI"                   : float,
+                       "ZONE"                 : self.__getZone,                 # returns dict with the shapefile paths
+                       "BUDGET"               : float,
+                       "OBJECTIVE_FUNCTION"   : self.__getObjectiveFunction,    # returns string 
+                       "ELEVATION_FUNCTION"   : self.__getElevationFunction,    # returns elevation object (see elevation.py)
+                       "ELEVATION_RESOLUTION" : self.__getElevationResolution,
+                       "WIND_TURBINES"        : self.__getWindTurbines,         # returns dict with data
+                       "SCALE_FACTOR"         : float,
+                       "BLACKBOX_OUTPUT"      : self.__getBlackboxOutput,
+                       "NB_WIND_TURBINES"     : self.__getNbWindTurbines,
+                       "OPT_VARIABLES"        : self.__getOptVariables,
+                       "CONSTRAINT_FREE"      : self.__getConstraintFree,
+                       "WINDROSE_FIDELITY"    : self.__getWindroseFidelity,
+                       "BARRIER"              : self.__getBarrier,
                      }
         
         # Initialising optional parameters with default values
         raw_data = {
-            "TI"                 : 0.1,
-            "ELEVATION_FUNCTION" : lambda x, y: 0, # no elevation
-            "SCALE_FACTOR"       : 1,
-            "BUDGET"             : None,
-            "CONSTRAINT_FREE"    : False
+            "TI"                   : 0.1,
+            "ELEVATION_FUNCTION"   : NoElevation(),
+            "ELEVATION_RESOLUTION" : None, # evaluate the elevation function itself
+            "SCALE_FACTOR"         : 1,
+            "BUDGET"               : None,
+            "CONSTRAINT_FREE"      : False,
+            "WINDROSE_FIDELITY"    : 0, # never use the wind rose
+            "BARRIER"              : None # always run the simulation
         }
 
+        self.param_file_path = param_file_path # Raster files are relative to the param file
+
         # Read every line of the param file and set the data from it
-        with open(AMON_HOME / param_file_path, 'r') as param_file:
+        with open(AMON_HOME / param_file_path, 'r') as param_file, profiling.stage('build.param_file'):
             for line in param_file:
                 line = line.strip()
                 for param_name, handler in parameters.items():
@@ -128,40 +195,24 @@ class WindFarmData:
         #- Site object -#
         #---------------#
 
-        wind_data = raw_data['WIND_DATA']
-        # Initialising an empty dataset
-        degrees_per_bin     = 360 / self.nb_wd_bins
-        max_wind_speed      = wind_data['WIND_SPEED'].max().values[0]
-        speed_units_per_bin = max_wind_speed / self.nb_ws_bins
-        wind_direction_bins = np.array([i*degrees_per_bin for i in range(self.nb_wd_bins)])
-        wind_speed_bins     = np.array([0] + [0.5+speed_units_per_bin*i for i in range(self.nb_ws_bins)])
-        wind_rose_data      = pd.DataFrame(data=None, columns=wind_direction_bins, index=wind_speed_bins[1:])
-    
-        # Going through csv data
-        WS = wind_data['WIND_SPEED']
-        WD = wind_data['WIND_DIRECTION']
-        self.WS_BB = WS[list(WS.columns)[0]]
-        self.WD_BB = WD[list(WD.columns)[0]]
-        N  = len(WS)
-        width = 360 / len(wind_direction_bins)
-        for i in range(len(wind_direction_bins)):
-            wd = wind_direction_bins[i]
-            for j in range(len(wind_speed_bins)-1):
-                lower, upper = wind_speed_bins[j], wind_speed_bins[j+1]
-                if wd == 0:
-                    sector = (360 - 0.5*width <= WD.values) | (WD.values < 0.5*width)
-                else:
-                    sector = (wd - 0.5*width <= WD.values) & (WD.values < wd + 0.5*width)
-                TS_sector = WS.values[sector]
-                wind_rose_data.iloc[j,i] = sum((lower <= TS_sector) & (TS_sector < upper)) / N
-
-        wind_rose_dataset = xr.Dataset( data_vars={"P":(("wd", "ws"), wind_rose_data.values.T), "TI":raw_data['TI']},
-                                           coords={"wd":wind_direction_bins, "ws":wind_speed_bins[1:]} )
-
-        self.site = XRSite( ds            = wind_rose_dataset,
-                            interp_method = self.interp_method,
-                            shear         = PowerShear(alpha=0.2), # PowerShear is the most common shear function, and 0.2 is common when on land 
-                            distance      = self.wake_dist_model() if self.wake_dist_model is not None else None ) 
+        with profiling.stage('build.windrose'):
+            wind_data = raw_data['WIND_DATA']
+            self.wind_data_id = wind_data['ID']
+            self.WS_BB = pd.Series(wind_data['WIND_SPEED'])
+            self.WD_BB = pd.Series(wind_data['WIND_DIRECTION'])
+            self.aep_mode = 'windrose' if fidelity < raw_data['WINDROSE_FIDELITY'] else 'time'
+            self.__wind_rose = None # Binned when first used, see wind_rose_wd
+            if self.aep_mode == 'windrose':
+                self.__getWindRose()
+
+        # Every simulation gives the wind speed and direction of each flow case (time=True), so the site only gives the
+        # turbulence intensity and the shear. PyWake weights the flow cases equally and never reads P, the wind rose is
+        # weighted by the blackbox (see Blackbox.windroseAEP)
+        with profiling.stage('build.site'):
+            self.site = XRSite( ds            = xr.Dataset(data_vars={"P" : 1., "TI" : raw_data['TI']}),
+                                interp_method = self.interp_method,
+                                shear         = PowerShear(alpha=0.2), # PowerShear is the most common shear function, and 0.2 is common when on land 
+                                distance      = self.wake_dist_model() if self.wake_dist_model is not None else None ) 
 
         #-----------------------#
         #- WindTurbines object -#
@@ -172,7 +223,8 @@ class WindFarmData:
         hub_heights    = raw_data['WIND_TURBINES']['hub_heights']
         powerct_curves = raw_data['WIND_TURBINES']['powerct_curves']
 
-        self.wind_turbines = WindTurbines(names, diameters, hub_heights, powerct_curves)
+        with profiling.stage('build.turbines'):
+            self.wind_turbines = WindTurbines(names, diameters, hub_heights, powerct_curves)
 
         self.wind_turbines_models = [index - 1 for index in raw_data['WIND_TURBINES']['indices']] # We will use this as list indices, so starting at 0 is necessary
 
@@ -181,27 +233,24 @@ class WindFarmData:
         #- Step 3 : Define the buildable zone -#
         #--------------------------------------#
 
-        boundary_zone_content  = raw_data['ZONE']['boundary_zone']
-        exclusion_zone_content = raw_data['ZONE']['exclusion_zone']
-        boundary_zone          = []
-        exclusion_zone         = []
-        for shape in boundary_zone_content.shapes():
-            coords = np.array(shape.points).T*raw_data['SCALE_FACTOR']
-            boundary_zone.append(shapely.Polygon(coords.T))
-        boundary_zone = [shapely.MultiPolygon(boundary_zone)]
-
-        if exclusion_zone_content:
-            for shape in exclusion_zone_content.shapes():
-                coords = np.array(shape.points).T*raw_data['SCALE_FACTOR']
-                exclusion_zone.append(shapely.Polygon(coords.T))
-        
-        buildable_zone = boundary_zone
-        for polygon in exclusion_zone:
-            buildable_zone = shapely.difference(buildable_zone, polygon)
-
-        self.buildable_zone = buildable_zone
+        with profiling.stage('build.zone'):
+            zone        = raw_data['ZONE']
+            zone_name   = f"zone_{zone['id']}_x{raw_data['SCALE_FACTOR']}".replace('.', '_')
+            zone_build  = lambda: self.__buildZone(zone['boundary_zone'], zone['exclusion_zone'], raw_data['SCALE_FACTOR'])
+            sources     = [filepath for filepath in [zone['boundary_zone'], zone['exclusion_zone']] if filepath is not None]
+            self.buildable_zone = np.array([loadGeometry(zone_name, sources, zone_build)])
 
+        # An elevation function can be sampled on a raster over the zone (padded by 25% on each side for the gradient steps
+        # and the points slightly outside), so each evaluation interpolates instead of calling the function
         self.elevation_function = raw_data['ELEVATION_FUNCTION']
+        if raw_data['ELEVATION_RESOLUTION'] is not None:
+            if not isinstance(self.elevation_function, AnalyticElevation):
+                raise ValueError("\033[91mError\033[0m: ELEVATION_RESOLUTION requires an ELEVATION_FUNCTION id")
+            with profiling.stage('build.elevation'):
+                x_min, y_min, x_max, y_max = self.buildable_zone[0].bounds
+                padding = 0.25 * max(x_max - x_min, y_max - y_min)
+                bounds  = (x_min - padding, y_min - padding, x_max + padding, y_max + padding)
+                self.elevation_function = sampleElevation(self.elevation_function, bounds, raw_data['ELEVATION_RESOLUTION'])
         
 
         #------------------------------------------------------------#
@@ -214,6 +263,28 @@ class WindFarmData:
         self.bbo = raw_data['BLACKBOX_OUTPUT']
         self.budget = raw_data['BUDGET']
         self.constraint_free = raw_data['CONSTRAINT_FREE']
+        self.barrier = raw_data['BARRIER']
+
+    # Non-empty bins of the wind rose and their probability, used to compute the AEP on the wind rose instead of the time series
+    @property
+    def wind_rose_wd(self):
+        return self.__getWindRose()[0]
+
+    @property
+    def wind_rose_ws(self):
+        return self.__getWindRose()[1]
+
+    @property
+    def wind_rose_P(self):
+        return self.__getWindRose()[2]
+
+    def __getWindRose(self):
+        if self.__wind_rose is None:
+            wind_direction_bins, _, probabilities, mean_speeds = getWindrose(self.wind_data_id, self.WS_BB.values, self.WD_BB.values, self.nb_wd_bins, self.nb_ws_bins)
+            wd_indices, ws_indices = np.nonzero(probabilities)
+            self.__wind_rose = (wind_direction_bins[wd_indices], mean_speeds[wd_indices, ws_indices], probabilities[wd_indices, ws_indices])
+        return self.__wind_rose
+
 
 
     #-------------------#
@@ -225,28 +296,72 @@ class WindFarmData:
         id = self.__cast(id, int, "WIND_DATA")
         wind_speed_data_filepath     = AMON_HOME / 'data' / 'wind_data' / f'wind_data_{id}' / 'wind_speed.csv'
         wind_direction_data_filepath = AMON_HOME / 'data' / 'wind_data' / f'wind_data_{id}' / f'wind_direction.csv'
-        return { 'WIND_SPEED'     : pd.read_csv(wind_speed_data_filepath, index_col=0),
-                 'WIND_DIRECTION' : pd.read_csv(wind_direction_data_filepath, index_col=0) }
+        return { 'ID'             : id,
+                 'WIND_SPEED'     : loadArray(f'wind_data_{id}_speed', [wind_speed_data_filepath], lambda: self.__readTimeSeries(wind_speed_data_filepath)),
+                 'WIND_DIRECTION' : loadArray(f'wind_data_{id}_direction', [wind_direction_data_filepath], lambda: self.__readTimeSeries(wind_direction_data_filepath)) }
+
+    def __readTimeSeries(self, filepath):
+        data = pd.read_csv(filepath, index_col=0)
+        return data[list(data.columns)[0]].values
 
     def __getZone(self, id):
         id = self.__cast(id, int, "ZONE")
         boundary_zone_data_filepath = AMON_HOME / 'data' / 'zones' / f'zone_{id}' / 'boundary_zone.shp'
         exclusion_zone_data_filepath = AMON_HOME / 'data' / 'zones' / f'zone_{id}' / 'exclusion_zone.shp'
+        if not boundary_zone_data_filepath.is_file():
+            raise FileNotFoundError(f"No zone for id = {id}, no file at {boundary_zone_data_filepath}")
         if not exclusion_zone_data_filepath.is_file(): # if there are no exclusions, so no exclusion_zone file
-            return { 'boundary_zone'  : shapefile.Reader(boundary_zone_data_filepath),
-                     'exclusion_zone' : None }
-        return { 'boundary_zone'  : shapefile.Reader(boundary_zone_data_filepath),
-                 'exclusion_zone' : shapefile.Reader(exclusion_zone_data_filepath) }
+            exclusion_zone_data_filepath = None
+        return { 'id'             : id,
+                 'boundary_zone'  : boundary_zone_data_filepath,
+                 'exclusion_zone' : exclusion_zone_data_filepath }
+
+    # Buildable zone of the shapefiles, scaled, without the exclusion zones
+    def __buildZone(self, boundary_zone_filepath, exclusion_zone_filepath, scale_factor):
+        import shapefile
+
+        boundary_zone_content  = shapefile.Reader(boundary_zone_filepath)
+        exclusion_zone_content = shapefile.Reader(exclusion_zone_filepath) if exclusion_zone_filepath is not None else None
+        boundary_zone          = []
+        exclusion_zone         = []
+        for shape in boundary_zone_content.shapes():
+            coords = np.array(shape.points).T*scale_factor
+            boundary_zone.append(shapely.Polygon(coords.T))
+        boundary_zone = [shapely.MultiPolygon(boundary_zone)]
+
+        if exclusion_zone_content:
+            for shape in exclusion_zone_content.shapes():
+                coords = np.array(shape.points).T*scale_factor
+                exclusion_zone.append(shapely.Polygon(coords.T))
+
+        buildable_zone = boundary_zone
+        for polygon in exclusion_zone:
+            buildable_zone = shapely.difference(buildable_zone, polygon)
+        return buildable_zone[0]
 
     def __getObjectiveFunction(self, function_name):
         if function_name not in OBJECTIVE_FUNCTIONS:
             raise ValueError(f"OBJECTIVE_FUNCTION must be one of {OBJECTIVE_FUNCTIONS}, got {function_name}")
         return function_name
 
-    def __getElevationFunction(self, id):
-        id = self.__cast(id, int, "ELEVATION_FUNCTION")
-        data_filepath = AMON_HOME / 'data' / 'elevation_functions' / f'elevation_function_{id}.py'
-        return getFunctionFromFile(data_filepath)
+    def __getElevationFunction(self, value):
+        values = value.split()
+        if len(values) == 4 and values[0].endswith('.npy'): # Raster : <raster.npy> <origin x> <origin y> <resolution>
+            origin_x, origin_y, resolution = [self.__cast(number, float, "ELEVATION_FUNCTION raster origin and resolution") for number in values[1:]]
+            data_filepath = getElevationFilepath(value, self.param_file_path)
+            if not data_filepath.is_file():
+                raise ValueError(f"elevation raster {data_filepath} does not exist")
+            return RasterElevation.load(data_filepath, origin_x, origin_y, resolution)
+        if len(values) != 1:
+            raise ValueError("ELEVATION_FUNCTION must be an int, or <raster.npy> <origin x> <origin y> <resolution>")
+        self.__cast(value, int, "ELEVATION_FUNCTION")
+        return AnalyticElevation(getElevationFilepath(value, self.param_file_path))
+
+    def __getElevationResolution(self, resolution):
+        resolution = self.__cast(resolution, float, "ELEVATION_RESOLUTION")
+        if resolution <= 0:
+            raise ValueError("ELEVATION_RESOLUTION must be positive")
+        return resolution
 
     def __getWindTurbines(self, wind_turbines_indices):
         wt_data = { 'names' : [], 'diameters' : [], 'hub_heights' : [], 'powerct_curves' : []}
@@ -266,25 +381,32 @@ class WindFarmData:
             wt_data['hub_heights'].append(int(properties['hub_height[m]']))
 
             # dealing with the powerct curve
-            powerct_curve_file_data = pd.read_csv(data_folder_path / 'powerct_curve.csv')
-            headers = powerct_curve_file_data.columns
-            if not REQUIRED_POWERCT_CURVE_HEADERS.issubset(headers):
-                raise ValueError(f"PowerCt curve headers must include {REQUIRED_POWERCT_CURVE_HEADERS}")
-            wind_speed_values = powerct_curve_file_data['WindSpeed[m/s]'].values
-            power_values = powerct_curve_file_data['Power[MW]'].values*1000
-            raw_ct_values = powerct_curve_file_data['Ct'].values
-            ct_values = []
-            for val in raw_ct_values:
-                if val >= 1:
-                    ct_values.append(0.99)
-                elif val <= 0:
-                    ct_values.append(0.01)
-                else:
-                    ct_values.append(val)
+            powerct_curve_filepath = data_folder_path / 'powerct_curve.csv'
+            powerct_curve = loadArray(f'wind_turbine_{index}_powerct', [powerct_curve_filepath], lambda: self.__readPowerCtCurve(powerct_curve_filepath))
+            wind_speed_values, power_values, ct_values = np.asarray(powerct_curve)
             wt_data['powerct_curves'].append(PowerCtTabular(wind_speed_values, power_values, 'kW', ct_values))
         wt_data['indices'] = wind_turbines_indices
         return wt_data
 
+    # Wind speeds, power (kW) and ct values of a powerct curve file, one per row
+    def __readPowerCtCurve(self, filepath):
+        powerct_curve_file_data = pd.read_csv(filepath)
+        headers = powerct_curve_file_data.columns
+        if not REQUIRED_POWERCT_CURVE_HEADERS.issubset(headers):
+            raise ValueError(f"PowerCt curve headers must include {REQUIRED_POWERCT_CURVE_HEADERS}")
+        wind_speed_values = powerct_curve_file_data['WindSpeed[m/s]'].values
+        power_values = powerct_curve_file_data['Power[MW]'].values*1000
+        raw_ct_values = powerct_curve_file_data['Ct'].values
+        ct_values = []
+        for val in raw_ct_values:
+            if val >= 1:
+                ct_values.append(0.99)
+            elif val <= 0:
+                ct_values.append(0.01)
+            else:
+                ct_values.append(val)
+        return np.array([wind_speed_values, power_values, ct_values], dtype=float)
+
     def __getBlackboxOutput(self, list_outputs):
         list_outputs = [output.strip() for output in list_outputs.split(',')]
         if not set(list_outputs).issubset(ACCEPTED_BBO_VALUES):
@@ -313,6 +435,18 @@ class WindFarmData:
             raise ValueError("CONSTRAINT_FREE must be TRUE or FALSE")
         return answer == 'true'
 
+    def __getWindroseFidelity(self, fidelity):
+        fidelity = self.__cast(fidelity, float, "WINDROSE_FIDELITY")
+        if fidelity < 0 or fidelity > 1:
+            raise ValueError("WINDROSE_FIDELITY must be between 0 and 1")
+        return fidelity
+
+    def __getBarrier(self, threshold):
+        threshold = self.__cast(threshold, float, "BARRIER")
+        if threshold < 0:
+            raise ValueError("BARRIER must be positive or 0")
+        return threshold
+
 
     #-----------------#
     #- Other methods -#
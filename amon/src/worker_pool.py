@@ -0,0 +1,86 @@
+# worker_pool.py
+import multiprocessing
+import os
+import threading
+import time
+
+from amon.src.batch import evalTask
+from amon.src.blackbox import runBB
+from amon.src.eval_cache import EvalCache
+from amon.src.instance_cache import InstanceCache
+from amon.src.surrogate import runSurrogate
+
+
+# State of a worker process, set by _initWorker. Each worker builds and keeps its own blackboxes
+_instance_cache = None
+_eval_cache     = None
+_surrogates     = {}
+
+
+# Worker processes of "amon serve --workers N". They are forked from the server once PyWake is imported, so a worker only
+# has to build the instances it evaluates, and they are kept in its own InstanceCache between requests. The server
+# threads hand each request to the pool, which gives it to an idle worker, so N requests are evaluated at the same time
+class WorkerPool:
+    def __init__(self, nb_workers, cache_size, cache_max_rss=None, warm_start=False, use_eval_cache=True):
+        '''
+            @brief   : forks the worker processes
+            @params  : - nb_workers     : number of worker processes
+                       - cache_size     : maximum number of built instances kept in memory by each worker
+                       - cache_max_rss  : maximum resident memory of each worker in MB, see InstanceCache
+                       - warm_start     : warm start the wake solver of the instances of each worker, see warm_start.py
+                       - use_eval_cache : if True, the workers look for the points in the evaluation cache and add their outputs to it
+            @returns : nothing
+        '''
+        if nb_workers < 1:
+            raise ValueError("\033[91mError\033[0m: The number of workers must be at least 1")
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise ValueError("\033[91mError\033[0m: --workers needs fork, which is not available on this platform")
+        self.nb_workers = nb_workers
+        self.pool       = multiprocessing.get_context('fork').Pool(nb_workers, initializer=_initWorker, initargs=(cache_size, cache_max_rss, warm_start, use_eval_cache))
+
+    def run(self, data):
+        '''
+            @brief   : evaluates a /run request on a worker
+            @params  : data : dict, json of the request (see client.runBBRequest)
+            @returns : string, the blackbox output
+        '''
+        return self.pool.apply(_runRequest, (data,))
+
+    def evalPoints(self, param_filepath, fidelity, tasks):
+        '''
+            @brief   : evaluates the points of a batch over the workers, one point per task
+            @params  : - param_filepath : path to the param file
+                       - fidelity       : float between 0 and 1
+                       - tasks          : list of (values, seed, max_memory, barrier), one per point
+            @returns : list of (success, result, evaluation time, warm started) tuples, see batch.evalTask
+        '''
+        return self.pool.map(_evalPoint, [(param_filepath, fidelity) + tuple(task) for task in tasks], chunksize=1)
+
+def _initWorker(cache_size, cache_max_rss, warm_start, use_eval_cache):
+    global _instance_cache, _eval_cache
+    _instance_cache = InstanceCache(max_size=cache_size, max_rss=cache_max_rss, warm_start=warm_start)
+    _eval_cache     = EvalCache() if use_eval_cache else None
+    threading.Thread(target=_exitWithServer, args=(os.getppid(),), daemon=True).start()
+
+# The server stops with os._exit (see server.shutdown), which does not stop the pool, so the workers exit once it is gone
+def _exitWithServer(server_pid):
+    while os.getppid() == server_pid:
+        time.sleep(0.5)
+    os._exit(0)
+
+def _runRequest(data):
+    args = type("Args", (), data)() # Make object to use same syntax as argparse in runBB
+    try:
+        if getattr(args, 'surrogate', False):
+            return runSurrogate(args, _eval_cache, _surrogates)
+        return runBB(args, _instance_cache, _eval_cache)
+    except FileNotFoundError as e:
+        return str(e)
+
+def _evalPoint(task):
+    param_filepath, fidelity, values, seed, max_memory, barrier = task
+    try:
+        windfarm_data, blackbox = _instance_cache.get(param_filepath, fidelity)
+    except Exception as e:
+        return False, str(e), None, False
+    return evalTask(windfarm_data, blackbox, values, seed, max_memory, barrier)
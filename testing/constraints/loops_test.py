@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+import shapely
+
+import amon.src.utils as utils
+from amon.src.blackbox import Blackbox, _getLayout
+from amon.src.utils import AMON_HOME, getParamFilepath, parsePoint
+from amon.src.windfarm_data import WindFarmData
+from testing.results import exitWithResults, printResult
+
+# Checks that the spacing, placing and height constraints of Blackbox.constraints (spatial index and vectorized shapely
+# calls) are exactly the ones of the previous Python loops, copied below :
+#     - on the starting point of every instance
+#     - on a layout of 1000 random turbines of random types around the zone of every instance, with coincident turbines
+#       and random heights, so every constraint is violated
+# Run from the root of the repo : PYTHONPATH=. python testing/constraints/loops_test.py
+
+NB_RANDOM_TURBINES = 1000
+
+# Blackbox.constraints before the spatial index, without the budget
+def loopConstraints(buildable_zone, x, y, chosen_models, diameters, heights):
+    points = [shapely.Point(x_i, y_i) for x_i, y_i in zip(x, y)]
+    distance_matrix = [shapely.distance(point_i, points) for point_i in points]
+    for i in range(len(points)):
+        for j in range(0, i):
+            distance_matrix[i][j] = 0
+
+    sum_dist_between_wt = 0
+    for i, list_distances in enumerate(distance_matrix):
+        for j, d in enumerate(list_distances):
+            if d == 0:
+                continue
+            sum_dist_between_wt += min(d - diameters[i] - diameters[j], 0)
+    sum_dist_between_wt *= -1
+
+    distances = shapely.distance(points, buildable_zone)
+    sum_dist_buildable_zone = sum(distances)
+
+    max_heights = [utils.MAX_TURBINE_HEIGHTS[i] for i in chosen_models]
+    min_heights = [diameter / 2 for diameter in diameters]
+    sum_excess_height = 0
+    for height, max_height, min_height in zip(heights, max_heights, min_heights):
+        if height > max_height:
+            sum_excess_height += height - max_height
+        elif height < min_height:
+            sum_excess_height += min_height - height
+
+    return { 'placing' : sum_dist_buildable_zone,
+             'spacing' : sum_dist_between_wt,
+             'height'  : sum_excess_height }
+
+def compare(name, blackbox, x, y, models, diameters, heights):
+    start_time = time.perf_counter()
+    expected   = loopConstraints(blackbox.buildable_zone, x, y, models, diameters, heights)
+    loop_time  = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    constraints = blackbox.constraints(x, y, models, diameters, heights, heights)
+    new_time   = time.perf_counter() - start_time
+    same = all(constraints[field] == expected[field] for field in expected)
+    printResult(name, same, f"spacing {constraints['spacing']:.6g}, placing {constraints['placing']:.6g}, height {constraints['height']:.6g} (loops {loop_time*1e3:.1f} ms, now {new_time*1e3:.1f} ms)")
+
+def main():
+    rng = np.random.default_rng(1)
+    for instance in range(1, 7):
+        windfarm_data = WindFarmData(getParamFilepath(instance), 0.1)
+        blackbox      = Blackbox(None, windfarm_data.buildable_zone, lifetime=240, sale_price=75.900, budget=None)
+
+        values = np.loadtxt(AMON_HOME / 'starting_pts' / f'x{instance}.txt').tolist()
+        layout = _getLayout(windfarm_data, parsePoint(values, windfarm_data.nb_turbines, windfarm_data.opt_variables))
+        compare(f"Instance {instance}, starting point", blackbox, layout['x'], layout['y'], layout['models'], layout['diameters'], layout['heights'])
+
+        x_min, y_min, x_max, y_max = shapely.bounds(windfarm_data.buildable_zone[0])
+        margin = 0.1 * max(x_max - x_min, y_max - y_min)
+        x = rng.uniform(x_min - margin, x_max + margin, NB_RANDOM_TURBINES)
+        y = rng.uniform(y_min - margin, y_max + margin, NB_RANDOM_TURBINES)
+        x[1::50], y[1::50] = x[0::50], y[0::50] # Coincident turbines
+        types     = rng.integers(len(windfarm_data.wind_turbines_models), size=NB_RANDOM_TURBINES)
+        models    = [windfarm_data.wind_turbines_models[type_] for type_ in types]
+        diameters = [windfarm_data.wind_turbines.diameter(type_) for type_ in types]
+        heights   = rng.uniform(0, 200, NB_RANDOM_TURBINES).tolist()
+        compare(f"Instance {instance}, {NB_RANDOM_TURBINES} random turbines", blackbox, x.tolist(), y.tolist(), models, diameters, heights)
+
+main()
+exitWithResults()
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+from scipy.stats import weibull_min
+
+import amon.src.cost as cost
+import amon.src.utils as utils
+from testing.results import exitWithResults, printResult
+
+# Checks that the lifetime cost (cost.lifetimeCost) is exactly the one of the previous loop over the turbines, which drew the
+# lifespans of the parts one weibull_min.rvs call at a time for every turbine, for many seeds, lifetimes and wind farms.
+# Also checks that the memoized replacements are bounded by REPLACEMENTS_CACHE_SIZE.
+# Run from the root of the repo : PYTHONPATH=. python testing/cost/replacements_test.py
+
+# Previous number of replacements, one rvs call per lifespan
+def loopNbReplacements(lifetime):
+    rng = np.random.default_rng(utils.SEED)
+    nb_replacements = {}
+    for part_name in cost.beta:
+        k = cost.beta[part_name]
+        lambd = cost.theta[part_name]**(-1/k)
+        nb = 0
+        total_lifetime = 0
+        while True:
+            total_lifetime += weibull_min.rvs(k, scale=lambd, random_state=rng)
+            if total_lifetime >= lifetime:
+                break
+            nb += 1
+        nb_replacements[part_name] = nb
+    return nb_replacements
+
+# Previous lifetime cost, one loop over the turbines
+def loopLifetimeCost(chosen_models, heights, default_heights, lifetime):
+    total = 0
+    for chosen_model, height, default_height in zip(chosen_models, heights, default_heights):
+        costs = cost.WIND_TURBINES_COSTS[chosen_model]
+        for part_cost, nb_replacements in zip(costs['parts'].values(), loopNbReplacements(lifetime).values()):
+            total += part_cost * nb_replacements
+        height_added = height - default_height
+        if height_added > 0:
+            total += costs['h_augment'] * height_added
+        total += costs['price'] + costs['install']
+    return total
+
+def main():
+    rng = np.random.default_rng(0)
+    for lifetime in [60, 240, 600]:
+        nb_different = 0
+        loop_time, vectorized_time = 0, 0
+        for seed in range(500):
+            utils.setSeed(seed)
+            nb_turbines     = int(rng.integers(1, 40))
+            chosen_models   = rng.integers(0, len(cost.WIND_TURBINES_COSTS), nb_turbines).tolist()
+            default_heights = rng.uniform(80, 150, nb_turbines).tolist()
+            heights         = (np.array(default_heights) + rng.uniform(-20, 20, nb_turbines)).tolist()
+            start_time = time.perf_counter()
+            expected   = loopLifetimeCost(chosen_models, heights, default_heights, lifetime)
+            loop_time += time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            result     = [cost.lifetimeCost(chosen_models, heights, default_heights, lifetime) for _ in range(2)] # Constraints and objective
+            vectorized_time += time.perf_counter() - start_time
+            if result != [expected, expected] or cost.getNbReplacements(lifetime) != loopNbReplacements(lifetime):
+                nb_different += 1
+        printResult(f"Lifetime {lifetime} months, 500 seeds", nb_different == 0, f"loop {loop_time:.3f} s, vectorized (2 calls) {vectorized_time:.3f} s, {nb_different} different", labels=('identical', 'different'))
+
+    for seed in range(cost.REPLACEMENTS_CACHE_SIZE + 10):
+        utils.setSeed(seed)
+        cost.getNbReplacements(240)
+    utils.setSeed(0)
+    bounded = len(cost._REPLACEMENTS_CACHE) == cost.REPLACEMENTS_CACHE_SIZE and cost.getNbReplacements(240) == loopNbReplacements(240)
+    printResult("Memoized replacements", bounded, f"{len(cost._REPLACEMENTS_CACHE)} entries")
+
+main()
+exitWithResults()
@@ -0,0 +1,26 @@
+import numpy as np
+
+from amon.src.blackbox import buildBlackbox
+from amon.src.utils import getParamFilepath
+
+# Checks if the models of a fidelity are separable per pair of turbines, which is needed to only recompute
+# the rows and columns of the moved turbines when evaluating a new layout.
+# Four aligned turbines, wind from the west, the last one (most downstream) is moved. If the wake deficits were
+# independent per pair, the power of the three upstream turbines would not change.
+# Run from the root of the repo : PYTHONPATH=. python testing/delta/coupling_test.py
+
+def main():
+    x = np.array([0., 500, 1000, 1500])
+    y = np.zeros(4)
+    moved_x = x.copy()
+    moved_x[3] += 50
+    for fidelity in [0.1, 0.2, 0.5, 0.8, 1]:
+        _, blackbox = buildBlackbox(getParamFilepath(3), fidelity)
+        kwargs = dict(wd=[270.], ws=[10.], time=True, yaw=0, tilt=0)
+        power       = blackbox.wind_farm(x, y, **kwargs).Power.values.ravel()
+        moved_power = blackbox.wind_farm(moved_x, y, **kwargs).Power.values.ravel()
+        upstream_change = np.abs(moved_power[:3] - power[:3]).max()
+        print(f"\033[94mFidelity {fidelity}\033[0m : max power change of the upstream turbines = {upstream_change:.3f} W", end=' ')
+        print("(\033[92mseparable\033[0m)" if upstream_change == 0 else "(\033[91mcoupled\033[0m)")
+
+main()
@@ -0,0 +1,61 @@
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from amon import Evaluator
+from amon.src.elevation import AnalyticElevation, RasterElevation, sampleElevation
+from amon.src.utils import AMON_HOME, getParamFilepath
+from amon.src.windfarm_data import WindFarmData
+from testing.results import exitWithResults, printResult
+
+# Checks the elevation of elevation.py :
+#     - the vectorized elevation function gives exactly the values of the previous calls per point
+#     - the bilinear interpolation of a raster is exact for a plane, and the sampled raster of elevation function 1 is close to it
+#     - the elevations are the same after pickling (instance snapshots)
+#     - instance 5 with its elevation given as a .npy raster and with ELEVATION_RESOLUTION
+# Run from the root of the repo : PYTHONPATH=. python testing/elevation/raster_test.py
+
+def main():
+    elevation = AnalyticElevation(AMON_HOME / 'data' / 'elevation_functions' / 'elevation_function_1.py')
+    X, Y = np.meshgrid(np.linspace(-1000, 1000, 500), np.linspace(-1000, 1000, 500))
+    start_time = time.perf_counter()
+    expected = np.array([[elevation.function(x, y) for x, y in zip(row_x, row_y)] for row_x, row_y in zip(X, Y)])
+    loop_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    Z = elevation(X, Y)
+    vectorized_time = time.perf_counter() - start_time
+    printResult("Vectorized elevation function", np.array_equal(Z, expected), f"loop {loop_time:.3f} s, vectorized {vectorized_time*1e3:.2f} ms")
+
+    plane  = lambda x, y: 0.02 * x - 0.01 * y + 3
+    raster = RasterElevation(plane(*np.meshgrid(np.arange(-1000, 1001, 50.), np.arange(-1000, 1001, 50.))), -1000, -1000, 50)
+    x, y   = np.random.default_rng(1).uniform(-1000, 1000, (2, 1000))
+    printResult("Bilinear interpolation of a plane", np.allclose(raster(x, y), plane(x, y)), f"max error {np.abs(raster(x, y) - plane(x, y)).max():.2e} m")
+
+    sampled = sampleElevation(elevation, (-1000, -1000, 1000, 1000), 10)
+    error   = np.abs(sampled(x, y) - elevation(x, y)).max()
+    printResult("Elevation function 1 sampled every 10 m", error < 0.1, f"max error {error:.2e} m")
+
+    unpickled = [pickle.loads(pickle.dumps(e)) for e in [elevation, raster, sampled]]
+    printResult("Pickling", all(np.array_equal(e(x, y), u(x, y)) for e, u in zip([elevation, raster, sampled], unpickled)))
+
+    # Instance 5 with its elevation function as a raster file, and sampled by ELEVATION_RESOLUTION
+    params = Path(AMON_HOME / getParamFilepath(5)).read_text()
+    zone   = WindFarmData(getParamFilepath(5), 1).buildable_zone[0]
+    x_min, y_min, x_max, y_max = zone.bounds
+    x_min, y_min = np.floor(x_min) - 1000, np.floor(y_min) - 1000
+    with tempfile.TemporaryDirectory() as folder:
+        nodes = np.meshgrid(x_min + 5. * np.arange(int((x_max - x_min) / 5) + 400), y_min + 5. * np.arange(int((y_max - y_min) / 5) + 400))
+        np.save(Path(folder) / 'raster.npy', elevation(*nodes))
+        (Path(folder) / 'raster.txt').write_text(params.replace('ELEVATION_FUNCTION 1', f'ELEVATION_FUNCTION raster.npy {x_min} {y_min} 5'))
+        (Path(folder) / 'sampled.txt').write_text(params + '\nELEVATION_RESOLUTION 5\n')
+        point    = np.loadtxt(AMON_HOME / 'starting_pts' / 'x5.txt')
+        expected = Evaluator(5, seed=1).evaluate(point)[0]
+        for name in ['raster', 'sampled']:
+            objective = Evaluator(Path(folder) / f'{name}.txt', seed=1).evaluate(point)[0]
+            printResult(f"Instance 5, {name} elevation", abs(objective - expected) < 1e-3 * abs(expected), f"{objective} (function : {expected})")
+
+main()
+exitWithResults()
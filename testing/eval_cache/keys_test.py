@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import amon.src.eval_cache as eval_cache_module
+from amon.src.eval_cache import EvalCache, getInstanceHash, getVersions
+from amon.src.utils import AMON_HOME, getParamFilepath
+from testing.results import exitWithResults, printResult
+
+# Checks the evaluation cache (eval_cache.py) :
+#     - an output is only returned for the same instance, fidelity, point, seed, memory budget and barrier
+#     - an output is not returned after an upgrade of PyWake (versions of the libraries)
+#     - the instance hash does not change when a data file is only touched, and changes when its contents change
+#     - the least recently used entries are removed above max_entries
+#     - a second "amon run" of the same point is a hit, with the same output
+# Run from the root of the repo : PYTHONPATH=. python testing/eval_cache/keys_test.py
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['AMON_CACHE_DIR'] = folder
+        eval_cache = EvalCache()
+        param_filepath = getParamFilepath(3)
+        values = np.loadtxt(AMON_HOME / 'starting_pts' / 'x3.txt').tolist()
+
+        # Keys
+        eval_cache.put(param_filepath, 1, values, 1, None, 'output', 1.)
+        eval_cache.put(param_filepath, 1, values, None, None, 'random output', 1.)
+        hit    = eval_cache.get(param_filepath, 1., values, 1) == 'output'
+        misses = [eval_cache.get(param_filepath, 0.5, values, 1),
+                  eval_cache.get(param_filepath, 1, values, 2),
+                  eval_cache.get(param_filepath, 1, [values[0] + 1e-9] + values[1:], 1),
+                  eval_cache.get(param_filepath, 1, values, 1, max_memory=100),
+                  eval_cache.get(param_filepath, 1, values, 1, barrier=0.),
+                  eval_cache.get(getParamFilepath(4), 1, values, 1),
+                  eval_cache.get(param_filepath, 1, values, None)]
+        printResult("Keys", hit and all(miss is None for miss in misses) and eval_cache.stats()['entries'] == 1, f"{sum(miss is None for miss in misses)}/{len(misses)} misses")
+
+        # Versions of the libraries
+        versions = getVersions()
+        eval_cache_module._versions = versions[:1] + ['0.0.0'] + versions[2:]
+        upgraded = eval_cache.get(param_filepath, 1, values, 1)
+        eval_cache_module._versions = versions
+        printResult("PyWake upgrade", upgraded is None and eval_cache.get(param_filepath, 1, values, 1) == 'output', ' '.join(versions[1:]))
+
+        # Instance hash, instance 5 with an elevation raster next to its param file
+        instance_folder = Path(folder) / 'instance'
+        instance_folder.mkdir()
+        raster_filepath = instance_folder / 'raster.npy'
+        np.save(raster_filepath, np.zeros((3, 3)))
+        param_filepath = instance_folder / 'params.txt'
+        param_filepath.write_text((AMON_HOME / getParamFilepath(5)).read_text().replace('ELEVATION_FUNCTION 1', 'ELEVATION_FUNCTION raster.npy -100000 -100000 100000'))
+        first_hash = getInstanceHash(param_filepath)
+        eval_cache.put(param_filepath, 1, [0., 0.], 1, None, 'output', 1.)
+        mtime = raster_filepath.stat().st_mtime_ns
+        os.utime(raster_filepath, ns=(mtime + 10**9, mtime + 10**9))
+        touched_hash = getInstanceHash(param_filepath)
+        still_hit    = eval_cache.get(param_filepath, 1, [0., 0.], 1) == 'output'
+        np.save(raster_filepath, np.ones((3, 3)))
+        changed_hash = getInstanceHash(param_filepath)
+        printResult("Instance hash", touched_hash == first_hash and still_hit and changed_hash != first_hash and eval_cache.get(param_filepath, 1, [0., 0.], 1) is None)
+
+        # Least recently used entries
+        small_cache = EvalCache(cache_dir=Path(folder) / 'small', max_entries=2)
+        for seed in range(3):
+            small_cache.put(getParamFilepath(3), 1, values, seed, None, f'output {seed}', 1.)
+            time.sleep(0.01)
+        kept = [small_cache.get(getParamFilepath(3), 1, values, seed) for seed in range(3)]
+        printResult("Maximum number of entries", kept == [None, 'output 1', 'output 2'], f"{small_cache.stats()['entries']} entries kept")
+
+        # Hit of a second run, with a new cache
+        eval_cache.clear()
+        command = [sys.executable, '-W', 'ignore', '-m', 'amon.src.main', 'run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-s', '1']
+        outputs, times = [], []
+        for _ in range(2):
+            start_time = time.perf_counter()
+            outputs.append(subprocess.run(command, capture_output=True, text=True).stdout)
+            times.append(time.perf_counter() - start_time)
+        stats = eval_cache.stats()
+        printResult("Second run", outputs[0] == outputs[1] and stats['entries'] == 1 and stats['hits'] == 1, f"{times[0]:.2f} s then {times[1]:.2f} s, {outputs[1].strip()}")
+
+main()
+exitWithResults()
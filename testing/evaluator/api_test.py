@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from amon import Evaluator
+from amon.src.utils import AMON_HOME
+from testing.results import exitWithResults, printResult
+
+# Checks the Evaluator (evaluator.py) against "amon run" :
+#     - evaluate gives the outputs of "amon run" with the same seed (printed with 10 decimals)
+#     - evaluate_many gives the rows of evaluate, evaluate_replications the outputs of the seeds seed, seed + 1, ...
+#     - bbo, opt_variables and nb_turbines are the ones of the param file, and points of the wrong shape are refused
+# Run from the root of the repo : PYTHONPATH=. python testing/evaluator/api_test.py
+
+def amonRun(instance, seed):
+    command = [sys.executable, '-W', 'ignore', '-m', 'amon.src.main', 'run', str(instance), str(AMON_HOME / 'starting_pts' / f'x{instance}.txt'), '-s', str(seed), '--no-cache', '--no-snapshot']
+    output  = subprocess.run(command, capture_output=True, text=True).stdout.split()
+    return np.array([np.nan if value == '-' else float(value) for value in output])
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ['AMON_CACHE_DIR'] = cache_dir
+        for instance in [3, 4]:
+            evaluator = Evaluator(instance, seed=1)
+            point     = np.loadtxt(AMON_HOME / 'starting_pts' / f'x{instance}.txt')
+            outputs   = evaluator.evaluate(point)
+            expected  = amonRun(instance, 1)
+            printResult(f"Instance {instance}, evaluate", np.allclose(outputs, expected, rtol=0, atol=1e-10, equal_nan=True), ' '.join(f'{value:.10f}' for value in outputs))
+
+            many = evaluator.evaluate_many([point, point])
+            printResult(f"Instance {instance}, evaluate_many", many.shape == (2, len(evaluator.bbo)) and np.array_equal(many[0], outputs, equal_nan=True) and np.array_equal(many[1], outputs, equal_nan=True))
+
+            _, _, replications = evaluator.evaluate_replications(point, 2)
+            expected = np.array([amonRun(instance, seed) for seed in [1, 2]])
+            printResult(f"Instance {instance}, evaluate_replications", np.allclose(replications, expected, rtol=1e-9, atol=1e-9, equal_nan=True))
+
+        evaluator = Evaluator(3, seed=1)
+        with open(AMON_HOME / 'instances' / '3' / 'params.txt') as param_file:
+            params = dict(line.split(None, 1) for line in param_file.read().splitlines() if line.split())
+        same_fields = evaluator.bbo == [field.strip() for field in params['BLACKBOX_OUTPUT'].split(',')] and \
+                      evaluator.opt_variables == [variable.strip() for variable in params['OPT_VARIABLES'].split(',')] and \
+                      evaluator.nb_turbines == int(params['NB_WIND_TURBINES'])
+        printResult("Properties", same_fields, f"{evaluator.bbo}, {evaluator.opt_variables}, {evaluator.nb_turbines} turbines")
+
+        refused = 0
+        for bad_point in [np.zeros((2, 12)), np.zeros(5)]:
+            try:
+                evaluator.evaluate(bad_point)
+            except ValueError:
+                refused += 1
+        printResult("Points of the wrong shape", refused == 2, f"{refused}/2 refused")
+
+main()
+exitWithResults()
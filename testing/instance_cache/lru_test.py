@@ -0,0 +1,55 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from amon.src.instance_cache import InstanceCache
+from amon.src.utils import AMON_HOME, getParamFilepath
+from testing.results import exitWithResults, printResult
+
+# Checks the InstanceCache of the server (instance_cache.py) :
+#     - the least recently used instance is evicted when the cache is full, and a hit moves an instance to the end
+#     - an instance is built again when its param file or one of its data files (here an elevation raster) is modified
+#     - with max_rss, the instances are evicted down to the last one
+# Run from the root of the repo : PYTHONPATH=. python testing/instance_cache/lru_test.py
+
+FIDELITY = 0.1
+
+def main():
+    # LRU eviction, with 3 instances in a cache of 2
+    cache = InstanceCache(max_size=2)
+    built = {}
+    for instance in [3, 4]:
+        built[instance] = cache.get(getParamFilepath(instance), FIDELITY)[1]
+    same_object = cache.get(getParamFilepath(3), FIDELITY)[1] is built[3] # Hit, 4 is now the least recently used
+    cache.get(getParamFilepath(5), FIDELITY)                              # Evicts 4
+    kept_3      = cache.get(getParamFilepath(3), FIDELITY)[1] is built[3]
+    rebuilt_4   = cache.get(getParamFilepath(4), FIDELITY)[1] is not built[4]
+    printResult("LRU eviction", same_object and kept_3 and rebuilt_4 and len(cache) == 2 and (cache.hits, cache.misses) == (2, 4), f"{cache.hits} hits, {cache.misses} misses")
+
+    # Modification of the param file and of a data file, instance 5 with a flat elevation raster next to its param file
+    with tempfile.TemporaryDirectory() as folder:
+        param_filepath  = Path(folder) / 'params.txt'
+        raster_filepath = Path(folder) / 'raster.npy'
+        np.save(raster_filepath, np.zeros((3, 3)))
+        param_filepath.write_text((AMON_HOME / getParamFilepath(5)).read_text().replace('ELEVATION_FUNCTION 1', 'ELEVATION_FUNCTION raster.npy -100000 -100000 100000'))
+        cache = InstanceCache(max_size=2)
+        first = cache.get(param_filepath, FIDELITY)[1]
+        hit   = cache.get(param_filepath, FIDELITY)[1] is first
+        mtime = param_filepath.stat().st_mtime_ns
+        os.utime(param_filepath, ns=(mtime + 10**9, mtime + 10**9))
+        second = cache.get(param_filepath, FIDELITY)[1]
+        mtime = raster_filepath.stat().st_mtime_ns
+        os.utime(raster_filepath, ns=(mtime + 10**9, mtime + 10**9))
+        third = cache.get(param_filepath, FIDELITY)[1]
+        printResult("Modified param file and data file", hit and second is not first and third is not second and len(cache) == 1, f"{cache.hits} hits, {cache.misses} misses")
+
+    # Memory bound below the memory of the process, only the last instance is kept
+    cache = InstanceCache(max_size=8, max_rss=1)
+    for instance in [3, 4]:
+        cache.get(getParamFilepath(instance), FIDELITY)
+    printResult("Memory bound", len(cache) == 1 and cache.get(getParamFilepath(4), FIDELITY) is not None and cache.hits == 1, f"{len(cache)} instance kept")
+
+main()
+exitWithResults()
@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from amon import Evaluator
+from amon.src.utils import AMON_HOME
+from testing.results import exitWithResults, printResult
+
+# Checks that the iterations of the wake solver are counted with the plain All2AllIterative of PyWake (without warm start) :
+#     - the json of "amon run --profile FILE" has solver_iterations, one positive count per simulation
+#     - Evaluator(...).solver_iterations is the count of the last evaluation
+# Run from the root of the repo : PYTHONPATH=. python testing/profiling/iterations_test.py
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['AMON_CACHE_DIR'] = folder
+        for instance in [3, 4]:
+            profile_filepath = Path(folder) / f'profile{instance}.json'
+            point_filepath   = AMON_HOME / 'starting_pts' / f'x{instance}.txt'
+            subprocess.run([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', 'run', str(instance), str(point_filepath), '-s', '1', '--profile', str(profile_filepath)], capture_output=True, text=True)
+            try:
+                iterations = json.loads(profile_filepath.read_text()).get('solver_iterations', [])
+            except (OSError, ValueError):
+                iterations = []
+            printResult(f"Instance {instance}, amon run --profile", len(iterations) > 0 and all(isinstance(count, int) and count > 0 for count in iterations), f"solver_iterations {iterations}")
+
+            evaluator = Evaluator(instance, seed=1)
+            evaluator.evaluate(np.loadtxt(point_filepath))
+            printResult(f"Instance {instance}, Evaluator", evaluator.solver_iterations is not None and evaluator.solver_iterations > 0, f"{evaluator.solver_iterations} iterations")
+
+main()
+exitWithResults()
@@ -0,0 +1,28 @@
+# results.py
+import sys
+
+# Results of the checks of a testing script. Each check is printed on one line, and the script exits with status 1 if
+# one of them failed, so the scripts can be run by an automated job.
+# Usage, from the root of the repo (PYTHONPATH=.) : from testing.results import printResult, exitWithResults
+
+_nb_failed = 0
+
+# @brief   : Prints the result of a check, and records it if it failed
+# @params  : - name    : name of the check
+#            - passed  : True if the check passed
+#            - details : measures shown after the name
+#            - labels  : words shown for a passed and a failed check
+# @returns : passed
+def printResult(name, passed, details='', labels=('passed', 'failed')):
+    global _nb_failed
+    print(f"\033[94m{name}\033[0m : {details}", end=' ')
+    print(f"(\033[92m{labels[0]}\033[0m)" if passed else f"(\033[91m{labels[1]}\033[0m)")
+    if not passed:
+        _nb_failed += 1
+    return passed
+
+# @brief   : Exits with status 1 if a check failed, 0 otherwise. Called at the end of the script
+def exitWithResults():
+    if _nb_failed:
+        print(f"\033[91m{_nb_failed} check(s) failed\033[0m")
+    sys.exit(1 if _nb_failed else 0)
@@ -0,0 +1,90 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+from amon.src.unix_socket import request
+from amon.src.utils import AMON_HOME, getParamFilepath
+from testing.results import exitWithResults, printResult
+
+# Compares the latency of the HTTP port and of the Unix socket of "amon serve --socket" on an evaluation found in the
+# evaluation cache of the server, so only the transport and the cache lookup are timed :
+#     - round trip of a request sent from this process (requests for HTTP, unix_socket.request for the socket)
+#     - wall time of a whole "amon run -r" command (new interpreter, imports, request)
+# The outputs of both transports must be the ones of "amon run". The server is then killed, and a new one must start on
+# the socket file it left, then remove it when shut down.
+# Run from the root of the repo : PYTHONPATH=. python testing/server/socket_test.py
+
+PORT           = 8798
+NB_ROUND_TRIPS = 200
+NB_COMMANDS    = 10
+
+def amon(*args):
+    return subprocess.run([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', *args], capture_output=True, text=True).stdout.strip()
+
+def startServer(socket_path):
+    return subprocess.Popen([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', 'serve', '--port', str(PORT), '--socket', socket_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def timeRoundTrips(send):
+    times = []
+    for _ in range(NB_ROUND_TRIPS):
+        start_time = time.perf_counter()
+        send()
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times)
+
+def main():
+    point = str(AMON_HOME / 'starting_pts' / 'x3.txt')
+    data  = { 'instance_or_param_file' : str(getParamFilepath(3)), 'point' : point, 's' : 1, 'f' : 1, 'max_memory' : None,
+              'surrogate' : False, 'replications' : None, 'gradient' : False, 'barrier' : None }
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['AMON_CACHE_DIR'] = folder
+        socket_path = str(Path(folder) / 'amon.sock')
+        expected = amon('run', '3', point, '-s', '1') # Also adds the evaluation to the cache
+        server = startServer(socket_path)
+        try:
+            while amon('run', '3', point, '-s', '1', '-r', '--socket', socket_path) != expected: # Until the server is up
+                time.sleep(0.5)
+            http_output   = amon('run', '3', point, '-s', '1', '-r', '--port', str(PORT))
+            socket_output = amon('run', '3', point, '-s', '1', '-r', '--socket', socket_path)
+            printResult("Same outputs", http_output == socket_output == expected, socket_output)
+
+            http_time   = timeRoundTrips(lambda: requests.post(f"http://localhost:{PORT}/run", json=data).text)
+            socket_time = timeRoundTrips(lambda: request(socket_path, 'run', data))
+            printResult("Round trip", socket_time < http_time, f"HTTP {http_time*1e3:.2f} ms, socket {socket_time*1e3:.2f} ms (median of {NB_ROUND_TRIPS})")
+
+            command_times = {}
+            for transport, option in [('HTTP', ['--port', str(PORT)]), ('socket', ['--socket', socket_path])]:
+                times = []
+                for _ in range(NB_COMMANDS):
+                    start_time = time.perf_counter()
+                    amon('run', '3', point, '-s', '1', '-r', *option)
+                    times.append(time.perf_counter() - start_time)
+                command_times[transport] = statistics.median(times)
+            printResult("amon run -r", command_times['socket'] < command_times['HTTP'], f"HTTP {command_times['HTTP']*1e3:.0f} ms, socket {command_times['socket']*1e3:.0f} ms (median of {NB_COMMANDS})")
+        finally:
+            server.kill()
+            server.wait()
+
+        # The killed server left its socket file, a new server replaces it
+        server = startServer(socket_path)
+        try:
+            start_time = time.perf_counter()
+            while amon('run', '3', point, '-s', '1', '-r', '--socket', socket_path) != expected and time.perf_counter() - start_time < 60:
+                time.sleep(0.5)
+            restarted = amon('run', '3', point, '-s', '1', '-r', '--socket', socket_path) == expected
+            amon('shutdown', '--socket', socket_path)
+            server.wait(timeout=10)
+            printResult("Restart on a stale socket, shutdown", restarted and not os.path.exists(socket_path))
+        finally:
+            server.kill()
+            server.wait()
+
+main()
+exitWithResults()
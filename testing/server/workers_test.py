@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from amon.src.utils import AMON_HOME
+from testing.results import exitWithResults, printResult
+
+# Measures the throughput of "amon serve --workers N" : 8 points of instance 3 are sent at the same time (one "amon run -r"
+# per point) to a server with 1 worker, then with one worker per CPU, and the outputs must be the ones of "amon run".
+# The instance is built by each worker before timing. The points are the starting point with a seed each.
+# Run from the root of the repo : PYTHONPATH=. python testing/server/workers_test.py
+
+PORT      = 8797
+NB_POINTS = 8
+
+def amon(*args):
+    return subprocess.run([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', *args], capture_output=True, text=True).stdout.strip()
+
+def sendPoints(seeds):
+    outputs = {}
+    def send(seed):
+        outputs[seed] = amon('run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-s', str(seed), '-r', '--port', str(PORT))
+    threads = [threading.Thread(target=send, args=(seed,)) for seed in seeds]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outputs
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ['AMON_CACHE_DIR'] = cache_dir # Empty evaluation cache, so every point is simulated
+        expected = {seed : amon('run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-s', str(seed), '--no-cache', '--no-snapshot') for seed in range(NB_POINTS)}
+        for nb_workers in sorted({1, os.cpu_count() or 1}):
+            server = subprocess.Popen([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', 'serve', '--port', str(PORT), '--workers', str(nb_workers), '--no-cache'],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while amon('run', '3', str(AMON_HOME / 'starting_pts' / 'x3.txt'), '-s', '0', '-r', '--port', str(PORT)) != expected[0]: # Until the server is up
+                    time.sleep(0.5)
+                sendPoints([0] * nb_workers) # Every worker builds the instance
+                start_time = time.perf_counter()
+                outputs = sendPoints(range(NB_POINTS))
+                elapsed = time.perf_counter() - start_time
+            finally:
+                server.kill() # Also stops the workers, see worker_pool._exitWithServer
+                server.wait()
+            printResult(f"{nb_workers} worker(s)", outputs == expected, f"{NB_POINTS} points in {elapsed:.2f} s ({NB_POINTS / elapsed:.2f} points/s)", labels=('same outputs', 'different outputs'))
+
+main()
+exitWithResults()
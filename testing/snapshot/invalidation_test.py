@@ -0,0 +1,69 @@
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import amon.src.utils as utils
+from amon.src.blackbox import buildBlackbox, evalPoint
+from amon.src.snapshot import InstanceSnapshots
+from amon.src.utils import AMON_HOME, getParamFilepath, parsePoint
+from testing.results import exitWithResults, printResult
+
+# Checks the snapshots of built instances (snapshot.py) :
+#     - the second get of an instance is restored from its snapshot, and evaluates the starting point like a built instance
+#     - the snapshot is still used when a data file is only touched, and is replaced when a data file or the param file changes
+#     - a truncated snapshot is rebuilt
+# Instance 5 with an elevation raster next to its param file
+# Run from the root of the repo : PYTHONPATH=. python testing/snapshot/invalidation_test.py
+
+def evaluate(windfarm_data, blackbox):
+    values = np.loadtxt(AMON_HOME / 'starting_pts' / 'x5.txt').tolist()
+    utils.setSeed(1)
+    return evalPoint(windfarm_data, blackbox, parsePoint(values, windfarm_data.nb_turbines, windfarm_data.opt_variables))
+
+# Gets the instance with new InstanceSnapshots, like a new "amon run", and returns if it was restored and the snapshot files
+def get(snapshots_dir, param_filepath):
+    snapshots = InstanceSnapshots(snapshots_dir)
+    windfarm_data, blackbox = snapshots.get(param_filepath, 1)
+    return snapshots.hits == 1, sorted(path.name for path in snapshots_dir.glob('*')), (windfarm_data, blackbox)
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['AMON_CACHE_DIR'] = folder
+        snapshots_dir = Path(folder) / 'snapshots'
+        instance_folder = Path(folder) / 'instance'
+        instance_folder.mkdir()
+        raster_filepath = instance_folder / 'raster.npy'
+        np.save(raster_filepath, np.zeros((3, 3)))
+        param_filepath = instance_folder / 'params.txt'
+        param_filepath.write_text((AMON_HOME / getParamFilepath(5)).read_text().replace('ELEVATION_FUNCTION 1', 'ELEVATION_FUNCTION raster.npy -100000 -100000 100000'))
+
+        restored, first_files, _ = get(snapshots_dir, param_filepath)
+        printResult("First get", not restored and len(first_files) == 1, ', '.join(first_files))
+
+        restored, files, built_blackbox = get(snapshots_dir, param_filepath)
+        expected = evaluate(*buildBlackbox(param_filepath, 1))
+        outputs  = evaluate(*built_blackbox)
+        printResult("Second get", restored and files == first_files and outputs == expected, ' '.join(str(output) for output in outputs))
+
+        mtime = raster_filepath.stat().st_mtime_ns
+        os.utime(raster_filepath, ns=(mtime + 10**9, mtime + 10**9))
+        restored, files, _ = get(snapshots_dir, param_filepath)
+        printResult("Data file touched", restored and files == first_files)
+
+        np.save(raster_filepath, np.ones((3, 3)))
+        restored, raster_files, _ = get(snapshots_dir, param_filepath)
+        printResult("Data file changed", not restored and len(raster_files) == 1 and raster_files != first_files, ', '.join(raster_files))
+
+        param_filepath.write_text(param_filepath.read_text() + '\n')
+        restored, param_files, _ = get(snapshots_dir, param_filepath)
+        printResult("Param file changed", not restored and len(param_files) == 1 and param_files != raster_files, ', '.join(param_files))
+
+        snapshot_filepath = snapshots_dir / param_files[0]
+        snapshot_filepath.write_bytes(snapshot_filepath.read_bytes()[:100])
+        restored, files, _ = get(snapshots_dir, param_filepath)
+        printResult("Truncated snapshot", not restored and files == param_files and get(snapshots_dir, param_filepath)[0])
+
+main()
+exitWithResults()
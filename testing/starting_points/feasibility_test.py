@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+
+from amon.src.blackbox import buildBlackbox
+from amon.src.starting_points import generateStartingPoints
+from amon.src.utils import getParamFilepath, parsePoint
+from testing.results import exitWithResults, printResult
+
+# Checks that the starting points of "amon gen-start" are feasible : for every instance, 200 layouts are generated and their
+# spacing, placing and height constraints (Blackbox.constraints) must all be 0.
+# Instance 5 has VAR turbines, it is given 25. Instance 4 also draws random turbine types.
+# Run from the root of the repo : PYTHONPATH=. python testing/starting_points/feasibility_test.py
+
+def main():
+    for instance in range(1, 7):
+        windfarm_data, blackbox = buildBlackbox(getParamFilepath(instance), 1)
+        nb_turbines = windfarm_data.nb_turbines if windfarm_data.nb_turbines is not None else 25
+        types       = list(range(len(windfarm_data.wind_turbines_models))) if instance == 4 else None
+        start_time  = time.perf_counter()
+        points      = generateStartingPoints(windfarm_data, nb_turbines, 200, seed=1, types=types)
+        elapsed     = time.perf_counter() - start_time
+        nb_infeasible = 0
+        for values in points:
+            point = parsePoint(values, nb_turbines, windfarm_data.opt_variables)
+            x, y  = point['coords'][0::2], point['coords'][1::2]
+            models          = [windfarm_data.wind_turbines_models[i] for i in point['types']]
+            diameters       = [windfarm_data.wind_turbines.diameter(i) for i in point['types']]
+            default_heights = [windfarm_data.wind_turbines.hub_height(i) for i in point['types']]
+            heights         = point['heights'] if point['heights'] is not None else default_heights
+            constraints = blackbox.constraints(x, y, models, diameters, heights, default_heights)
+            if constraints['spacing'] != 0 or constraints['placing'] != 0 or constraints['height'] != 0:
+                nb_infeasible += 1
+        printResult(f"Instance {instance}", nb_infeasible == 0, f"{len(points)} layouts of {nb_turbines} turbines in {elapsed:.2f} s, {nb_infeasible} infeasible")
+
+main()
+exitWithResults()
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from amon.src.utils import AMON_HOME
+from testing.results import exitWithResults, printResult
+
+# Checks that the surrogate (run --surrogate) still works after a layout was rejected by the extreme barrier on the same
+# instance : its output (objective inf) is in the evaluation cache, and must not be used to train the surrogate.
+# Instance 3 : 3 feasible layouts around the starting point, then the starting point moved 100 km away with --barrier
+# Run from the root of the repo : PYTHONPATH=. python testing/surrogate/barrier_test.py
+
+def amon(*args):
+    process = subprocess.run([sys.executable, '-W', 'ignore', '-m', 'amon.src.main', *args], capture_output=True, text=True)
+    return (process.stdout + process.stderr).strip()
+
+def main():
+    start = np.loadtxt(AMON_HOME / 'starting_pts' / 'x3.txt')
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['AMON_CACHE_DIR'] = folder
+        point_filepaths = []
+        for index, shift in enumerate([0, 10, 20, 1e5]):
+            point = start.copy()
+            point[:12] += shift # Coordinates of the 6 turbines
+            point_filepaths.append(Path(folder) / f'x{index}.txt')
+            np.savetxt(point_filepaths[-1], point[None, :])
+
+        for point_filepath in point_filepaths[:3]:
+            amon('run', '3', str(point_filepath), '-s', '1')
+        rejected = amon('run', '3', str(point_filepaths[3]), '-s', '1', '--barrier').split()
+        printResult("Barrier", rejected[0] == 'inf', ' '.join(rejected))
+
+        prediction = amon('run', '3', str(point_filepaths[0]), '--surrogate').splitlines()
+        try:
+            mean, std = [np.array([float(value) for value in line.split()]) for line in prediction]
+            finite = np.isfinite(mean).all() and np.isfinite(std).all()
+        except ValueError:
+            finite = False
+        printResult("Surrogate after the barrier", finite, ' | '.join(prediction))
+
+main()
+exitWithResults()
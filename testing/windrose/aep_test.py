@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+
+from amon.src.blackbox import buildBlackbox, _getLayout
+from amon.src.utils import AMON_HOME, getParamFilepath, parsePoint
+from amon.src.windfarm_data import getWindrose
+from testing.results import exitWithResults, printResult
+
+# Compares the AEP computed on the wind rose (WINDROSE_FIDELITY) to the AEP of the time series it is binned from (without
+# the perturbation of the blackbox), on the starting point of instances. Each bin is simulated at the mean speed of its
+# samples, the previous upper edge of the bin is shown for reference. The wind rose AEP must be within MAX_RELATIVE_ERROR
+# Run from the root of the repo : PYTHONPATH=. python testing/windrose/aep_test.py
+
+INSTANCES          = [2, 3, 4, 5, 6]
+FIDELITY           = 1
+MAX_RELATIVE_ERROR = 0.01
+
+def main():
+    for instance in INSTANCES:
+        windfarm_data, blackbox = buildBlackbox(getParamFilepath(instance), FIDELITY)
+        values = np.loadtxt(AMON_HOME / 'starting_pts' / f'x{instance}.txt').tolist()
+        layout = _getLayout(windfarm_data, parsePoint(values, windfarm_data.nb_turbines, windfarm_data.opt_variables))
+        turbines = dict(types=layout['types'], heights=layout['absolute_heights'], yaw_angles=layout['yaw_angles'])
+
+        start_time = time.perf_counter()
+        time_aep   = blackbox.AEP(layout['x'], layout['y'], ws=windfarm_data.WS_BB.values, wd=windfarm_data.WD_BB.values, max_memory=500, **turbines)
+        time_time  = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        windrose_aep  = blackbox.windroseAEP(layout['x'], layout['y'], wd=windfarm_data.wind_rose_wd, ws=windfarm_data.wind_rose_ws, probabilities=windfarm_data.wind_rose_P, **turbines)
+        windrose_time = time.perf_counter() - start_time
+
+        wind_direction_bins, wind_speed_bins, probabilities, _ = getWindrose(windfarm_data.wind_data_id, windfarm_data.WS_BB.values, windfarm_data.WD_BB.values, windfarm_data.nb_wd_bins, windfarm_data.nb_ws_bins)
+        wd_indices, ws_indices = np.nonzero(probabilities)
+        edge_aep = blackbox.windroseAEP(layout['x'], layout['y'], wd=wind_direction_bins[wd_indices], ws=wind_speed_bins[1:][ws_indices], probabilities=probabilities[wd_indices, ws_indices], **turbines)
+
+        error = windrose_aep / time_aep - 1
+        printResult(f"Instance {instance}", abs(error) < MAX_RELATIVE_ERROR, f"time series {time_aep:.2f} GWh ({time_time:.2f} s), wind rose {windrose_aep:.2f} GWh ({error:+.2%}, {windrose_time:.2f} s), upper edges {edge_aep:.2f} GWh ({edge_aep / time_aep - 1:+.2%})")
+
+main()
+exitWithResults()
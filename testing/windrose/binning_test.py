@@ -0,0 +1,54 @@
+import time
+
+import numpy  as np
+import pandas as pd
+
+from amon.src.utils import AMON_HOME
+from amon.src.windfarm_data import NB_WIND_DATA, getWindrose
+from testing.results import exitWithResults, printResult
+
+# Checks that the binning of the wind rose (windfarm_data.getWindrose) gives exactly the probabilities of the previous
+# nested loop over the bins, for every wind data and a few numbers of bins.
+# Run from the root of the repo : PYTHONPATH=. python testing/windrose/binning_test.py
+
+# Previous binning of WindFarmData, one pass over the time series per bin
+def loopWindrose(WS, WD, nb_wd_bins, nb_ws_bins):
+    degrees_per_bin     = 360 / nb_wd_bins
+    max_wind_speed      = WS.max().values[0]
+    speed_units_per_bin = max_wind_speed / nb_ws_bins
+    wind_direction_bins = np.array([i*degrees_per_bin for i in range(nb_wd_bins)])
+    wind_speed_bins     = np.array([0] + [0.5+speed_units_per_bin*i for i in range(nb_ws_bins)])
+    wind_rose_data      = pd.DataFrame(data=None, columns=wind_direction_bins, index=wind_speed_bins[1:])
+    N  = len(WS)
+    width = 360 / len(wind_direction_bins)
+    for i in range(len(wind_direction_bins)):
+        wd = wind_direction_bins[i]
+        for j in range(len(wind_speed_bins)-1):
+            lower, upper = wind_speed_bins[j], wind_speed_bins[j+1]
+            if wd == 0:
+                sector = (360 - 0.5*width <= WD.values) | (WD.values < 0.5*width)
+            else:
+                sector = (wd - 0.5*width <= WD.values) & (WD.values < wd + 0.5*width)
+            TS_sector = WS.values[sector]
+            wind_rose_data.iloc[j,i] = sum((lower <= TS_sector) & (TS_sector < upper)) / N
+    return wind_direction_bins, wind_speed_bins, wind_rose_data.values.T.astype(float)
+
+def main():
+    for wind_data_id in range(1, NB_WIND_DATA + 1):
+        folder = AMON_HOME / 'data' / 'wind_data' / f'wind_data_{wind_data_id}'
+        WS = pd.read_csv(folder / 'wind_speed.csv', index_col=0)
+        WD = pd.read_csv(folder / 'wind_direction.csv', index_col=0)
+        ws, wd = WS[WS.columns[0]].values, WD[WD.columns[0]].values
+        for nb_wd_bins, nb_ws_bins in [(36, 41), (12, 20), (7, 13), (72, 60)]:
+            start_time = time.perf_counter()
+            expected = loopWindrose(WS, WD, nb_wd_bins, nb_ws_bins)
+            loop_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            result = getWindrose(wind_data_id, ws, wd, nb_wd_bins, nb_ws_bins)
+            binning_time = time.perf_counter() - start_time
+            cached = getWindrose(wind_data_id, ws, wd, nb_wd_bins, nb_ws_bins)
+            identical = all(np.array_equal(a, b) for a, b in zip(expected, result)) and all(np.array_equal(a, b) for a, b in zip(expected, cached))
+            printResult(f"Wind data {wind_data_id}, {nb_wd_bins}x{nb_ws_bins} bins", identical, f"loop {loop_time:.3f} s, binning {binning_time*1e3:.2f} ms", labels=('identical', 'different'))
+
+main()
+exitWithResults()